@@ -0,0 +1,138 @@
+"""基准测试套件: 依次运行全部基准，输出可比较的 JSON
+
+用法(在项目根目录):
+    python -m benchmarks [--only 项目,...] [--out 结果.json] [--compare 旧结果.json]
+
+项目:
+    profiles  乐器点击表查表与重映射
+    parse     MIDI 解析(扫描器 vs mido)
+    compile   和弦分组、取舍与演奏计划编译
+    dispatch  NullInput 端到端播放
+    download  本地 HTTP 服务器上的批量下载(长连接 vs 新建连接)
+
+默认语料为 benchmarks/corpus 下的固定文件(见 make_corpus)。--compare 按
+同一文件/乐器逐项对比: 耗时类指标给出 新/旧 比值，小于 1 表示变快。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks import bench_compile, bench_dispatch, bench_download, bench_parse, bench_profiles
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+SECTIONS = ("profiles", "parse", "compile", "dispatch", "download")
+# 对比时用来配对的字段
+ROW_KEYS = ("file", "profile", "notes")
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(sections, files, repeat, speed):
+    results = {}
+    for section in sections:
+        print(f"[DEBUG] 基准测试: {section}", file=sys.stderr)
+        if section == "profiles":
+            results[section] = bench_profiles.run()
+        elif section == "parse":
+            results[section] = bench_parse.run(files, repeat)
+        elif section == "compile":
+            results[section] = bench_compile.run(files, repeat)
+        elif section == "dispatch":
+            results[section] = bench_dispatch.run(files, speed)
+        elif section == "download":
+            results[section] = bench_download.run(files)
+    return {
+        'meta': {
+            'created': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'corpus': [os.path.basename(path) for path in files],
+            'repeat': repeat,
+            'speed': speed,
+        },
+        'results': results,
+    }
+
+
+def _flatten(row, prefix=""):
+    # bench_parse 每个解析器一个子字典
+    flat = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key not in ROW_KEYS:
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(new, old):
+    """[(项目, 行标识, 指标, 旧值, 新值, 新/旧)]，只比较耗时与吞吐"""
+    diffs = []
+    for section, rows in new['results'].items():
+        base = {tuple(row.get(k) for k in ROW_KEYS): row for row in old.get('results', {}).get(section, [])}
+        for row in rows:
+            ident = tuple(row.get(k) for k in ROW_KEYS)
+            before = base.get(ident)
+            if before is None:
+                continue
+            old_flat = _flatten(before)
+            for metric, value in _flatten(row).items():
+                if not metric.endswith(("_ms", "_ns", "_per_s", "_per_ms")):
+                    continue
+                prev = old_flat.get(metric)
+                if prev:
+                    label = "/".join(str(part) for part in ident if part is not None)
+                    diffs.append((section, label, metric, prev, value, value / prev))
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=[CORPUS_DIR], help="MIDI 目录或文件")
+    parser.add_argument('--only', default=",".join(SECTIONS), help="逗号分隔的项目")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--speed', type=float, default=20.0, help="dispatch 的播放倍速")
+    parser.add_argument('--out', help="结果写入的 JSON 文件，默认输出到标准输出")
+    parser.add_argument('--compare', help="与之前保存的结果对比")
+    args = parser.parse_args()
+
+    sections = [s.strip() for s in args.only.split(",") if s.strip()]
+    unknown = [s for s in sections if s not in SECTIONS]
+    if unknown:
+        parser.error(f"未知项目: {', '.join(unknown)}")
+    files = bench_parse.collect(args.paths)
+    if not files:
+        parser.error(f"没有找到 MIDI 文件: {', '.join(args.paths)}")
+
+    result = run(sections, files, args.repeat, args.speed)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"[DEBUG] 结果已写入 {args.out}", file=sys.stderr)
+    elif not args.compare:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            old = json.load(f)
+        print(f"{'项目':<10} {'对象':<28} {'指标':<22} {'旧':>12} {'新':>12} {'新/旧':>7}")
+        for section, label, metric, prev, value, ratio in compare(result, old):
+            print(f"{section:<10} {label[:28]:<28} {metric:<22} {prev:>12.3f} {value:>12.3f} {ratio:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
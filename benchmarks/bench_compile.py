@@ -0,0 +1,94 @@
+"""演奏计划编译耗时: 和弦分组、和弦取舍与完整编译
+
+用法(在项目根目录):
+    python -m benchmarks.bench_compile [目录或文件...] [--repeat N] [--json]
+
+默认使用 benchmarks/corpus 下的固定语料。音符表在第一次解析后已缓存，
+这里只统计解析之后的部分；解析见 bench_parse。
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmarks.bench_parse import collect
+from core.chords import ChordIndex, reduce_chord
+from core.layout import create_profile, layout_index
+from core.notes import parse_notes
+from core.plan import compile_plan
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+SIZE = (1920, 1080)
+BATCH_WINDOW = 0.01
+MAX_POLYPHONY = 5
+
+
+def best_ms(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def run(files, repeat=3, range_mode="drop"):
+    profiles = [(layout_id, create_profile(layout_id)) for layout_id, _ in layout_index()]
+    rows = []
+    for path in files:
+        table = parse_notes(path)
+        for layout_id, profile in profiles:
+            profile.update_size(*SIZE)
+            playable = profile.playable_notes(0)
+            notes = [(t, note) for t, note in table.select() if playable[note]]
+
+            chord_ms, chords = best_ms(lambda: ChordIndex.build(notes, BATCH_WINDOW), repeat)
+            reduce_ms, _ = best_ms(lambda: [reduce_chord(chords.chord(i), MAX_POLYPHONY)
+                                            for i in range(len(chords))], repeat)
+            compile_ms, plan = best_ms(lambda: compile_plan(path, profile, SIZE, batch_window=BATCH_WINDOW,
+                                                            max_polyphony=MAX_POLYPHONY, range_mode=range_mode),
+                                       repeat)
+            rows.append({
+                'file': os.path.basename(path),
+                'profile': layout_id,
+                'notes': len(notes),
+                'chords': len(chords),
+                'batches': len(plan),
+                'clicks': plan.click_count,
+                'chord_build_ms': round(chord_ms, 3),
+                'reduce_ms': round(reduce_ms, 3),
+                'compile_ms': round(compile_ms, 3),
+                'notes_per_ms': round(len(notes) / compile_ms, 1) if compile_ms else None,
+            })
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'文件':<20} {'乐器':<8} {'音符':>7} {'批次':>7} {'点击':>7} {'分组ms':>8} {'取舍ms':>8} {'编译ms':>9}")
+    for row in rows:
+        print(f"{row['file'][:20]:<20} {row['profile']:<8} {row['notes']:>7} {row['batches']:>7} {row['clicks']:>7} "
+              f"{row['chord_build_ms']:>8.2f} {row['reduce_ms']:>8.2f} {row['compile_ms']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=[CORPUS_DIR])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--fold', action='store_true', help="音域外的音折叠到可弹八度")
+    parser.add_argument('--json', action='store_true', help="输出 JSON")
+    args = parser.parse_args()
+
+    files = collect(args.paths)
+    if not files:
+        parser.error(f"没有找到 MIDI 文件: {', '.join(args.paths)}")
+
+    rows = run(files, args.repeat, "fold" if args.fold else "drop")
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    print_rows(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""端到端发送: 用 NullInput 按真实调度播放整首曲子
+
+用法(在项目根目录):
+    python -m benchmarks.bench_dispatch [目录或文件...] [--speed X] [--scheduler 模式] [--json]
+
+每首曲子以 --speed 倍速完整跑一遍 MidiPlayer 的热循环(调度等待 + 发送)，
+给出迟到分位数与每秒点击数；raw_clicks_per_s 为不等待、直接把整个计划
+发给 NullInput 的上限。不写计时报告与演奏计划缓存以外的文件。
+"""
+import argparse
+import json
+import os
+import time
+
+from benchmarks.bench_parse import collect
+from core.driver import NullInput
+from core.layout import create_profile
+from core.plan import compile_plan
+from core.player import MidiPlayer
+from core.scheduler import MODE_NAMES
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+DEFAULT_LAYOUT = "piano"
+
+
+class BenchPlayer(MidiPlayer):
+    """结束时只保留报告，不写入 reports/"""
+
+    def _emit_report(self):
+        self.report = self.recorder.report(scheduler=self.scheduler_report)
+
+
+def raw_rate(plan, backend, repeat=3):
+    xs, ys, lparams, offsets = plan.xs, plan.ys, plan.lparams, plan.offsets
+    click_batch = backend.click_batch
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for idx in range(len(plan)):
+            click_batch(xs, ys, offsets[idx], offsets[idx + 1], lparams)
+        best = min(best, time.perf_counter() - start)
+    return plan.click_count / best if best else None
+
+
+def run(files, speed=20.0, scheduler="balanced", layout_id=DEFAULT_LAYOUT):
+    profile = create_profile(layout_id)
+    rows = []
+    for path in files:
+        backend = NullInput()
+        player = BenchPlayer(backend)
+        player.report = {}
+        player.load(None, path, profile, speed, 0, 0, scheduler, load_mode="plan")
+        start = time.perf_counter()
+        player.run()  # 在当前线程同步执行
+        wall = time.perf_counter() - start
+        timing = player.report.get('timing', {})
+        sched = player.report.get('scheduler', {})
+
+        plan = compile_plan(path, profile, backend.target_size(), speed=speed)
+        rows.append({
+            'file': os.path.basename(path),
+            'profile': layout_id,
+            'speed': speed,
+            'scheduler': scheduler,
+            'batches': timing.get('batches', 0),
+            'clicks': backend.clicks,
+            'wall_s': round(wall, 3),
+            'clicks_per_s': round(backend.clicks / wall, 1) if wall else None,
+            'late_p50_ms': timing.get('late_p50_ms'),
+            'late_p95_ms': timing.get('late_p95_ms'),
+            'late_p99_ms': timing.get('late_p99_ms'),
+            'late_max_ms': timing.get('late_max_ms'),
+            'cpu_pct': sched.get('cpu_pct'),
+            'raw_clicks_per_s': round(raw_rate(plan, NullInput()), 1),
+        })
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'文件':<20} {'点击':>7} {'耗时s':>7} {'点击/s':>9} {'p50ms':>7} {'p95ms':>7} {'最大ms':>7} {'CPU%':>6} "
+          f"{'上限 点击/s':>12}")
+    for row in rows:
+        cpu = row['cpu_pct']
+        print(f"{row['file'][:20]:<20} {row['clicks']:>7} {row['wall_s']:>7.2f} {row['clicks_per_s']:>9.0f} "
+              f"{row['late_p50_ms']:>7.3f} {row['late_p95_ms']:>7.3f} {row['late_max_ms']:>7.3f} "
+              f"{cpu if cpu is not None else '-':>6} {row['raw_clicks_per_s']:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=[CORPUS_DIR])
+    parser.add_argument('--speed', type=float, default=20.0, help="播放倍速，越大跑得越快")
+    parser.add_argument('--scheduler', choices=list(MODE_NAMES), default="balanced")
+    parser.add_argument('--layout', default=DEFAULT_LAYOUT, help="乐器布局 id")
+    parser.add_argument('--json', action='store_true', help="输出 JSON")
+    args = parser.parse_args()
+
+    files = collect(args.paths)
+    if not files:
+        parser.error(f"没有找到 MIDI 文件: {', '.join(args.paths)}")
+
+    rows = run(files, args.speed, args.scheduler, args.layout)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    print_rows(rows)
+
+
+if __name__ == '__main__':
+    main()
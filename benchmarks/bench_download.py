@@ -0,0 +1,128 @@
+"""下载层: 用本地 HTTP 服务器代替曲库，对比长连接复用与每首新建连接
+
+用法(在项目根目录):
+    python -m benchmarks.bench_download [目录或文件...] [--copies N] [--workers N] [--json]
+
+服务器在 127.0.0.1 上随机端口运行(HTTP/1.1，支持 keep-alive)，每个文件以
+不同查询参数请求 --copies 次，模拟批量下载一个分类。下载走 core.downloads
+的 download_file，与界面里的下载队列是同一套代码，结果写到临时目录。
+"""
+import argparse
+import http.server
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from urllib.parse import quote
+
+from benchmarks.bench_parse import collect
+from core.downloads import MAX_WORKERS, HostConnections, download_file
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+MODES = ("keepalive", "fresh")
+
+
+class _Handler(http.server.SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 与真实服务器一样关闭 Nagle，否则长连接上每个响应的尾包要等对方的延迟确认
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def serve(directory):
+    """在后台线程里提供 directory 下的文件，返回服务器(connections 为累计连接数)"""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), partial(_Handler, directory=directory))
+    server.daemon_threads = True
+    server.connections = 0
+    thread = threading.Thread(target=server.serve_forever, name="bench-http", daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def fetch_all(urls, out_dir, mode, workers):
+    """并发下载 urls，返回 (字节数, 耗时秒)"""
+    connections = HostConnections() if mode == "keepalive" else None
+
+    def fetch(item):
+        idx, url = item
+        return download_file(url, os.path.join(out_dir, f"{idx}.mid"), connections=connections)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            total = sum(pool.map(fetch, enumerate(urls)))
+    finally:
+        if connections is not None:
+            connections.close()
+    return total, time.perf_counter() - start
+
+
+def run(files, copies=20, workers=MAX_WORKERS):
+    # 所有文件须在同一目录下，由同一个服务器提供
+    by_dir = {}
+    for path in files:
+        by_dir.setdefault(os.path.dirname(os.path.abspath(path)), []).append(os.path.basename(path))
+    rows = []
+    for directory, names in by_dir.items():
+        with serve(directory) as server, tempfile.TemporaryDirectory() as out_dir:
+            base = f"http://127.0.0.1:{server.server_address[1]}/"
+            urls = [f"{base}{quote(name)}?copy={i}" for i in range(copies) for name in names]
+            for mode in MODES:
+                before = server.connections
+                size, wall = fetch_all(urls, out_dir, mode, workers)
+                rows.append({
+                    'file': f"{os.path.basename(directory)}×{copies}",
+                    'profile': mode,
+                    'downloads': len(urls),
+                    'workers': workers,
+                    'bytes': size,
+                    'connections': server.connections - before,
+                    'wall_ms': round(wall * 1000, 1),
+                    'files_per_s': round(len(urls) / wall, 1) if wall else None,
+                })
+    return rows
+
+
+def print_rows(rows):
+    print(f"{'来源':<16} {'方式':<10} {'文件数':>6} {'连接数':>6} {'耗时ms':>9} {'文件/s':>8} {'MB':>7}")
+    for row in rows:
+        print(f"{row['file'][:16]:<16} {row['profile']:<10} {row['downloads']:>6} {row['connections']:>6} "
+              f"{row['wall_ms']:>9.1f} {row['files_per_s']:>8.1f} {row['bytes'] / 1e6:>7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=[CORPUS_DIR])
+    parser.add_argument('--copies', type=int, default=20, help="每个文件请求的次数")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="并发下载数")
+    parser.add_argument('--json', action='store_true', help="输出 JSON")
+    args = parser.parse_args()
+
+    files = collect(args.paths)
+    if not files:
+        parser.error(f"没有找到 MIDI 文件: {', '.join(args.paths)}")
+
+    rows = run(files, args.copies, args.workers)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    print_rows(rows)
+
+
+if __name__ == '__main__':
+    main()
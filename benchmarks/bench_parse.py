@@ -0,0 +1,119 @@
+"""MIDI 解析对比: 快速扫描器 vs mido.MidiFile
+
+用法(在项目根目录):
+    python -m benchmarks.bench_parse [目录或文件...] [--repeat N] [--json]
+
+默认读取本地曲库 store/ 里下载、导入过的文件(按内容哈希存放在 store/<前两位>/<哈希>.mid)。
+"""
+import argparse
+import glob
+import json
+import mmap
+import os
+import time
+import tracemalloc
+
+import mido
+
+from core import store
+from core.smf import scan_notes
+
+DEFAULT_CORPUS = store.STORE_DIR
+
+
+def parse_mido(path):
+    mid = mido.MidiFile(path)
+    count = 0
+    for track in mid.tracks:
+        for msg in track:
+            if msg.type == 'note_on' and msg.velocity > 0:
+                count += 1
+    return count
+
+
+def parse_scan(path):
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        scan = scan_notes(buf)
+    scan.tempo_map().convert(scan.ticks)
+    return len(scan)
+
+
+PARSERS = {"mido": parse_mido, "scan": parse_scan}
+
+
+def measure(func, path, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(path)
+        best = min(best, time.perf_counter() - start)
+
+    # 峰值内存单独测一次，避免 tracemalloc 的开销计入耗时
+    tracemalloc.start()
+    func(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'notes': result, 'time_ms': round(best * 1000, 3), 'peak_kb': round(peak / 1024, 1)}
+
+
+def collect(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = sorted(glob.glob(os.path.join(path, "**", "*.mid"), recursive=True))
+            if os.path.abspath(path) == os.path.abspath(store.STORE_DIR):
+                # 曲库只取已入库的文件，跳过 tmp/ 里没下载完的
+                found = [f for f in found if store.digest_of(f)]
+            files.extend(found)
+        elif os.path.isfile(path):
+            files.append(path)
+    return files
+
+
+def run(files, repeat=3):
+    rows = []
+    for path in files:
+        row = {'file': os.path.basename(path), 'bytes': os.path.getsize(path)}
+        for name, func in PARSERS.items():
+            try:
+                row[name] = measure(func, path, repeat)
+            except Exception as e:
+                row[name] = {'error': str(e)}
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='*', default=[DEFAULT_CORPUS])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help="输出 JSON")
+    args = parser.parse_args()
+
+    files = collect(args.paths)
+    if not files:
+        parser.error(f"没有找到 MIDI 文件: {', '.join(args.paths)}")
+
+    rows = run(files, args.repeat)
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    print_rows(rows)
+
+
+def print_rows(rows):
+    print(f"{'文件':<32} {'大小KB':>8} {'mido ms':>10} {'scan ms':>10} {'加速':>6} {'mido KB':>10} {'scan KB':>10}")
+    for row in rows:
+        m, s = row['mido'], row['scan']
+        if 'error' in m or 'error' in s:
+            print(f"{row['file'][:32]:<32} {m.get('error') or s.get('error')}")
+            continue
+        speedup = m['time_ms'] / s['time_ms'] if s['time_ms'] else float('inf')
+        print(f"{row['file'][:32]:<32} {row['bytes'] / 1024:>8.1f} {m['time_ms']:>10.2f} {s['time_ms']:>10.2f} "
+              f"{speedup:>5.1f}x {m['peak_kb']:>10.1f} {s['peak_kb']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
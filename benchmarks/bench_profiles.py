@@ -0,0 +1,106 @@
+"""乐器点击表查表开销
+
+用法(在项目根目录):
+    python -m benchmarks.bench_profiles [--json]
+
+每个乐器按不同音符数量测 can_play / get_clicks 的单次耗时，查表为 O(1) 时
+单次耗时不随音符数量变化。竖琴另外给出逐弦扫描(旧算法)的对照。
+remap_ms 为换一个分辨率重新生成点击表(不经共享缓存)的耗时。
+"""
+import argparse
+import json
+import random
+import time
+
+from core.layout import create_profile, layout_index
+from profiles.harp import HarpProfile
+
+NOTE_COUNTS = [1_000, 10_000, 100_000]
+SIZE = (1920, 1080)
+REMAP_SIZES = [(1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)]
+
+
+def harp_scan(profile):
+    # 旧实现: 每个音符遍历全部弦
+    strings = profile.layout.data['strings']
+
+    def can_play(note):
+        for s_idx in range(len(strings['xs'])):
+            natural = strings['base_note'] + (s_idx // 7) * 12 + strings['scale'][s_idx % 7]
+            if note - natural in (-1, 0, 1):
+                return True
+        return False
+    return can_play
+
+
+def per_call_ns(func, notes):
+    start = time.perf_counter()
+    for note in notes:
+        func(note)
+    return (time.perf_counter() - start) * 1e9 / len(notes)
+
+
+def remap_ms(profile, repeat=5):
+    best = float('inf')
+    for w, h in REMAP_SIZES:
+        profile.update_size(w, h)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            profile.build_table()
+            best = min(best, time.perf_counter() - start)
+    profile.update_size(*SIZE)
+    return best * 1000
+
+
+def run(note_counts=NOTE_COUNTS):
+    rng = random.Random(0)
+    rows = []
+    for layout_id, _ in layout_index():
+        profile = create_profile(layout_id)
+        profile.update_size(*SIZE)
+        start = time.perf_counter()
+        profile.table
+        compile_ms = (time.perf_counter() - start) * 1000
+        remap = remap_ms(profile)
+
+        for count in note_counts:
+            notes = [rng.randint(21, 108) for _ in range(count)]
+            profile.reset()
+            row = {
+                'profile': layout_id,
+                'notes': count,
+                'compile_ms': round(compile_ms, 3),
+                'remap_ms': round(remap, 3),
+                'can_play_ns': round(per_call_ns(profile.can_play, notes), 1),
+                'get_clicks_ns': round(per_call_ns(profile.get_clicks, notes), 1),
+            }
+            if isinstance(profile, HarpProfile):
+                row['scan_can_play_ns'] = round(per_call_ns(harp_scan(profile), notes), 1)
+            rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--json', action='store_true', help="输出 JSON")
+    args = parser.parse_args()
+
+    rows = run()
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+
+    print_rows(rows)
+
+
+def print_rows(rows):
+    print(f"{'乐器':<16} {'音符数':>8} {'编译ms':>8} {'重映射ms':>8} {'can_play ns':>12} {'get_clicks ns':>14} "
+          f"{'逐弦扫描 ns':>12}")
+    for row in rows:
+        scan = row.get('scan_can_play_ns')
+        print(f"{row['profile']:<16} {row['notes']:>8} {row['compile_ms']:>8.3f} {row['remap_ms']:>8.3f} "
+              f"{row['can_play_ns']:>12.1f} {row['get_clicks_ns']:>14.1f} {scan if scan is not None else '-':>12}")
+
+
+if __name__ == '__main__':
+    main()
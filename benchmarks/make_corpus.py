@@ -0,0 +1,106 @@
+"""生成基准测试用的固定 MIDI 语料
+
+用法(在项目根目录):
+    python -m benchmarks.make_corpus [--out benchmarks/corpus]
+
+语料已随仓库提交，一般不需要重新生成。随机数种子固定，重新生成的文件
+与仓库中的逐字节相同；改动这里的参数后，新旧基准结果不再可比。
+
+文件按音符密度递增:
+    01_melody     单音旋律，八分音符
+    02_chords     旋律 + 每拍柱式和弦
+    03_arpeggio   4 轨十六分音符琶音，中途变速
+    04_dense      8 轨三十二分音符 + 和弦，音域超出钢琴
+    05_extreme    16 轨高密度，频繁变速
+"""
+import argparse
+import os
+import random
+
+import mido
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+TICKS_PER_BEAT = 480
+DURATION_BEATS = 120  # 120 BPM 下约 60 秒
+
+# 名称 -> (音轨数, 每拍音符数, 和弦音数, 音域, 变速次数)
+SPECS = {
+    "01_melody": (1, 2, 1, (60, 84), 0),
+    "02_chords": (2, 2, 4, (48, 84), 0),
+    "03_arpeggio": (4, 4, 1, (36, 96), 4),
+    "04_dense": (8, 8, 2, (12, 120), 8),
+    "05_extreme": (16, 16, 3, (0, 127), 32),
+}
+
+SCALE = (0, 2, 4, 5, 7, 9, 11)
+
+
+def _events(rng, step, chord, lo, hi, channel):
+    """(绝对 tick, 消息)；音长为步长的 0.9 倍，和弦音同时按下"""
+    events = []
+    duration = max(1, step * 9 // 10)
+    for tick in range(0, DURATION_BEATS * TICKS_PER_BEAT, step):
+        root = rng.randint(lo, hi)
+        for k in range(chord):
+            degree = rng.randrange(len(SCALE))
+            note = min(hi, max(lo, root + SCALE[degree] + 12 * (k // 3)))
+            velocity = rng.randint(40, 110)
+            events.append((tick, mido.Message('note_on', note=note, velocity=velocity, channel=channel)))
+            # 一半用 note_on 力度 0 表示松开，两种写法都要覆盖
+            if rng.random() < 0.5:
+                off = mido.Message('note_on', note=note, velocity=0, channel=channel)
+            else:
+                off = mido.Message('note_off', note=note, velocity=64, channel=channel)
+            events.append((tick + duration, off))
+    return events
+
+
+def _track(events, name):
+    track = mido.MidiTrack()
+    track.append(mido.MetaMessage('track_name', name=name, time=0))
+    # 同一 tick 先松开再按下
+    events.sort(key=lambda e: (e[0], e[1].type == 'note_on' and e[1].velocity > 0))
+    now = 0
+    for tick, msg in events:
+        track.append(msg.copy(time=tick - now))
+        now = tick
+    track.append(mido.MetaMessage('end_of_track', time=0))
+    return track
+
+
+def build(name, spec):
+    tracks, per_beat, chord, (lo, hi), tempo_changes = spec
+    rng = random.Random(name)
+    mid = mido.MidiFile(type=1, ticks_per_beat=TICKS_PER_BEAT)
+
+    total = DURATION_BEATS * TICKS_PER_BEAT
+    conductor = [(0, mido.MetaMessage('set_tempo', tempo=500000)),
+                 (0, mido.MetaMessage('time_signature', numerator=4, denominator=4))]
+    for i in range(tempo_changes):
+        tick = total * (i + 1) // (tempo_changes + 1)
+        conductor.append((tick, mido.MetaMessage('set_tempo', tempo=rng.randint(300000, 700000))))
+    mid.tracks.append(_track(conductor, "conductor"))
+
+    step = TICKS_PER_BEAT // per_beat
+    for t in range(tracks):
+        channel = t % 16
+        if channel == 9:
+            channel = 15 - t // 16  # 避开打击乐通道
+        mid.tracks.append(_track(_events(rng, step, chord, lo, hi, channel), f"track {t + 1}"))
+    return mid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default=CORPUS_DIR)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    for name, spec in SPECS.items():
+        path = os.path.join(args.out, f"{name}.mid")
+        build(name, spec).save(path)
+        print(f"{path}: {os.path.getsize(path) / 1024:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import traceback
+from operator import mul
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from core.notes import file_hash, parse_notes, track_key
+from core.profile_base import BaseProfile, NOTE_COUNT
+
+CACHE_DIR = os.path.join("cache", "analysis")
+ANALYSIS_VERSION = 1
+DRUM_CHANNEL = 9  # GM 标准第10通道为打击乐
+TRANSPOSE_RANGE = (-24, 24)
+TRANSPOSE_MODES = {"manual": "手动", "auto": "演奏前自动选择"}
+
+
+def _cache_path(digest, profile, pitch):
+    return os.path.join(CACHE_DIR, f"{digest}-{profile.cache_id}-{pitch}.json")
+
+
+def _read_cache(path, field='tracks'):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') == ANALYSIS_VERSION:
+            return data[field]
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def _write_cache(path, value, field='tracks'):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': ANALYSIS_VERSION, field: value}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[DEBUG] 分析缓存写入失败: {e}")
+
+
+def analyze_tracks(midi_path, profile: BaseProfile, pitch=0):
+    """一次遍历统计每个 (音轨, 通道) 的音符数、音域、密度与当前乐器可演奏比例"""
+    cache_path = _cache_path(file_hash(midi_path), profile, pitch)
+    cached = _read_cache(cache_path)
+    if cached is not None:
+        return cached
+
+    table = parse_notes(midi_path)
+    if not (profile.w and profile.h):
+        # 可演奏范围与分辨率无关，但未设置尺寸的配置不会生成坐标
+        profile.update_size(1920, 1080)
+    playable = profile.playable_notes(pitch)
+    stats = {}
+    for t, tr, ch, note in zip(table.times, table.tracks, table.channels, table.notes):
+        s = stats.get((tr, ch))
+        if s is None:
+            s = stats[(tr, ch)] = {
+                'count': 0, 'playable': 0, 'low': note, 'high': note, 'sum': 0,
+                'first': t, 'last': t, 'onsets': 0, 'last_onset': None
+            }
+        s['count'] += 1
+        s['playable'] += playable[note]
+        s['sum'] += note
+        s['low'] = min(s['low'], note)
+        s['high'] = max(s['high'], note)
+        s['last'] = t
+        if s['last_onset'] != t:
+            s['onsets'] += 1
+            s['last_onset'] = t
+
+    tracks = []
+    for (tr, ch), s in sorted(stats.items()):
+        span = s['last'] - s['first']
+        name = table.track_names[tr] if tr < len(table.track_names) else ""
+        tracks.append({
+            'key': track_key(tr, ch),
+            'track': tr,
+            'channel': ch,
+            'name': name.strip() or f"音轨 {tr + 1}",
+            'notes': s['count'],
+            'low': s['low'],
+            'high': s['high'],
+            'mean': round(s['sum'] / s['count'], 2),
+            'density': round(s['count'] / span, 2) if span > 0 else float(s['count']),
+            'chord_size': round(s['count'] / s['onsets'], 2),
+            'playable_pct': round(100.0 * s['playable'] / s['count'], 1),
+            'drums': ch == DRUM_CHANNEL,
+        })
+
+    _write_cache(cache_path, tracks)
+    return tracks
+
+
+def auto_select(tracks, max_polyphony=5, min_playable_pct=30.0):
+    """自动挑选音轨: 去掉打击乐和大部分弹不了的轨，旋律(高音)轨优先，直到平均和弦大小用完复音预算"""
+    candidates = [t for t in tracks if not t['drums'] and t['playable_pct'] >= min_playable_pct]
+    if not candidates:
+        candidates = [t for t in tracks if not t['drums']] or list(tracks)
+    candidates.sort(key=lambda t: (t['mean'], t['notes']), reverse=True)
+
+    chosen = []
+    budget = 0.0
+    for t in candidates:
+        if chosen and budget + t['chord_size'] > max_polyphony:
+            continue
+        chosen.append(t['key'])
+        budget += t['chord_size']
+    return chosen
+
+
+def pitch_histogram(midi_path, tracks=None):
+    """选中音轨的音高直方图，下标为 MIDI 音符号"""
+    histogram = [0] * NOTE_COUNT
+    for _, note in parse_notes(midi_path).select(tracks):
+        histogram[note] += 1
+    return histogram
+
+
+def score_transposes(histogram, playable, lo=TRANSPOSE_RANGE[0], hi=TRANSPOSE_RANGE[1]):
+    """直方图与可演奏表逐偏移做一次相关: 偏移 o 保留的音 = sum(h[n] * playable[n + o])"""
+    total = sum(histogram)
+    options = []
+    for offset in range(lo, hi + 1):
+        start, end = max(0, -offset), min(NOTE_COUNT, NOTE_COUNT - offset)
+        kept = sum(map(mul, histogram[start:end], playable[start + offset:end + offset]))
+        dropped = total - kept
+        options.append({
+            'offset': offset,
+            'kept': kept,
+            'dropped': dropped,
+            'dropped_pct': round(100.0 * dropped / total, 2) if total else 0.0,
+        })
+    return options
+
+
+def best_transpose(options):
+    # 保留最多；并列时优先整八度(不改变调性)，再优先偏移小的
+    return min(options, key=lambda o: (o['dropped'], o['offset'] % 12 != 0, abs(o['offset']), o['offset']))['offset']
+
+
+def suggest_transpose(midi_path, profile: BaseProfile, tracks=None):
+    """为文件与乐器打分 -24..+24 的每个移调，按文件、乐器、音轨选择缓存"""
+    tag = hashlib.sha256(",".join(sorted(tracks)).encode('utf-8')).hexdigest()[:12] if tracks is not None else "all"
+    cache_path = os.path.join(CACHE_DIR, f"{file_hash(midi_path)}-{profile.cache_id}-transpose-{tag}.json")
+    cached = _read_cache(cache_path, 'transpose')
+    if cached is not None:
+        return cached
+
+    if not (profile.w and profile.h):
+        profile.update_size(1920, 1080)
+    options = score_transposes(pitch_histogram(midi_path, tracks), profile.table.playable)
+    result = {'best': best_transpose(options), 'options': options}
+    _write_cache(cache_path, result, 'transpose')
+    return result
+
+
+class TrackAnalysisWorker(QThread):
+    success = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, midi_path, profile, pitch):
+        super().__init__()
+        self.midi_path = midi_path
+        self.profile = profile
+        self.pitch = pitch
+
+    def run(self):
+        try:
+            self.success.emit(analyze_tracks(self.midi_path, self.profile, self.pitch))
+        except Exception as e:
+            traceback.print_exc()
+            self.failed.emit(f"音轨分析失败: {str(e)}")
+
+
+class TransposeWorker(QThread):
+    success = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, midi_path, profile, tracks=None):
+        super().__init__()
+        self.midi_path = midi_path
+        self.profile = profile
+        self.tracks = tracks
+
+    def run(self):
+        try:
+            self.success.emit(suggest_transpose(self.midi_path, self.profile, self.tracks))
+        except Exception as e:
+            traceback.print_exc()
+            self.failed.emit(f"移调分析失败: {str(e)}")
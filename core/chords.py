@@ -0,0 +1,88 @@
+from array import array
+
+# 和弦超出复音上限时的取舍策略
+POLICIES = {
+    "melody": "保留旋律(高音优先)",
+    "bass": "保留旋律与低音",
+    "file": "按文件顺序截断",
+}
+
+# 音域外的音如何处理
+RANGE_MODES = {
+    "drop": "丢弃",
+    "fold": "折叠到最近的可弹八度",
+}
+
+
+class ChordIndex:
+    """按时间窗口预先分组的和弦索引: 和弦 i 的音符 = notes[offsets[i]:offsets[i+1]]"""
+
+    __slots__ = ("times", "offsets", "notes")
+
+    def __init__(self):
+        self.times = array('d')  # 和弦起始的 MIDI 时间(秒，未按速度缩放)
+        self.offsets = array('I', [0])
+        self.notes = array('B')
+
+    def __len__(self):
+        return len(self.times)
+
+    def chord(self, i):
+        return self.notes[self.offsets[i]:self.offsets[i + 1]]
+
+    @classmethod
+    def build(cls, notes, window):
+        """notes: 按时间排序的 (t, note)；window: MIDI 时间下的合并窗口"""
+        index = cls()
+        idx = 0
+        total = len(notes)
+        while idx < total:
+            start = notes[idx][0]
+            index.times.append(start)
+            while idx < total and notes[idx][0] - start < window:
+                index.notes.append(notes[idx][1])
+                idx += 1
+            index.offsets.append(len(index.notes))
+        return index
+
+    def deduped(self):
+        """同一和弦里的重复音只留第一个，返回 (新索引, 去掉的音符数)"""
+        index = ChordIndex()
+        index.times = array('d', self.times)
+        for i in range(len(self)):
+            index.notes.extend(dict.fromkeys(self.chord(i)))
+            index.offsets.append(len(index.notes))
+        return index, len(self.notes) - len(index.notes)
+
+
+def reduce_chord(notes, max_polyphony, policy="melody"):
+    """按策略把一个和弦削减到 max_polyphony 个音，返回 (保留的音符, 丢弃数)
+
+    同音只弹一次，去重不算丢弃；丢弃数只统计被复音上限截掉的音。
+    """
+    unique = list(dict.fromkeys(notes))
+    if len(unique) <= max_polyphony:
+        return unique, 0
+
+    if policy == "file":
+        return unique[:max_polyphony], len(unique) - max_polyphony
+
+    by_pitch = sorted(unique, reverse=True)
+    priority = [by_pitch[0]]
+    if policy == "bass" and max_polyphony > 1:
+        priority.append(by_pitch[-1])
+
+    # 其余从高到低，八度重复的音排到最后
+    classes = {n % 12 for n in priority}
+    fresh, doubled = [], []
+    for n in by_pitch[1:-1] if policy == "bass" else by_pitch[1:]:
+        if n % 12 in classes:
+            doubled.append(n)
+        else:
+            classes.add(n % 12)
+            fresh.append(n)
+
+    chosen = set((priority + fresh + doubled)[:max_polyphony])
+    # 保持原始先后顺序，竖琴踏板等状态依赖于此
+    kept = [n for n in unique if n in chosen]
+    return kept, len(unique) - len(kept)
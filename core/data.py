@@ -1,178 +1,310 @@
-import json
+import hashlib
 import os
+import time
 import traceback
 from urllib import request, error
-from urllib.parse import urljoin, quote, urlsplit, urlunsplit
-from PyQt6.QtCore import QObject, pyqtSignal, QSettings, QThread
+from PyQt6.QtCore import QObject, pyqtSignal, QSettings, QThread, QCoreApplication, QTimer
+
+from core import store
+from core.downloads import DownloadManager
+from core.favorites import FavoritesStore
+from core.library import diff_library, load_index, parse_library, save_index
+from core.stats import save_report
 
 DEFAULT_SOURCE_URL = "https://gitee.com/hualahuala1/midi-collection/raw/master/music_list.json"
+FAVORITE_FLUSH_MS = 300  # 批量下载完成的曲目攒一会儿再一次写入
 
 
 class LibraryFetchWorker(QThread):
-    success = pyqtSignal(list)
+    success = pyqtSignal(list, dict)  # [曲目列表, 校验信息]
+    not_modified = pyqtSignal(dict)  # [校验信息]
     failed = pyqtSignal(str)
 
-    def __init__(self, url):
+    def __init__(self, url, validators=None):
         super().__init__()
         self.url = url
+        self.validators = validators or {}
 
     def run(self):
         print(f"[DEBUG]正在请求音乐库 URL: {self.url}")
         try:
-            http_request = request.Request(self.url, headers={'User-Agent': 'Mozilla/5.0'})
-
-            with request.urlopen(http_request, timeout=10) as response:
-                response_content = response.read().decode('utf-8').strip()
-
-                if not response_content:
-                    raise ValueError("服务器返回了空内容")
-                if response_content.lstrip().startswith("<"):
-                    raise ValueError("返回内容看起来像HTML而不是JSON。")
-
-                library_data = json.loads(response_content)
-
-            base_url = self.url.rsplit('/', 1)[0] + '/'
-            for song in library_data:
-                if not song['file'].startswith('http'):
-                    song['file_url'] = urljoin(base_url, song['file'])
-                else:
-                    song['file_url'] = song['file']
-
+            headers = {'User-Agent': 'Mozilla/5.0'}
+            if self.validators.get('etag'):
+                headers['If-None-Match'] = self.validators['etag']
+            if self.validators.get('last_modified'):
+                headers['If-Modified-Since'] = self.validators['last_modified']
+            http_request = request.Request(self.url, headers=headers)
+
+            try:
+                with request.urlopen(http_request, timeout=10) as response:
+                    raw = response.read()
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+            except error.HTTPError as e:
+                if e.code != 304:
+                    raise
+                print("[DEBUG] 音乐库未变化(304)")
+                self.not_modified.emit(dict(self.validators))
+                return
+
+            validators = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'sha256': hashlib.sha256(raw).hexdigest(),
+            }
+            if validators['sha256'] == self.validators.get('sha256'):
+                # 服务器不支持条件请求时按内容判断
+                print("[DEBUG] 音乐库内容未变化")
+                self.not_modified.emit(validators)
+                return
+
+            library_data = parse_library(raw, self.url)
             print(f"[DEBUG] 解析成功，共 {len(library_data)} 首曲目")
-            self.success.emit(library_data)
+            self.success.emit(library_data, validators)
 
         except Exception as e:
             traceback.print_exc()
             self.failed.emit(f"无法连接音乐库: {str(e)}")
 
 
-class MidiDownloadWorker(QThread):
-    success = pyqtSignal(str, dict)
-    failed = pyqtSignal(str)
-
-    def __init__(self, song_data):
-        super().__init__()
-        self.song_data = song_data
-
-    def run(self):
-        title = self.song_data.get('title', '未知')
-        print(f"[DEBUG] 开始下载: {title}")
-        try:
-            download_dir = "downloads"
-            if not os.path.exists(download_dir):
-                os.makedirs(download_dir)
-
-            filename = f"{title}.mid"
-            filename = "".join([c for c in filename if c not in r'<>:"/\|?*']).strip()
-            if not filename or filename == '.mid':
-                filename = "untitled.mid"
-            save_path = os.path.join(os.getcwd(), download_dir, filename)
-
-            url = self.song_data['file_url']
-            split_result = urlsplit(url)
-            encoded_path = quote(split_result.path, safe='/')
-            safe_url = urlunsplit((
-                split_result.scheme,
-                split_result.netloc,
-                encoded_path,
-                split_result.query,
-                split_result.fragment
-            ))
-
-            http_request = request.Request(safe_url, headers={'User-Agent': 'Mozilla/5.0'})
-            with request.urlopen(http_request, timeout=15) as response:
-                file_content = response.read()
-                if file_content.lstrip().startswith(b"<"):
-                    raise ValueError("下载内容无效")
-                with open(save_path, 'wb') as f:
-                    f.write(file_content)
-
-            self.success.emit(save_path, self.song_data)
-        except Exception as e:
-            traceback.print_exc()
-            self.failed.emit(f"下载失败: {str(e)}")
-
-
 class DataManager(QObject):
     favorites_changed = pyqtSignal()
-    library_loaded = pyqtSignal(list) # [data_list]
+    library_loaded = pyqtSignal(list) # [data_list] 本地索引或首次拉取的完整列表
+    library_updated = pyqtSignal(dict) # [diff_library 的结果] 后台校验发现变化
+    library_unchanged = pyqtSignal() # 后台校验后列表没有变化
     load_failed = pyqtSignal(str) # [error_msg]
-    download_progress = pyqtSignal(int) #(0-100)
-    download_finished = pyqtSignal(bool, str) # [success, msg/path]
+    download_progress = pyqtSignal(str, int) # [file_url, 0-100]
+    download_finished = pyqtSignal(bool, str, dict) # [success, msg, song_data]，取消不发
+    bulk_finished = pyqtSignal(dict) # [DownloadBatch.summary()，另有 report_path]
 
     def __init__(self):
         super().__init__()
         self.settings = QSettings("AutoPiano", "UserConfig")
-        self._favorites = self._load_favorites()
+        self.favorites = FavoritesStore()
+        self.favorites.migrate_settings(self.settings, self._migrate_to_store)
+        self._pending_favorites = []
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(FAVORITE_FLUSH_MS)
+        self._flush_timer.timeout.connect(self._flush_favorites)
         self._online_cache = []
+        self._library_url = None
+        self._validators = {}
+        self._pending_url = None
+        self.fetching = False
         self.fetch_worker = None
-        self.download_worker = None
-
-    def _load_favorites(self):
-        try:
-            return json.loads(self.settings.value("favorites", "[]"))
-        except (json.JSONDecodeError, TypeError):
-            return []
-
-    def get_favorites(self):
-        return self._favorites
+        # 下载排队进线程池，界面通过 downloads 的信号显示队列
+        self.downloads = DownloadManager()
+        self.downloads.job_changed.connect(lambda job: self.download_progress.emit(job.url, job.percent))
+        self.downloads.job_finished.connect(self._on_download_finished)
+        self.downloads.batch_finished.connect(self._on_batch_finished)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.downloads.shutdown)
+            app.aboutToQuit.connect(self._flush_favorites)
+
+    @staticmethod
+    def _migrate_to_store(favorites):
+        """旧版收藏直接指向 downloads/ 或本地文件，复制进内容库后改为指向哈希"""
+        migrated = 0
+        for f in favorites:
+            if f.get('hash') or not os.path.exists(f['path']):
+                continue
+            try:
+                digest = store.put_file(f['path'], f['title'], source=f['path'])
+            except OSError as e:
+                print(f"[DEBUG] 收藏迁移失败 {f['path']}: {e}")
+                continue
+            f.setdefault('source', f['path'])
+            f['hash'] = digest
+            f['path'] = store.blob_path(digest)
+            migrated += 1
+        if migrated:
+            print(f"[DEBUG] {migrated} 个收藏已迁移到本地曲库")
+        return migrated
+
+    def get_favorites(self, text="", order="added"):
+        """text 在标题/歌手/来源里筛选，order 见 core.favorites.ORDERS"""
+        return self.favorites.query(text, order)
 
     def is_collected(self, title):
-        # 这里简单用标题判重
-        return any(f['title'] == title for f in self._favorites)
+        return self.favorites.contains(title) or any(f['title'] == title for f in self._pending_favorites)
 
-    def add_favorite(self, title, path, artist="未知", type_id="0", upload_time="未知"):
-
-        if self.is_collected(title): return False
-
-        item = {
+    def add_favorite(self, title, path, artist="未知", type_id="0", upload_time="未知", digest=None, source=None):
+        """返回收藏用的标题(同名不同内容时会改名)，已收藏时返回 None"""
+        added = self.add_favorites([{
             "title": title,
             "path": path,
+            "hash": digest,
+            "source": source,
             "artist": artist,
             "type": str(type_id),
             "upload_time": upload_time
-        }
-
-        self._favorites.append(item)
-        self.settings.setValue("favorites", json.dumps(self._favorites))
-        self.favorites_changed.emit()
-        return True
-
-    def remove_favorite(self, path):
-        self._favorites = [f for f in self._favorites if f['path'] != path]
-        self.settings.setValue("favorites", json.dumps(self._favorites))
-        self.favorites_changed.emit()
+        }])
+        return added[0] if added else None
+
+    def add_favorites(self, items):
+        """一个事务加入多条，返回实际加入的标题列表"""
+        added = self.favorites.add_many(items)
+        if added:
+            self.favorites_changed.emit()
+        return added
+
+    def _queue_favorite(self, item):
+        self._pending_favorites.append(item)
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def _flush_favorites(self):
+        self._flush_timer.stop()
+        pending, self._pending_favorites = self._pending_favorites, []
+        if pending:
+            self.add_favorites(pending)
+
+    def import_midi(self, path):
+        """导入本地文件: 复制进内容库后收藏，同一文件导入多次只存一份。
+        返回收藏用的标题，同名同内容已收藏时返回 None；读写失败抛出 OSError"""
+        title = os.path.basename(path)
+        digest = store.put_file(path, title, source=path)
+        return self.add_favorite(title, store.blob_path(digest), digest=digest, source=path)
+
+    def remove_favorites(self, titles):
+        # 库内文件可能被其它收藏共用，只删除收藏记录
+        if self.favorites.remove_many(titles):
+            self.favorites_changed.emit()
+
+    def remove_favorite(self, title):
+        self.remove_favorites([title])
 
     def fetch_library(self, url=None):
         if not url:
             url = self.settings.value("repo_url", DEFAULT_SOURCE_URL)
             if not url: url = DEFAULT_SOURCE_URL
-
-        self.fetch_worker = LibraryFetchWorker(url)
-        self.fetch_worker.success.connect(self._on_library_fetched)
-        self.fetch_worker.failed.connect(self.load_failed.emit)
+        if self.fetch_worker is not None and self.fetch_worker.isRunning():
+            # 上一次请求结束后再处理，不中途替换正在运行的线程
+            self._pending_url = url if url != self._library_url else None
+            return
+
+        self.fetching = True
+        if url != self._library_url:
+            # 先显示本地索引，网络结果回来后再按差异更新
+            self._library_url = url
+            index = load_index(url)
+            self._online_cache = index['songs'] if index else []
+            self._validators = index or {}
+            if index:
+                print(f"[DEBUG] 使用本地曲库索引: {len(self._online_cache)} 首，上次校验 {index.get('checked')}")
+            self.library_loaded.emit(self._online_cache)
+
+        validators = {k: self._validators.get(k) for k in ('etag', 'last_modified', 'sha256')}
+        self.fetch_worker = LibraryFetchWorker(url, validators)
+        self.fetch_worker.success.connect(lambda data, v: self._on_library_fetched(url, data, v))
+        self.fetch_worker.not_modified.connect(lambda v: self._on_library_not_modified(url, v))
+        self.fetch_worker.failed.connect(self._on_library_failed)
+        self.fetch_worker.finished.connect(self._on_fetch_finished)
         self.fetch_worker.start()
 
-    def _on_library_fetched(self, library_data):
+    def get_library(self):
+        return self._online_cache
+
+    def _on_fetch_finished(self):
+        self.fetching = False
+        pending, self._pending_url = self._pending_url, None
+        if pending:
+            self.fetch_worker.wait()
+            self.fetch_library(pending)
+
+    def _on_library_fetched(self, url, library_data, validators):
+        if self._pending_url:
+            return
+        self.fetching = False
+        old = self._online_cache
         self._online_cache = library_data
-        self.library_loaded.emit(library_data)
+        self._validators = validators
+        save_index(url, library_data, validators)
+        if not old:
+            self.library_loaded.emit(library_data)
+            return
+        delta = diff_library(old, library_data)
+        print(f"[DEBUG] 曲库变化: 新增 {len(delta['added'])}，修改 {len(delta['changed'])}，删除 {len(delta['removed'])}")
+        if delta['added'] or delta['changed'] or delta['removed']:
+            self.library_updated.emit(delta)
+        else:
+            self.library_unchanged.emit()
+
+    def _on_library_not_modified(self, url, validators):
+        if self._pending_url:
+            return
+        self.fetching = False
+        if validators != {k: self._validators.get(k) for k in validators}:
+            self._validators = validators
+            save_index(url, self._online_cache, validators)
+        self.library_unchanged.emit()
+
+    def _on_library_failed(self, msg):
+        if self._pending_url:
+            return
+        self.fetching = False
+        self.load_failed.emit(msg)
 
     def download_midi(self, song_data):
-        self.download_worker = MidiDownloadWorker(song_data)
-        self.download_worker.success.connect(self._on_download_success)
-        self.download_worker.failed.connect(lambda msg: self.download_finished.emit(False, msg))
-        self.download_worker.start()
-
-    def _on_download_success(self, save_path, song_data):
-        title = song_data.get('title', '未知')
-        self.add_favorite(
-            title=title,
-            path=save_path,
-            artist=song_data.get('artist', '未知'),
-            type_id=song_data.get('type', '0'),
-            upload_time=song_data.get('upload_time', '未知')
-        )
-        self.download_finished.emit(True, f"已下载并收藏: {title}")
+        """加入下载队列，返回 DownloadJob；同一首正在下载时返回已有任务"""
+        return self.downloads.enqueue(song_data)
+
+    def download_many(self, songs, label):
+        """批量下载，已收藏或列表里重复的跳过。返回 DownloadBatch"""
+        collected = self.favorites.titles() | {f['title'] for f in self._pending_favorites}
+        seen = set()
+        todo, skipped = [], []
+        for song in songs:
+            title = song.get('title', '未知')
+            if title in collected or song['file_url'] in seen:
+                skipped.append(title)
+                continue
+            seen.add(song['file_url'])
+            todo.append(song)
+        return self.downloads.enqueue_many(todo, label, skipped)
+
+    def _on_batch_finished(self, batch):
+        self._flush_favorites()
+        summary = batch.summary()
+        print(f"[DEBUG] 批量下载结束 {summary['label']}: 下载 {summary['downloaded']}，失败 {len(summary['failed'])}，"
+              f"取消 {summary['cancelled']}，跳过 {len(summary['skipped'])}，耗时 {summary['elapsed_s']}s")
+        if batch.jobs:
+            try:
+                summary['report_path'] = save_report(summary, time.strftime(f"download-%Y%m%d-%H%M%S-{batch.id}.json"))
+            except OSError as e:
+                print(f"[DEBUG] 下载报告写入失败: {e}")
+        self.bulk_finished.emit(summary)
+
+    def _on_download_finished(self, job):
+        song_data = job.song
+        title = job.title
+        if job.state == "failed":
+            # 批量中的失败列在汇总里；汇总发出后重试的任务已脱离批量(见 DownloadManager.retry)，在这里单独报告
+            if job.batch is None:
+                self.download_finished.emit(False, f"下载失败: {job.error}", song_data)
+            return
+        if job.state != "done":
+            return
+        item = {
+            "title": title,
+            "path": job.dest,
+            "hash": job.digest,
+            "source": job.url,
+            "artist": song_data.get('artist', '未知'),
+            "type": str(song_data.get('type', '0')),
+            "upload_time": song_data.get('upload_time', '未知')
+        }
+        if job.batch is not None:
+            # 批量下载的曲目合并成一次写入，结果在汇总里统一报告
+            self._queue_favorite(item)
+            return
+        added = self.add_favorites([item])
+        if added:
+            self.download_finished.emit(True, f"已下载并收藏: {added[0]}", song_data)
+        else:
+            self.download_finished.emit(True, f"已在收藏中: {title}", song_data)
 
 
 _instance = None
@@ -0,0 +1,436 @@
+"""下载管理
+
+任务先进入队列，由固定大小的线程池依次执行；响应分块读取并写入同目录下的
+临时文件，完成后一次 rename 到目标路径，中途失败或取消不会留下半个文件。
+下载完成的文件放入内容寻址的本地库(core.store)，job.digest 为内容哈希。
+网络错误按 1s、2s、4s... 退避重试，取消在分块之间和退避等待中都能及时生效。
+
+每个下载线程对同一主机保持一条 HTTP/1.1 长连接，批量下载时不必每首都重新
+握手(HTTPS 尤其明显)；服务器关闭了空闲连接时自动重连一次。
+"""
+import http.client
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib import error
+from urllib.parse import quote, urljoin, urlsplit, urlunsplit
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from core import store
+
+MAX_WORKERS = 3
+MAX_ATTEMPTS = 3
+MAX_REDIRECTS = 5
+BACKOFF_S = 1.0
+CHUNK_SIZE = 64 * 1024
+TIMEOUT_S = 15
+PROGRESS_INTERVAL_S = 0.1  # 进度信号的最小间隔
+
+STATES = {
+    "queued": "等待中",
+    "running": "下载中",
+    "retrying": "等待重试",
+    "done": "完成",
+    "failed": "失败",
+    "cancelled": "已取消",
+}
+FINISHED = ("done", "failed", "cancelled")
+REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class DownloadCancelled(Exception):
+    pass
+
+
+class InvalidContent(ValueError):
+    """内容不对(如返回了网页)，重试也没用"""
+
+
+def safe_url(url):
+    # 路径里的中文、空格等需要转义
+    split_result = urlsplit(url)
+    return urlunsplit((split_result.scheme, split_result.netloc, quote(split_result.path, safe='/'),
+                       split_result.query, split_result.fragment))
+
+
+def is_retryable(exc):
+    if isinstance(exc, error.HTTPError):
+        return exc.code == 429 or exc.code >= 500
+    return isinstance(exc, (error.URLError, OSError, http.client.HTTPException)) and \
+        not isinstance(exc, InvalidContent)
+
+
+class HostConnections:
+    """按 (线程, 协议, 主机) 缓存 HTTP 连接。一条连接同一时间只给一个线程用"""
+
+    def __init__(self, timeout=TIMEOUT_S):
+        self.timeout = timeout
+        self.opened = 0  # 新建连接数，用来观察复用情况
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _table(self):
+        table = getattr(self._local, 'table', None)
+        if table is None:
+            table = self._local.table = {}
+        return table
+
+    def _connection(self, scheme, netloc):
+        table = self._table()
+        conn = table.get((scheme, netloc))
+        if conn is not None:
+            return conn, True
+        if scheme == 'https':
+            conn = http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        elif scheme == 'http':
+            conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+        else:
+            raise error.URLError(f"不支持的协议: {scheme}")
+        table[(scheme, netloc)] = conn
+        with self._lock:
+            self.opened += 1
+            self._all.append(conn)
+        return conn, False
+
+    def discard(self, url):
+        """连接状态不确定(读到一半出错、取消)时丢掉，下次重新建立"""
+        parts = urlsplit(url)
+        conn = self._table().pop((parts.scheme, parts.netloc), None)
+        if conn is not None:
+            conn.close()
+
+    def open(self, url, headers=None):
+        """GET url，跟随重定向，返回状态 200 的响应；其它状态抛出 HTTPError"""
+        headers = {'User-Agent': 'Mozilla/5.0', **(headers or {})}
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            path = parts.path or '/'
+            if parts.query:
+                path += '?' + parts.query
+            conn, reused = self._connection(parts.scheme, parts.netloc)
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # 空闲长连接可能已被服务器关闭，换一条新连接重试一次
+                self.discard(url)
+                if not reused:
+                    raise
+                conn, _ = self._connection(parts.scheme, parts.netloc)
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+            except Exception:
+                self.discard(url)
+                raise
+
+            if response.status == 200:
+                response.url = url
+                return response
+            response.read()  # 读完才能复用连接
+            if response.status in REDIRECTS and response.getheader('Location'):
+                url = safe_url(urljoin(url, response.getheader('Location')))
+                continue
+            raise error.HTTPError(url, response.status, response.reason, response.headers, None)
+        raise error.URLError("重定向次数过多")
+
+    def close(self):
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            conn.close()
+
+
+def download_file(url, dest, progress=None, cancelled=None, connections=None, chunk_size=CHUNK_SIZE):
+    """分块下载到 dest。progress(已收字节, 总字节或 0)；cancelled() 为真时抛出 DownloadCancelled。
+    connections 为 HostConnections，不传时单独建一条连接"""
+    own = connections is None
+    if own:
+        connections = HostConnections()
+    url = safe_url(url)
+    tmp_path = f"{dest}.{threading.get_ident()}.part"
+    try:
+        response = connections.open(url)
+        url = response.url
+        with open(tmp_path, 'wb') as f:
+            total = int(response.headers.get('Content-Length') or 0)
+            received = 0
+            while True:
+                if cancelled and cancelled():
+                    raise DownloadCancelled()
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                if not received and chunk.lstrip().startswith(b"<"):
+                    raise InvalidContent("下载内容无效")
+                f.write(chunk)
+                received += len(chunk)
+                if progress:
+                    progress(received, total)
+            if not received:
+                raise InvalidContent("下载内容为空")
+            if total and received < total:
+                raise http.client.IncompleteRead(b"", total - received)
+        os.replace(tmp_path, dest)
+        return received
+    except BaseException:
+        # 响应没读完，连接不能再用
+        connections.discard(url)
+        raise
+    finally:
+        if own:
+            connections.close()
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+class DownloadJob:
+    _ids = itertools.count(1)
+
+    def __init__(self, song, batch=None):
+        self.id = next(self._ids)
+        self.song = song
+        self.batch = batch
+        self.title = song.get('title', '未知')
+        self.url = song['file_url']
+        self.dest = None  # 完成后为库内路径
+        self.digest = None
+        self.state = "queued"
+        self.received = 0
+        self.total = 0
+        self.attempts = 0
+        self.error = ""
+        self.cancel_event = threading.Event()
+
+    @property
+    def finished(self):
+        return self.state in FINISHED
+
+    @property
+    def percent(self):
+        return int(self.received * 100 / self.total) if self.total else 0
+
+    @property
+    def state_text(self):
+        text = STATES[self.state]
+        if self.state == "running" and self.total:
+            text += f" {self.percent}%"
+        elif self.state == "retrying":
+            text += f" ({self.attempts}/{MAX_ATTEMPTS})"
+        return text
+
+
+class DownloadBatch:
+    """一次批量下载: 加入队列的任务与跳过的曲目，全部任务结束后汇总一次"""
+    _ids = itertools.count(1)
+
+    def __init__(self, label, skipped=()):
+        self.id = next(self._ids)
+        self.label = label
+        self.jobs = []
+        self.skipped = list(skipped)  # 跳过的曲目标题
+        self.started = time.time()
+        self.sealed = False  # 全部加入队列之后才可能结束
+        self.connections = 0  # 期间新建的连接数
+        self.reported = False
+
+    @property
+    def finished(self):
+        return all(job.finished for job in self.jobs)
+
+    @property
+    def done_count(self):
+        return sum(job.finished for job in self.jobs)
+
+    def summary(self):
+        done = [job for job in self.jobs if job.state == "done"]
+        return {
+            'label': self.label,
+            'created': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            'elapsed_s': round(time.time() - self.started, 2),
+            'requested': len(self.jobs) + len(self.skipped),
+            'downloaded': len(done),
+            'bytes': sum(job.received for job in done),
+            'failed': [{'title': job.title, 'error': job.error} for job in self.jobs if job.state == "failed"],
+            'cancelled': sum(job.state == "cancelled" for job in self.jobs),
+            'skipped': self.skipped,
+            'connections': self.connections,
+        }
+
+
+class DownloadManager(QObject):
+    """信号都在工作线程里发出，连接到界面时 Qt 自动排队到主线程"""
+
+    job_added = pyqtSignal(object)  # DownloadJob
+    job_changed = pyqtSignal(object)  # 状态或进度变化
+    job_finished = pyqtSignal(object)
+    job_removed = pyqtSignal(object)
+    batch_finished = pyqtSignal(object)  # DownloadBatch
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        super().__init__()
+        self.connections = HostConnections()
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download")
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def latest_for(self, url):
+        """该地址最近的一个任务，没有返回 None"""
+        with self._lock:
+            return next((job for job in reversed(self._jobs.values()) if job.url == url), None)
+
+    def active_for(self, url):
+        job = self.latest_for(url)
+        return job if job is not None and not job.finished else None
+
+    def enqueue(self, song, batch=None):
+        """加入队列；同一地址已在下载中时返回已有的任务"""
+        job = self.active_for(song['file_url'])
+        if job:
+            return job
+        job = DownloadJob(song, batch)
+        if batch is not None:
+            batch.jobs.append(job)
+        with self._lock:
+            self._jobs[job.id] = job
+        self.job_added.emit(job)
+        self._pool.submit(self._run, job)
+        return job
+
+    def enqueue_many(self, songs, label, skipped=()):
+        """批量加入，已在下载中的算作跳过。返回 DownloadBatch，结束时发出 batch_finished"""
+        batch = DownloadBatch(label, skipped)
+        batch.connections = self.connections.opened
+        for song in songs:
+            if self.active_for(song['file_url']):
+                batch.skipped.append(song.get('title', '未知'))
+            else:
+                self.enqueue(song, batch)
+        batch.sealed = True
+        print(f"[DEBUG] 批量下载 {label}: 加入 {len(batch.jobs)} 首，跳过 {len(batch.skipped)} 首")
+        self._check_batch(batch)
+        return batch
+
+    def cancel(self, job_id):
+        # 检查和标记与工作线程开始下载(_start)在同一把锁下，不会标记了取消却仍在下载
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.finished:
+                return
+            job.cancel_event.set()
+            queued = job.state == "queued"
+        if queued:
+            # 还没开始的任务直接标记，线程池轮到它时跳过
+            self._finish(job, "cancelled")
+
+    def retry(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job or job.state not in ("failed", "cancelled"):
+                return
+            job.state, job.error, job.attempts = "queued", "", 0
+            job.received = job.total = 0
+            job.cancel_event = threading.Event()
+            if job.batch is not None and job.batch.reported:
+                # 批量汇总已经发出，重试的任务按单首下载处理和报告
+                job.batch = None
+        self.job_changed.emit(job)
+        self._pool.submit(self._run, job)
+
+    def remove_finished(self):
+        with self._lock:
+            done = [job for job in self._jobs.values() if job.finished]
+            for job in done:
+                del self._jobs[job.id]
+        for job in done:
+            self.job_removed.emit(job)
+
+    def cancel_all(self):
+        for job in self.jobs():
+            self.cancel(job.id)
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel_event.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.connections.close()
+
+    def _finish(self, job, state, msg=""):
+        with self._lock:
+            if job.finished:
+                return
+            job.state = state
+            job.error = msg
+        self.job_finished.emit(job)
+        if job.batch is not None:
+            self._check_batch(job.batch)
+
+    def _check_batch(self, batch):
+        with self._lock:
+            if batch.reported or not batch.sealed or not batch.finished:
+                return
+            batch.reported = True
+        batch.connections = self.connections.opened - batch.connections
+        self.batch_finished.emit(batch)
+
+    def _start(self, job):
+        """工作线程开始一次尝试: 已取消或已结束返回 False，否则标记为下载中"""
+        with self._lock:
+            if job.finished or job.cancel_event.is_set():
+                return False
+            job.attempts += 1
+            job.state = "running"
+            job.received = job.total = 0
+        return True
+
+    def _run(self, job):
+        last_emit = [0.0]
+
+        def progress(received, total):
+            job.received, job.total = received, total
+            now = time.monotonic()
+            if now - last_emit[0] >= PROGRESS_INTERVAL_S or received == total:
+                last_emit[0] = now
+                self.job_changed.emit(job)
+
+        print(f"[DEBUG] 开始下载: {job.title}")
+        while True:
+            if not self._start(job):
+                self._finish(job, "cancelled")
+                return
+            self.job_changed.emit(job)
+            try:
+                tmp_path = store.temp_path(f"{job.id}{store.BLOB_EXT}")
+                download_file(job.url, tmp_path, progress, job.cancel_event.is_set, self.connections)
+                if job.cancel_event.is_set():
+                    # 下载完的一刻被取消，不入库
+                    os.remove(tmp_path)
+                    raise DownloadCancelled()
+                job.digest = store.put_file(tmp_path, job.title, source=job.url, move=True)
+                job.dest = store.blob_path(job.digest)
+                self._finish(job, "done")
+                return
+            except DownloadCancelled:
+                self._finish(job, "cancelled")
+                return
+            except Exception as e:
+                print(f"[DEBUG] 下载失败({job.attempts}/{MAX_ATTEMPTS}) {job.title}: {e}")
+                if not is_retryable(e) or job.attempts >= MAX_ATTEMPTS:
+                    self._finish(job, "failed", str(e))
+                    return
+                job.state = "retrying"
+                job.error = str(e)
+                self.job_changed.emit(job)
+                if job.cancel_event.wait(BACKOFF_S * 2 ** (job.attempts - 1)):
+                    self._finish(job, "cancelled")
+                    return
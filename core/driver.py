@@ -1,40 +1,197 @@
+import sys
+import time
 import ctypes
+from abc import ABC, abstractmethod
 from ctypes import wintypes
 
+from core.window import WindowTracker, pack_lparam
+
 # Windows API Constants
 WM_LBUTTONDOWN = 0x0201
 WM_LBUTTONUP = 0x0202
 MK_LBUTTON = 0x0001  # 标记左键按下状态
 
 
-class POINT(ctypes.Structure):
-    _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
+_user32_dll = None
+
+
+def _user32():
+    # 延迟加载，非 Windows 平台也能导入本模块
+    global _user32_dll
+    if _user32_dll is None:
+        _user32_dll = ctypes.windll.user32
+    return _user32_dll
+
+
+class InputBackend(ABC):
+    """演奏输入后端: MidiPlayer 每个批次调用一次 click_batch"""
+
+    name = "base"
+    requires_window = False
+
+    def __init__(self):
+        self.hwnd = None
+        self.lost = False  # 目标窗口已失效
+
+    def bind(self, hwnd):
+        self.hwnd = hwnd
+        self.lost = False
+
+    @abstractmethod
+    def screen_size(self) -> tuple[int, int]:
+        pass
+
+    def target_size(self) -> tuple[int, int]:
+        """乐器布局要缩放到的尺寸，即点击坐标所在空间的大小"""
+        return self.screen_size()
+
+    def poll_geometry(self) -> tuple[int, int] | None:
+        """检查窗口移动/缩放，target_size 改变时返回新尺寸"""
+        return None
+
+    def window_info(self) -> dict:
+        return {}
+
+    @abstractmethod
+    def click_batch(self, xs, ys, start, end, lparams=None) -> int:
+        """发送 xs[start:end], ys[start:end] 这一批点击，返回实际发送数。
+        lparams 为预先打包好的同一批坐标，提供时后端可以直接使用"""
+        pass
+
+
+class Win32Input(InputBackend):
+    name = "win32"
+    requires_window = True
+
+    def __init__(self):
+        super().__init__()
+        self._user32 = _user32()
+        self._post = self._user32.PostMessageW
+        self.tracker = None
+
+    def bind(self, hwnd):
+        if hwnd != self.hwnd or self.tracker is None:
+            self.tracker = WindowTracker(self._user32, hwnd) if hwnd else None
+        super().bind(hwnd)
+
+    def screen_size(self):
+        return WinInput.screen_size()
+
+    def target_size(self):
+        # 坐标直接编译到客户区，窗口模式也按游戏画面实际大小缩放
+        geometry = self.tracker.geometry if self.tracker else None
+        if geometry and geometry.width and geometry.height:
+            return geometry.size
+        return self.screen_size()
+
+    def poll_geometry(self):
+        if not self.tracker:
+            return None
+        before = self.target_size()
+        _, resized = self.tracker.poll()
+        geometry = self.tracker.geometry
+        if geometry is None:
+            self.lost = True
+            return None
+        # 最小化时客户区为 0，保持原尺寸
+        if resized and geometry.width and geometry.height and geometry.size != before:
+            return geometry.size
+        return None
+
+    def window_info(self):
+        geometry = self.tracker.geometry if self.tracker else None
+        return geometry.to_dict() if geometry else {}
+
+    def click_batch(self, xs, ys, start, end, lparams=None):
+        hwnd = self.hwnd
+        if not hwnd or self.lost:
+            return 0
+
+        # 坐标已是客户区坐标，热路径只发消息
+        post = self._post
+        for k in range(start, end):
+            lparam = lparams[k] if lparams is not None else pack_lparam(xs[k], ys[k])
+            if not post(hwnd, WM_LBUTTONDOWN, MK_LBUTTON, lparam):
+                # 发送失败才检查窗口，正常情况下不做额外调用
+                if not self._user32.IsWindow(hwnd):
+                    self.lost = True
+                return k - start
+            post(hwnd, WM_LBUTTONUP, 0, lparam)
+        return end - start
+
+
+class NullInput(InputBackend):
+    """丢弃所有点击，只计数。用于基准测试与无界面运行"""
+
+    name = "null"
+
+    def __init__(self, size=(1920, 1080)):
+        super().__init__()
+        self.size = size
+        self.batches = 0
+        self.clicks = 0
+
+    def screen_size(self):
+        return self.size
+
+    def click_batch(self, xs, ys, start, end, lparams=None):
+        self.batches += 1
+        self.clicks += end - start
+        return end - start
+
+
+class RecordingInput(InputBackend):
+    """记录每个批次的发送时间与坐标，便于测试回放结果"""
+
+    name = "recording"
+
+    def __init__(self, size=(1920, 1080)):
+        super().__init__()
+        self.size = size
+        self.events: list[tuple[float, list[tuple[int, int]]]] = []
+
+    def screen_size(self):
+        return self.size
+
+    def click_batch(self, xs, ys, start, end, lparams=None):
+        self.events.append((time.perf_counter(), [(xs[k], ys[k]) for k in range(start, end)]))
+        return end - start
+
+    def clicks(self):
+        return [click for _, batch in self.events for click in batch]
+
+
+def default_backend() -> InputBackend:
+    if sys.platform == 'win32':
+        return Win32Input()
+    return NullInput()
 
 
 class WinInput:
-    _user32 = ctypes.windll.user32
 
     @classmethod
     def screen_size(cls):
+        user32 = _user32()
         return (
-            cls._user32.GetSystemMetrics(0),
-            cls._user32.GetSystemMetrics(1)
+            user32.GetSystemMetrics(0),
+            user32.GetSystemMetrics(1)
         )
 
     @classmethod
     def find_window(cls, title_part: str):
+        user32 = _user32()
         target_hwnd = None
         found_title = ""
 
         def callback(hwnd, _):
             nonlocal target_hwnd, found_title
-            if not cls._user32.IsWindowVisible(hwnd):
+            if not user32.IsWindowVisible(hwnd):
                 return True
-            length = cls._user32.GetWindowTextLengthW(hwnd)
+            length = user32.GetWindowTextLengthW(hwnd)
             if length == 0:
                 return True
             buff = ctypes.create_unicode_buffer(length + 1)
-            cls._user32.GetWindowTextW(hwnd, buff, length + 1)
+            user32.GetWindowTextW(hwnd, buff, length + 1)
 
             if title_part.lower() in buff.value.lower():
                 target_hwnd = hwnd
@@ -43,18 +200,5 @@ class WinInput:
             return True
 
         WNDENUMPROC = ctypes.WINFUNCTYPE(ctypes.c_bool, wintypes.HWND, ctypes.POINTER(ctypes.c_int))
-        cls._user32.EnumWindows(WNDENUMPROC(callback), 0)
+        user32.EnumWindows(WNDENUMPROC(callback), 0)
         return target_hwnd, found_title
-
-    @classmethod
-    def click(cls, hwnd, x, y):
-        if not hwnd or not cls._user32.IsWindow(hwnd):
-            return
-
-        pt = POINT(int(x), int(y))
-        if not cls._user32.ScreenToClient(hwnd, ctypes.byref(pt)):
-            return
-
-        lparam = (pt.y << 16) | (pt.x & 0xFFFF)
-        cls._user32.PostMessageW(hwnd, WM_LBUTTONDOWN, MK_LBUTTON, lparam)
-        cls._user32.PostMessageW(hwnd, WM_LBUTTONUP, 0, lparam)
\ No newline at end of file
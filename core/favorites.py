@@ -0,0 +1,143 @@
+"""收藏列表: SQLite 存储
+
+每次增删只写变化的行，批量增删在一个事务里完成；标题、路径、内容哈希都有
+索引，判断是否已收藏不再逐条扫描。标题是收藏的键，同名不同内容的曲子
+加入时改名为 "标题 (2)"、"标题 (3)"…，同名同内容的视为已收藏。旧版保存在 QSettings "favorites" 里的
+JSON 在第一次打开时导入，原值改存为 "favorites_backup"。
+"""
+import json
+import os
+import sqlite3
+import time
+
+FAVORITES_DB = "favorites.db"
+SCHEMA_VERSION = 1
+FIELDS = ("title", "path", "hash", "source", "artist", "type", "upload_time")
+
+ORDERS = {
+    "added": "收藏时间",
+    "title": "标题",
+    "artist": "歌手",
+    "upload_time": "上传时间",
+}
+_ORDER_SQL = {
+    "added": "id",
+    "title": "title COLLATE NOCASE, id",
+    "artist": "artist COLLATE NOCASE, title COLLATE NOCASE",
+    "upload_time": "upload_time = '未知', upload_time DESC, id",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS favorites (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE,
+    path TEXT NOT NULL,
+    hash TEXT,
+    source TEXT,
+    artist TEXT NOT NULL DEFAULT '未知',
+    type TEXT NOT NULL DEFAULT '0',
+    upload_time TEXT NOT NULL DEFAULT '未知',
+    added REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_favorites_path ON favorites(path);
+CREATE INDEX IF NOT EXISTS idx_favorites_hash ON favorites(hash);
+"""
+
+
+def _like(text):
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+class FavoritesStore:
+    def __init__(self, path=FAVORITES_DB):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.executescript(_SCHEMA)
+            self.conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM favorites").fetchone()[0]
+
+    def contains(self, title):
+        return self.conn.execute("SELECT 1 FROM favorites WHERE title = ?", (title,)).fetchone() is not None
+
+    def titles(self):
+        return {row[0] for row in self.conn.execute("SELECT title FROM favorites")}
+
+    def query(self, text="", order="added"):
+        """收藏列表，text 在标题/歌手/来源里查找(不区分大小写)，order 为 ORDERS 的键"""
+        sql = f"SELECT {', '.join(FIELDS)} FROM favorites"
+        args = []
+        words = text.split()
+        if words:
+            sql += " WHERE " + " AND ".join(
+                "(title LIKE ? ESCAPE '\\' OR artist LIKE ? ESCAPE '\\' OR source LIKE ? ESCAPE '\\')" for _ in words)
+            for word in words:
+                args += [_like(word)] * 3
+        sql += f" ORDER BY {_ORDER_SQL.get(order, _ORDER_SQL['added'])}"
+        return [dict(row) for row in self.conn.execute(sql, args)]
+
+    def _free_title(self, title, digest):
+        """title 被其它内容占用时依次尝试 "title (2)"…；同名同内容(或没有哈希的同名)已收藏时返回 None"""
+        candidate, n = title, 1
+        while True:
+            row = self.conn.execute("SELECT hash FROM favorites WHERE title = ?", (candidate,)).fetchone()
+            if row is None:
+                return candidate
+            if digest is None or row[0] == digest:
+                return None
+            n += 1
+            candidate = f"{title} ({n})"
+
+    def add_many(self, items):
+        """在一个事务里加入多条，已收藏的跳过。返回实际加入的标题列表(改名后的标题)"""
+        added = []
+        now = time.time()
+        with self.conn:
+            for item in items:
+                row = {field: item.get(field) for field in FIELDS}
+                row['artist'] = row['artist'] or "未知"
+                row['type'] = str(row['type'] or "0")
+                row['upload_time'] = row['upload_time'] or "未知"
+                row['title'] = self._free_title(row['title'], row['hash'])
+                if row['title'] is None:
+                    continue
+                cursor = self.conn.execute(
+                    f"INSERT OR IGNORE INTO favorites ({', '.join(FIELDS)}, added) "
+                    f"VALUES ({', '.join('?' * len(FIELDS))}, ?)",
+                    [row[field] for field in FIELDS] + [now])
+                if cursor.rowcount:
+                    added.append(row['title'])
+        return added
+
+    def remove_many(self, titles):
+        with self.conn:
+            cursor = self.conn.executemany("DELETE FROM favorites WHERE title = ?", [(t,) for t in titles])
+        return cursor.rowcount
+
+    def migrate_settings(self, settings, prepare=None):
+        """导入 QSettings 里的旧版 JSON 列表，prepare(list) 可在写入前修改记录。返回导入条数"""
+        raw = settings.value("favorites")
+        if raw is None:
+            return 0
+        try:
+            items = json.loads(raw)
+        except (json.JSONDecodeError, TypeError):
+            items = []
+        if prepare is not None:
+            prepare(items)
+        added = self.add_many(items)
+        settings.setValue("favorites_backup", raw)
+        settings.remove("favorites")
+        print(f"[DEBUG] 已从旧版配置导入 {len(added)} 个收藏")
+        return len(added)
@@ -0,0 +1,134 @@
+"""收藏文件的存在状态
+
+检查放在后台线程里做，界面线程不碰文件系统(网络盘上一次 stat 可能卡住很久)。
+收藏所在的目录(本地库的分片目录、导入文件的目录)由 QFileSystemWatcher 监视，
+目录有变化时只重新检查该目录下的收藏；目录本身不存在时监视最近的上级目录，
+目录重新出现后也能发现。监视不可靠的文件系统上另有定时全量检查兜底。
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QObject, pyqtSignal, QFileSystemWatcher, QTimer, QCoreApplication
+
+DEBOUNCE_MS = 200  # 目录连续变化时合并成一次检查
+RESCAN_INTERVAL_MS = 60000
+
+
+def watch_dir(path):
+    """path 所在目录；目录不存在时取最近的已存在上级目录"""
+    directory = os.path.dirname(os.path.abspath(path))
+    while not os.path.isdir(directory):
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+    return directory
+
+
+class FileStatusScanner(QObject):
+    status_changed = pyqtSignal(dict)  # {路径: 是否存在}，只包含状态变了的
+    _scanned = pyqtSignal(dict, dict)  # 工作线程 -> 界面线程: ({路径: 是否存在}, {路径: 监视目录})
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.paths = set()
+        self.status = {}  # 已检查过的路径 -> 是否存在
+        self._dir_of = {}  # 路径 -> 监视目录
+        self._by_dir = {}  # 监视目录 -> 路径集合
+        self._pending = set()
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_dir_changed)
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(DEBOUNCE_MS)
+        self._debounce.timeout.connect(self._flush)
+        self._rescan_timer = QTimer(self)
+        self._rescan_timer.setInterval(RESCAN_INTERVAL_MS)
+        self._rescan_timer.timeout.connect(self.rescan)
+        self._rescan_timer.start()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-status")
+        self._scanned.connect(self._apply)
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.shutdown)
+
+    def is_missing(self, path):
+        # 还没检查过的按存在处理
+        return self.status.get(path) is False
+
+    def watch(self, paths):
+        """设置要跟踪的路径，只有新加入的路径会被检查"""
+        paths = set(paths)
+        removed = self.paths - paths
+        added = paths - self.paths
+        self.paths = paths
+        for path in removed:
+            self.status.pop(path, None)
+            self._dir_of.pop(path, None)
+        if removed:
+            self._update_watcher()
+        if added:
+            self._submit(added)
+
+    def rescan(self):
+        if self.paths:
+            self._submit(self.paths)
+
+    def shutdown(self):
+        self._rescan_timer.stop()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _on_dir_changed(self, directory):
+        self._pending |= self._by_dir.get(directory, set())
+        self._debounce.start()
+
+    def _flush(self):
+        pending, self._pending = self._pending & self.paths, set()
+        if pending:
+            self._submit(pending)
+
+    def _submit(self, paths):
+        try:
+            self._pool.submit(self._scan, frozenset(paths))
+        except RuntimeError:
+            pass  # 已关闭
+
+    def _scan(self, paths):
+        # 工作线程
+        status = {}
+        dirs = {}
+        for path in paths:
+            status[path] = os.path.exists(path)
+            dirs[path] = watch_dir(path)
+        self._scanned.emit(status, dirs)
+
+    def _apply(self, status, dirs):
+        changed = {}
+        for path, exists in status.items():
+            if path not in self.paths:
+                continue  # 检查期间已被移除
+            before = self.status.get(path)
+            self.status[path] = exists
+            # 第一次检查时存在的不算变化，界面默认就按存在显示
+            if before != exists and (before is not None or not exists):
+                changed[path] = exists
+            if dirs.get(path):
+                self._dir_of[path] = dirs[path]
+            else:
+                self._dir_of.pop(path, None)
+        self._update_watcher()
+        if changed:
+            self.status_changed.emit(changed)
+
+    def _update_watcher(self):
+        by_dir = {}
+        for path, directory in self._dir_of.items():
+            by_dir.setdefault(directory, set()).add(path)
+        old, new = set(self._by_dir), set(by_dir)
+        self._by_dir = by_dir
+        if old - new:
+            self._watcher.removePaths(list(old - new))
+        if new - old:
+            failed = self._watcher.addPaths(list(new - old))
+            if failed:
+                print(f"[DEBUG] 无法监视目录: {failed}")
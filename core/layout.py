@@ -0,0 +1,157 @@
+import hashlib
+import importlib
+import json
+import os
+import sys
+import threading
+
+# 打包后的单文件程序把数据文件解压到 sys._MEIPASS
+_BASE_DIR = getattr(sys, '_MEIPASS', None) or os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAYOUT_DIR = os.path.join(_BASE_DIR, "layouts")
+LAYOUT_FORMAT = 1
+
+# 布局引擎: 名称 -> (模块, 类)，选中时才导入。新增引擎时同步 build.yml 的 --hidden-import
+ENGINES = {
+    "keys": ("profiles.keys", "KeyLayoutProfile"),
+    "pedal_harp": ("profiles.harp", "HarpProfile"),
+}
+
+_layouts = {}
+_layouts_lock = threading.Lock()
+
+
+class LayoutError(ValueError):
+    pass
+
+
+class Layout:
+    """校验过的乐器布局描述，坐标按 reference 分辨率给出"""
+
+    __slots__ = ("id", "name", "order", "engine", "ref_w", "ref_h", "data", "digest", "path")
+
+    def __init__(self, data, digest, path):
+        self.id = data['id']
+        self.name = data['name']
+        self.order = data.get('order', 0)
+        self.engine = data['engine']
+        self.ref_w = data['reference']['width']
+        self.ref_h = data['reference']['height']
+        self.data = data
+        self.digest = digest
+        self.path = path
+
+    def scale(self, w, h):
+        return w / self.ref_w, h / self.ref_h
+
+
+def fail(path, msg):
+    raise LayoutError(f"乐器布局 {os.path.basename(path)} 无效: {msg}")
+
+
+def check_int(path, value, field, lo=None, hi=None):
+    if not isinstance(value, int) or isinstance(value, bool):
+        fail(path, f"{field} 应为整数")
+    if (lo is not None and value < lo) or (hi is not None and value > hi):
+        fail(path, f"{field} 超出范围 [{lo}, {hi}]")
+    return value
+
+
+def check_list(path, value, field, length=None, lo=None, hi=None):
+    if not isinstance(value, list) or not value:
+        fail(path, f"{field} 应为非空数组")
+    if length is not None and len(value) != length:
+        fail(path, f"{field} 应有 {length} 项")
+    for i, item in enumerate(value):
+        check_int(path, item, f"{field}[{i}]", lo, hi)
+    return value
+
+
+def check_note_range(path, value, field):
+    check_list(path, value, field, 2, 0, 127)
+    if value[0] > value[1]:
+        fail(path, f"{field} 下限大于上限")
+    return value
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    try:
+        data = json.loads(raw.decode('utf-8'))
+    except ValueError as e:
+        fail(path, f"JSON 解析失败: {e}")
+    if not isinstance(data, dict):
+        fail(path, "顶层应为对象")
+    return data, hashlib.sha256(raw).hexdigest()
+
+
+def _validate(data, path):
+    if data.get('format') != LAYOUT_FORMAT:
+        fail(path, f"不支持的格式版本 {data.get('format')!r}")
+    for field in ('id', 'name', 'engine'):
+        if not isinstance(data.get(field), str) or not data[field]:
+            fail(path, f"缺少 {field}")
+    if data['engine'] not in ENGINES:
+        fail(path, f"未知引擎 {data['engine']!r}")
+    ref = data.get('reference')
+    if not isinstance(ref, dict):
+        fail(path, "缺少 reference")
+    check_int(path, ref.get('width'), "reference.width", 1)
+    check_int(path, ref.get('height'), "reference.height", 1)
+
+
+def layout_index(directory=LAYOUT_DIR):
+    """列出可用布局 [(id, 名称)]，按 order 排序。只读取名称，不校验也不导入引擎"""
+    entries = []
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        return entries
+    for filename in names:
+        if not filename.endswith(".json"):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entries.append((data.get('order', 0), os.path.splitext(filename)[0], data['name']))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"[DEBUG] 跳过乐器布局 {filename}: {e}")
+    entries.sort(key=lambda e: (e[0], e[1]))
+    return [(layout_id, name) for _, layout_id, name in entries]
+
+
+def load_layout(layout_id, directory=LAYOUT_DIR):
+    """读取并校验布局；文件未改动时直接返回缓存"""
+    path = os.path.join(directory, f"{layout_id}.json")
+    try:
+        st = os.stat(path)
+    except OSError:
+        raise LayoutError(f"找不到乐器布局: {layout_id}")
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    with _layouts_lock:
+        cached = _layouts.get(path)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+    data, digest = _read(path)
+    _validate(data, path)
+    if data['id'] != layout_id:
+        fail(path, f"id {data['id']!r} 与文件名不一致")
+    layout = Layout(data, digest, path)
+    engine_class(layout.engine).validate(layout)
+
+    with _layouts_lock:
+        _layouts[path] = (stamp, layout)
+    return layout
+
+
+def engine_class(engine):
+    module_name, class_name = ENGINES[engine]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def create_profile(layout_id, directory=LAYOUT_DIR):
+    layout = load_layout(layout_id, directory)
+    return engine_class(layout.engine)(layout)
@@ -0,0 +1,91 @@
+"""在线曲库的本地索引
+
+上次拉取的列表保存在 cache/library 下，启动时直接显示；之后后台带上
+ETag / Last-Modified 重新校验，服务器不支持时用内容 SHA-256 判断是否变化。
+列表有变化时只把新增、修改、删除的条目交给界面。
+"""
+import hashlib
+import json
+import os
+import time
+from urllib.parse import urljoin
+
+INDEX_DIR = os.path.join("cache", "library")
+INDEX_VERSION = 1
+
+
+def song_key(song):
+    # 同一首曲子的文件地址不变；标题改了视为删旧加新
+    return f"{song.get('file', '')}|{song.get('title', '')}"
+
+
+def index_path(url):
+    return os.path.join(INDEX_DIR, hashlib.sha256(url.encode('utf-8')).hexdigest()[:16] + ".json")
+
+
+def parse_library(raw, url):
+    """music_list.json 的原始内容 -> 曲目列表，补全 file_url"""
+    content = raw.decode('utf-8').strip()
+    if not content:
+        raise ValueError("服务器返回了空内容")
+    if content.startswith("<"):
+        raise ValueError("返回内容看起来像HTML而不是JSON。")
+    library_data = json.loads(content)
+
+    base_url = url.rsplit('/', 1)[0] + '/'
+    for song in library_data:
+        if not song['file'].startswith('http'):
+            song['file_url'] = urljoin(base_url, song['file'])
+        else:
+            song['file_url'] = song['file']
+    return library_data
+
+
+def load_index(url):
+    """读取本地索引 {'etag', 'last_modified', 'sha256', 'checked', 'songs'}，没有或损坏返回 None"""
+    try:
+        with open(index_path(url), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_VERSION or data.get('url') != url or not isinstance(data.get('songs'), list):
+            return None
+        return data
+    except (OSError, ValueError):
+        return None
+
+
+def save_index(url, songs, validators):
+    path = index_path(url)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        'version': INDEX_VERSION,
+        'url': url,
+        'etag': validators.get('etag'),
+        'last_modified': validators.get('last_modified'),
+        'sha256': validators.get('sha256'),
+        'checked': time.strftime("%Y-%m-%d %H:%M:%S"),
+        'songs': songs,
+    }
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[DEBUG] 曲库索引写入失败: {e}")
+
+
+def diff_library(old, new):
+    """对比两次的曲目列表，返回 {'songs': 新列表, 'added': [...], 'changed': [...], 'removed': [键...]}"""
+    before = {song_key(song): song for song in old}
+    after_keys = set()
+    added, changed = [], []
+    for song in new:
+        key = song_key(song)
+        after_keys.add(key)
+        prev = before.get(key)
+        if prev is None:
+            added.append(song)
+        elif prev != song:
+            changed.append(song)
+    removed = [key for key in before if key not in after_keys]
+    return {'songs': new, 'added': added, 'changed': changed, 'removed': removed}
@@ -0,0 +1,155 @@
+import hashlib
+import heapq
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+import mido
+
+from core.smf import scan_notes
+from core.store import digest_of
+
+DEFAULT_TEMPO = 500000
+
+_hash_memo = {}
+_table_cache = OrderedDict()
+_table_lock = threading.Lock()
+TABLE_CACHE_SIZE = 4
+
+
+def file_hash(path):
+    # 库内文件名即哈希；其它文件未改动时不重复计算
+    digest = digest_of(path)
+    if digest:
+        return digest
+    st = os.stat(path)
+    memo_key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+    digest = _hash_memo.get(memo_key)
+    if digest:
+        return digest
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    _hash_memo[memo_key] = digest
+    return digest
+
+
+def track_key(track, channel):
+    return f"{track}:{channel}"
+
+
+def parse_track_keys(keys):
+    """["0:1", ...] -> {(0, 1), ...}；None 表示全部音轨"""
+    if keys is None:
+        return None
+    return {tuple(int(part) for part in key.split(':')) for key in keys}
+
+
+class NoteTable:
+    """解析后的音符表: 按时间排序，与音高偏移、乐器无关"""
+
+    __slots__ = ("times", "tracks", "channels", "notes", "bars", "track_names")
+
+    def __init__(self):
+        self.times = array('d')
+        self.tracks = array('H')
+        self.channels = array('B')
+        self.notes = array('B')
+        self.bars = array('d', [0.0])  # 每小节起始的 MIDI 时间
+        self.track_names = []
+
+    def __len__(self):
+        return len(self.times)
+
+    def select(self, tracks=None):
+        """按 (音轨, 通道) 过滤，产生 (时间, 音符)"""
+        selected = parse_track_keys(tracks)
+        if selected is None:
+            yield from zip(self.times, self.notes)
+            return
+        for t, tr, ch, note in zip(self.times, self.tracks, self.channels, self.notes):
+            if (tr, ch) in selected:
+                yield t, note
+
+
+def _parse_with_scanner(midi_path):
+    with open(midi_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        scan = scan_notes(buf)
+    tempo_map = scan.tempo_map()
+    table = NoteTable()
+    table.times = tempo_map.convert(scan.ticks)
+    table.tracks = scan.tracks
+    table.channels = scan.channels
+    table.notes = scan.notes
+    table.bars = array('d', (tempo_map.seconds_at(tick) for tick in scan.bar_ticks()))
+    table.track_names = scan.track_names
+    return table
+
+
+def _parse_with_mido(midi_path):
+    mid = mido.MidiFile(midi_path)
+    tpb = mid.ticks_per_beat
+    table = NoteTable()
+    table.track_names = [track.name for track in mid.tracks]
+
+    def abs_events(track_idx, track):
+        tick = 0
+        for msg in track:
+            tick += msg.time
+            yield tick, track_idx, msg
+
+    merged = heapq.merge(*(abs_events(i, track) for i, track in enumerate(mid.tracks)), key=lambda ev: ev[0])
+
+    tempo = DEFAULT_TEMPO
+    last_tick = 0
+    t = 0.0
+    bar_ticks = 4 * tpb
+    next_bar = bar_ticks
+    for tick, track_idx, msg in merged:
+        if tick != last_tick:
+            tick_s = tempo / (tpb * 1_000_000)
+            while next_bar <= tick:
+                table.bars.append(t + (next_bar - last_tick) * tick_s)
+                next_bar += bar_ticks
+            t += (tick - last_tick) * tick_s
+            last_tick = tick
+
+        if msg.type == 'note_on' and msg.velocity > 0:
+            table.times.append(t)
+            table.tracks.append(track_idx)
+            table.channels.append(msg.channel)
+            table.notes.append(msg.note)
+        elif msg.type == 'set_tempo':
+            tempo = msg.tempo
+        elif msg.type == 'time_signature':
+            bar_ticks = msg.numerator * 4 * tpb / msg.denominator
+            next_bar = tick + bar_ticks
+    return table
+
+
+def parse_notes(midi_path):
+    """解析 MIDI 为音符表。按内容哈希在内存中缓存，切换音轨等设置时无需重新解析"""
+    digest = file_hash(midi_path)
+    with _table_lock:
+        table = _table_cache.get(digest)
+        if table is not None:
+            _table_cache.move_to_end(digest)
+            return table
+
+    try:
+        table = _parse_with_scanner(midi_path)
+    except (ValueError, IndexError, KeyError, OSError) as e:
+        # 扫描器只处理标准文件，遇到损坏或不规范的文件交给 mido 再试一次
+        print(f"[DEBUG] 快速解析失败，改用 mido: {e}")
+        table = _parse_with_mido(midi_path)
+
+    with _table_lock:
+        _table_cache[digest] = table
+        while len(_table_cache) > TABLE_CACHE_SIZE:
+            _table_cache.popitem(last=False)
+    return table
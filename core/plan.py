@@ -0,0 +1,157 @@
+import hashlib
+import os
+import pickle
+from array import array
+
+from core.chords import ChordIndex, reduce_chord
+from core.notes import file_hash, parse_notes
+from core.profile_base import BaseProfile
+from core.window import pack_lparam
+
+CACHE_DIR = os.path.join("cache", "plans")
+PLAN_VERSION = 10
+
+
+class PerformancePlan:
+    """预编译的演奏计划: 批次时间 + 扁平化的客户区点击坐标"""
+
+    __slots__ = ("times", "offsets", "xs", "ys", "lparams", "dropped", "keys", "resets", "bars", "info")
+
+    def __init__(self, times=None, offsets=None, xs=None, ys=None, lparams=None, dropped=None, keys=None,
+                 resets=None, bars=None, info=None):
+        self.times = times if times is not None else array('d')  # 每个批次的 MIDI 时间(秒，未按速度缩放)
+        self.offsets = offsets if offsets is not None else array('I', [0])  # 批次 i 的点击 = [offsets[i], offsets[i+1])
+        self.xs = xs if xs is not None else array('i')
+        self.ys = ys if ys is not None else array('i')
+        self.lparams = lparams if lparams is not None else array('I')  # 打包好的鼠标消息 lParam，与 xs/ys 一一对应
+        self.dropped = dropped if dropped is not None else array('H')  # 每个批次被复音上限截掉的音符数
+        self.keys = keys if keys is not None else array('b')  # 每个点击改变的状态槽，-1 表示无状态
+        self.resets = resets if resets is not None else array('i')  # 状态槽 k 的初始点击 = resets[2k], resets[2k+1]
+        self.bars = bars if bars is not None else array('d')  # 每小节起始的 MIDI 时间
+        self.info = info if info is not None else {}  # 编译统计，如竖琴踏板编排节省的点击数
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def click_count(self):
+        return len(self.xs)
+
+    @property
+    def duration(self):
+        return self.times[-1] if self.times else 0.0
+
+    def add_batch(self, t, clicks, dropped=0, keys=None):
+        self.times.append(t)
+        self.dropped.append(dropped)
+        for i, (x, y) in enumerate(clicks):
+            self.xs.append(int(x))
+            self.ys.append(int(y))
+            self.lparams.append(pack_lparam(int(x), int(y)))
+            key = keys[i] if keys else None
+            self.keys.append(-1 if key is None else key)
+        self.offsets.append(len(self.xs))
+
+    def state_at(self, batch_idx):
+        """批次 batch_idx 开始前各状态槽应处的点击位置"""
+        slots = len(self.resets) // 2
+        state = {}
+        keys = self.keys
+        k = self.offsets[batch_idx] - 1
+        while k >= 0 and len(state) < slots:
+            key = keys[k]
+            if key >= 0 and key not in state:
+                state[key] = (self.xs[k], self.ys[k])
+            k -= 1
+        for key in range(slots):
+            state.setdefault(key, (self.resets[2 * key], self.resets[2 * key + 1]))
+        return state
+
+
+def compile_plan(midi_path, profile: BaseProfile, size, pitch=0, speed=1.0,
+                 batch_window=0.01, max_polyphony=5, chord_policy="melody", tracks=None, range_mode="drop"):
+    w, h = size
+    profile.update_size(w, h)
+    profile.reset()
+
+    table = parse_notes(midi_path)
+    fold_info = {}
+    if range_mode == "fold":
+        folded = profile.fold_notes(pitch)
+        notes = []
+        moved = 0
+        for t, note in table.select(tracks):
+            target = folded[note]
+            if target >= 0:
+                notes.append((t, target))
+                moved += target != note + pitch
+        fold_info['folded_notes'] = moved
+    else:
+        playable = profile.playable_notes(pitch)
+        notes = [(t, note + pitch) for t, note in table.select(tracks) if playable[note]]
+    # 合并窗口是实际时间，换算到 MIDI 时间后一次性分组
+    window = batch_window * speed
+    chords = ChordIndex.build(notes, window)
+    if range_mode == "fold":
+        # 折叠后和弦里可能出现同音，不占用复音上限
+        chords, fold_info['duplicates_removed'] = chords.deduped()
+    plan = PerformancePlan(bars=array('d', table.bars))
+    for x, y in profile.reset_clicks():
+        plan.resets.extend((int(x), int(y)))
+
+    reduced = [reduce_chord(chords.chord(i), max_polyphony, chord_policy) for i in range(len(chords))]
+    # 竖琴踏板等状态依赖演奏顺序，交给乐器按实际会弹的音符整体编排
+    batches, plan.info = profile.plan_batches(chords.times, [kept for kept, _ in reduced], window)
+    plan.info.update(fold_info)
+    for t, clicks, src in batches:
+        dropped = reduced[src][1] if src is not None else 0
+        plan.add_batch(t, clicks, dropped, [profile.state_key(c) for c in clicks])
+
+    return plan
+
+
+def _plan_key(digest, profile, size, options):
+    raw = "|".join(str(part) for part in (
+        PLAN_VERSION, digest, profile.cache_id, profile.name, size[0], size[1],
+        *sorted(options.items())
+    ))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _load_cached(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            data = pickle.load(f)
+        if data.get('version') != PLAN_VERSION:
+            return None
+        return PerformancePlan(**{name: data[name] for name in PerformancePlan.__slots__})
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError, TypeError):
+        return None
+
+
+def _save_cached(cache_path, plan):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = cache_path + ".tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            data = {name: getattr(plan, name) for name in PerformancePlan.__slots__}
+            data['version'] = PLAN_VERSION
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"[DEBUG] 演奏计划缓存写入失败: {e}")
+
+
+def load_plan(midi_path, profile: BaseProfile, size, **options):
+    key = _plan_key(file_hash(midi_path), profile, size, options)
+    cache_path = os.path.join(CACHE_DIR, f"{key}.plan")
+
+    plan = _load_cached(cache_path)
+    if plan is not None:
+        print(f"[DEBUG] 命中演奏计划缓存: {key[:12]}")
+        return plan
+
+    plan = compile_plan(midi_path, profile, size, **options)
+    if len(plan):
+        _save_cached(cache_path, plan)
+    return plan
@@ -1,125 +1,419 @@
+import os
 import time
-import mido
-import ctypes
+import queue
+import threading
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, wait
 from PyQt6.QtCore import QThread, pyqtSignal
 
-from core.driver import WinInput
+from core.driver import InputBackend, default_backend
+from core.plan import load_plan
 from core.profile_base import BaseProfile
+from core.scheduler import Scheduler
+from core.stats import TimingRecorder, save_report
+from core.stream import NoteStream, STREAM_THRESHOLD_BYTES
+
+# 解析与编译放到后台，和倒计时重叠
+_compile_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="plan-compile")
 
 
 class MidiPlayer(QThread):
-    on_progress = pyqtSignal(str)
+    on_progress = pyqtSignal(str, str)  # (状态, 提示文字)，界面按状态切换按钮，不解析文字
     on_finished = pyqtSignal()
     on_error = pyqtSignal(str)
+    on_stats = pyqtSignal(dict)  # 演奏中每秒一次的迟到统计
+    on_report = pyqtSignal(dict)  # 结束时的完整报告
+    on_position = pyqtSignal(float, float)  # (当前 MIDI 时间, 总时长) 秒
 
     SLEEP_COMPENSATION_MS = 0.015
     BATCH_WINDOW_MS = 0.01
+    MAX_POLYPHONY = 5
+    MAX_WAIT_S = 0.05
+    STATS_INTERVAL_S = 1.0
+    POSITION_INTERVAL_S = 0.25
+    COUNTDOWN_POLL_S = 0.05  # 倒计时中检查编译结果与停止请求的间隔
+
+    # on_progress 的状态
+    COUNTDOWN = "countdown"
+    PREPARING = "preparing"  # 倒计时结束但音符还没编译完
+    PLAYING = "playing"
+    PAUSED = "paused"
 
-    def __init__(self):
+    def __init__(self, backend: InputBackend | None = None):
         super().__init__()
+        self.backend = backend or default_backend()
         self.hwnd = None
         self.midi_file = None
         self.profile: BaseProfile | None = None
         self.params = {}
         self._active = False
-        self._winmm = ctypes.windll.winmm
+        self._plan_future = None
+        self._build_options = {}
+        self._controls = queue.SimpleQueue()
+        self._running = threading.Event()  # 清除表示暂停
+        self._running.set()
+        self.scheduler_report = {}
+        self.plan_info = {}
+        self.recorder = TimingRecorder()
+        self._stats_from = 0
+        self._next_stats = 0.0
 
-    def load(self, hwnd, midi_path, profile, speed, pitch, delay):
+    def load(self, hwnd, midi_path, profile, speed, pitch, delay, scheduler_mode="balanced",
+             max_polyphony=None, chord_policy="melody", load_mode="auto", tracks=None,
+             range_mode="drop"):
         self.hwnd = hwnd
         self.midi_file = midi_path
         self.profile = profile
         self.params = {
             'speed': float(speed),
             'pitch': int(pitch),
-            'delay': int(delay)
+            'delay': int(delay),
+            'scheduler': scheduler_mode,
+            'max_polyphony': int(max_polyphony or self.MAX_POLYPHONY),
+            'chord_policy': chord_policy,
+            'range_mode': range_mode,
+            'stream': self._use_stream(midi_path, load_mode),
+            'tracks': tuple(sorted(tracks)) if tracks is not None else None
         }
+        if self._plan_future is not None:
+            # 上一次加载还没用上的流式读取要关掉，否则生产线程一直占着文件
+            self._discard(self._plan_future)
+        self._plan_future = None
+        # 先读取窗口客户区，布局直接编译到客户区坐标
+        self.backend.bind(hwnd)
+        self._build_options = dict(
+            pitch=self.params['pitch'],
+            speed=self.params['speed'],
+            batch_window=self.BATCH_WINDOW_MS,
+            max_polyphony=self.params['max_polyphony'],
+            chord_policy=chord_policy,
+            tracks=self.params['tracks'],
+            range_mode=range_mode
+        )
+        if profile and midi_path:
+            build = self._build_stream if self.params['stream'] else self._build_plan
+            self._plan_future = _compile_pool.submit(
+                build, midi_path, profile, self.backend.target_size(), **self._build_options)
+
+    @staticmethod
+    def _use_stream(midi_path, load_mode):
+        if load_mode == "auto":
+            try:
+                return os.path.getsize(midi_path) > STREAM_THRESHOLD_BYTES
+            except (OSError, TypeError):
+                return False
+        return load_mode == "stream"
+
+    def _build_plan(self, midi_path, profile, size, **options):
+        plan = load_plan(midi_path, profile, size, **options)
+        if not len(plan):
+            raise ValueError("没有可演奏的音符")
+        return plan
+
+    def _build_stream(self, midi_path, profile, size, **options):
+        # 只等前几秒解码完成，其余边播边解
+        stream = NoteStream(midi_path, profile, size, **options)
+        stream.start()
+        try:
+            stream.wait_ready()
+        except Exception:
+            stream.close()
+            raise
+        return stream
+
+    @staticmethod
+    def _discard(future):
+        """不再使用的编译结果: 还没开始就取消；流式读取在完成后(或已完成时立即)关闭"""
+        def close(done):
+            if not done.cancelled() and done.exception() is None and isinstance(done.result(), NoteStream):
+                done.result().close()
+        if not future.cancel():
+            future.add_done_callback(close)
+
+    def _countdown(self, delay, future):
+        # 按绝对时间倒计时，每个小间隔检查一次编译结果和停止请求，编译失败立即报错
+        start = time.perf_counter()
+        for i in range(delay, 0, -1):
+            if not self._active: return False
+            self.on_progress.emit(self.COUNTDOWN, f"倒计时 {i}...")
+            tick_end = start + (delay - i + 1)
+            while True:
+                if future.done() and future.exception() is not None:
+                    raise future.exception()
+                if not self._active: return False
+                remaining = tick_end - time.perf_counter()
+                if remaining <= 0:
+                    break
+                if future.done():
+                    time.sleep(min(remaining, self.COUNTDOWN_POLL_S))
+                else:
+                    wait((future,), timeout=min(remaining, self.COUNTDOWN_POLL_S))
+        return self._active
 
     def stop(self):
         self._active = False
+        self._running.set()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def toggle_pause(self):
+        if self._running.is_set():
+            self.pause()
+        else:
+            self.resume()
+
+    @property
+    def is_paused(self):
+        return not self._running.is_set()
+
+    @property
+    def _play_state(self):
+        return self.PAUSED if self.is_paused else self.PLAYING
+
+    # 以下控制都在演奏线程的循环里生效，可从任意线程调用
+    def seek(self, seconds):
+        self._controls.put(('seek', float(seconds)))
+
+    def seek_bar(self, bar):
+        self._controls.put(('bar', int(bar)))
+
+    def set_speed(self, speed):
+        self._controls.put(('speed', float(speed)))
+
+    def _apply_controls(self, plan, idx, t0, speed):
+        # 以当前 MIDI 位置为锚点处理暂停/跳转/变速，返回新的 (idx, t0, speed)
+        streaming = isinstance(plan, NoteStream)
+        pos = max(0.0, (time.perf_counter() - t0) * speed)
+        start_idx = idx
+        paused = False
+
+        while True:
+            while not self._controls.empty():
+                kind, value = self._controls.get()
+                if kind == 'speed' and value > 0:
+                    speed = value
+                    self.params['speed'] = value
+                elif kind in ('seek', 'bar'):
+                    if streaming:
+                        self.on_progress.emit(self._play_state, "▶ 流式演奏不支持跳转")
+                        continue
+                    if kind == 'bar':
+                        if not 1 <= value <= len(plan.bars): continue
+                        value = plan.bars[value - 1]
+                    pos = min(max(0.0, value), plan.duration)
+                    idx = bisect_left(plan.times, pos)
+                    self.on_position.emit(pos, plan.duration)
+
+            if self._running.is_set() or not self._active:
+                break
+            if not paused:
+                paused = True
+                self.on_progress.emit(self.PAUSED, "⏸ 演奏已暂停")
+            self._running.wait(0.05)
+
+        if idx != start_idx:
+            self._sync_state(plan, start_idx, idx)
+        if paused and self._active:
+            self.on_progress.emit(self.PLAYING, "▶ 演奏继续")
+        return idx, time.perf_counter() - pos / speed, speed
+
+    def _sync_state(self, plan, from_idx, to_idx):
+        # 跳转后补发状态点击(如竖琴踏板)，使乐器状态与目标位置一致
+        before = plan.state_at(from_idx)
+        after = plan.state_at(min(to_idx, len(plan) - 1))
+        fix = [after[k] for k in after if after[k] != before[k]]
+        if fix:
+            self.backend.click_batch(array('i', [x for x, _ in fix]), array('i', [y for _, y in fix]), 0, len(fix))
 
     def run(self):
         self._active = True
-        self._winmm.timeBeginPeriod(1)
+        self._running.set()
+        self._controls = queue.SimpleQueue()
+        scheduler = Scheduler(self.params.get('scheduler', "balanced"), self.SLEEP_COMPENSATION_MS)
 
+        future = None
         try:
             if not self.profile:
                 raise ValueError("配置未加载")
 
-            if not self.hwnd:
+            if self.backend.requires_window and not self.hwnd:
                 raise ValueError("未绑定游戏窗口")
 
-            w, h = WinInput.screen_size()
-            self.profile.update_size(w, h)
-            self.profile.reset()
+            future = self._plan_future
+            if future is None:
+                raise ValueError("未加载MIDI文件")
+
+            # 已经编译完成的错误在倒计时前就报告
+            if future.done():
+                future.result()
+
+            if not self._countdown(self.params['delay'], future): return
 
-            delay = self.params['delay']
-            for i in range(delay, 0, -1):
-                if not self._active: return
-                self.on_progress.emit(f"倒计时 {i}...")
-                time.sleep(1)
+            if not future.done():
+                self.on_progress.emit(self.PREPARING, "正在准备音符...")
+            plan = future.result()
+            self.plan_info = {} if isinstance(plan, NoteStream) else plan.info
 
             if not self._active: return
 
-            self.on_progress.emit("▶ 演奏开始 ")
+            self.on_progress.emit(self.PLAYING, "▶ 演奏开始 ")
+
+            self.backend.bind(self.hwnd)
+            self.recorder = TimingRecorder()
+            self._stats_from = 0
+            self._next_stats = time.perf_counter() + self.STATS_INTERVAL_S
+            if isinstance(plan, NoteStream):
+                self._play_stream(plan, scheduler)
+            else:
+                self._play_plan(plan, scheduler)
+
+            self.on_finished.emit()
+
+        except Exception as e:
+            self.on_error.emit(str(e))
 
-            mid = mido.MidiFile(self.midi_file)
+        finally:
+            # 倒计时中停止、出错或播完，流式读取都在这里关闭
+            if future is not None:
+                self._discard(future)
+                if future is self._plan_future:
+                    self._plan_future = None
+            if scheduler.started:
+                self.scheduler_report = scheduler.stop()
+                self._emit_report()
 
-            queue = []
-            t = 0.0
-            pitch_off = self.params['pitch']
+    def _watch_window(self, target, rebuild):
+        """定期检查游戏窗口。尺寸改变时计划模式在后台按新尺寸重新编译，流式模式从后续批次生效"""
+        if self.backend.lost:
+            raise ValueError("游戏窗口已关闭")
+        size = self.backend.poll_geometry()
+        if not size:
+            return rebuild
+        print(f"[DEBUG] 窗口大小改变: {size[0]}x{size[1]}")
+        if isinstance(target, NoteStream):
+            target.resize(size)
+            return None
+        self.on_progress.emit(self._play_state, "▶ 窗口大小已改变，演奏中重新计算坐标")
+        return _compile_pool.submit(self._build_plan, self.midi_file, self.profile, size, **self._build_options)
 
-            for msg in mid:
-                t += msg.time
-                if msg.type == 'note_on' and msg.velocity > 0:
-                    note = msg.note + pitch_off
-                    if self.profile.can_play(note):
-                        queue.append((t, note))
+    def _play_plan(self, plan, scheduler):
+        # 热循环只做等待与发送
+        times, offsets, dropped = plan.times, plan.offsets, plan.dropped
+        xs, ys, lparams = plan.xs, plan.ys, plan.lparams
+        backend, recorder = self.backend, self.recorder
+        controls, running = self._controls, self._running
+        total_batches = len(times)
+        idx = 0
+        speed = self.params['speed']
+        scheduler.start()
+        t0 = time.perf_counter()
+        next_signal = t0
+        rebuild = None
 
-            if not queue:
-                raise ValueError("没有可演奏的音符")
+        while idx < total_batches and self._active:
+            if not running.is_set() or not controls.empty():
+                idx, t0, speed = self._apply_controls(plan, idx, t0, speed)
+                continue
 
-            t0 = time.perf_counter()
-            idx = 0
-            speed = self.params['speed']
-            total_notes = len(queue)
-            MAX_POLYPHONY = 5
+            deadline = t0 + times[idx] / speed
+            if not scheduler.wait_until(deadline, self.MAX_WAIT_S):
+                continue
 
-            while idx < total_notes and self._active:
-                midi_time, _ = queue[idx]
-                target = midi_time / speed
-                current_perf = time.perf_counter() - t0
-                delta = target - current_perf
+            sent = time.perf_counter()
+            clicks = backend.click_batch(xs, ys, offsets[idx], offsets[idx + 1], lparams)
+            done = time.perf_counter()
+            recorder.record(deadline, sent, clicks, done - sent, dropped[idx])
+            idx += 1
 
-                if delta <= 0:
-                    batch_notes = []
-                    temp_idx = idx
-                    while temp_idx < total_notes:
-                        next_t, next_n = queue[temp_idx]
-                        if (next_t / speed) - target < self.BATCH_WINDOW_MS:
-                            batch_notes.append(next_n)
-                            temp_idx += 1
-                        else:
-                            break
+            if done >= next_signal:
+                next_signal = self._emit_live(done, (done - t0) * speed, plan.duration, idx, total_batches)
+                rebuild = self._watch_window(plan, rebuild)
+                if rebuild is not None and rebuild.done():
+                    # 批次划分与尺寸无关，只换坐标，从当前位置继续
+                    try:
+                        resized = rebuild.result()
+                    except Exception as e:
+                        print(f"[DEBUG] 按新窗口尺寸编译失败，沿用原坐标: {e}")
+                        resized = plan
+                    rebuild = None
+                    if len(resized) == total_batches:
+                        plan = resized
+                        offsets, xs, ys, lparams = plan.offsets, plan.xs, plan.ys, plan.lparams
 
-                    idx = temp_idx
+    def _play_stream(self, stream, scheduler):
+        backend, recorder = self.backend, self.recorder
+        controls, running = self._controls, self._running
+        idx = 0
+        batch = None
+        speed = self.params['speed']
+        scheduler.start()
+        t0 = time.perf_counter()
+        next_signal = t0
 
-                    final_notes = batch_notes[:MAX_POLYPHONY]
+        while self._active:
+            if not running.is_set() or not controls.empty():
+                idx, t0, speed = self._apply_controls(stream, idx, t0, speed)
+                continue
 
-                    for note in final_notes:
-                        clicks = self.profile.get_clicks(note)
-                        for x, y in clicks:
-                            WinInput.click(self.hwnd, x, y)
+            if batch is None:
+                try:
+                    batch = stream.get(timeout=self.MAX_WAIT_S)
+                except queue.Empty:
+                    continue  # 解码暂时跟不上
+                if batch is None:
+                    break
 
-                elif delta < self.SLEEP_COMPENSATION_MS:
-                    pass
+            midi_time, bxs, bys, blparams, dropped = batch
+            deadline = t0 + midi_time / speed
+            if not scheduler.wait_until(deadline, self.MAX_WAIT_S):
+                continue
 
-                else:
-                    time.sleep(delta - self.SLEEP_COMPENSATION_MS)
+            sent = time.perf_counter()
+            clicks = backend.click_batch(bxs, bys, 0, len(bxs), blparams)
+            done = time.perf_counter()
+            recorder.record(deadline, sent, clicks, done - sent, dropped)
+            idx += 1
+            batch = None
 
-            self.on_finished.emit()
+            if done >= next_signal:
+                next_signal = self._emit_live(done, (done - t0) * speed, stream.decoded_until, idx, stream.batches)
+                self._watch_window(stream, None)
 
-        except Exception as e:
-            self.on_error.emit(str(e))
+    def _emit_live(self, now, pos, duration, idx, total):
+        # 进度与实时统计，返回下次触发时间
+        self.on_position.emit(pos, duration)
+        if now >= self._next_stats:
+            live = self.recorder.summary(self._stats_from)
+            live['position'] = idx
+            live['total'] = total
+            self.on_stats.emit(live)
+            self._stats_from = len(self.recorder)
+            self._next_stats = now + self.STATS_INTERVAL_S
+        return now + self.POSITION_INTERVAL_S
 
-        finally:
-            self._winmm.timeEndPeriod(1)
\ No newline at end of file
+    def _emit_report(self):
+        report = self.recorder.report(
+            midi_file=os.path.basename(self.midi_file or ""),
+            profile=self.profile.name if self.profile else "",
+            params=dict(self.params),
+            settings={
+                'SLEEP_COMPENSATION_MS': self.SLEEP_COMPENSATION_MS,
+                'BATCH_WINDOW_MS': self.BATCH_WINDOW_MS,
+                'MAX_POLYPHONY': self.params.get('max_polyphony', self.MAX_POLYPHONY),
+            },
+            backend=self.backend.name,
+            window=self.backend.window_info(),
+            scheduler=self.scheduler_report,
+            plan=dict(self.plan_info),
+        )
+        try:
+            report['path'] = save_report(report)
+        except OSError as e:
+            print(f"[DEBUG] 计时报告写入失败: {e}")
+        print(f"[DEBUG] 计时统计: {report['timing']}")
+        self.on_report.emit(report)
\ No newline at end of file
@@ -1,9 +1,57 @@
+import threading
 from abc import ABC, abstractmethod
+from array import array
+
+NOTE_COUNT = 128
+
+
+class ClickTable:
+    """按分辨率编译好的 音符 -> 点击 稠密表，下标为 MIDI 音符号，弹不了的音为空"""
+
+    __slots__ = ("size", "playable", "xs", "ys", "clicks")
+
+    def __init__(self, size, positions=None):
+        self.size = size
+        self.playable = bytearray(NOTE_COUNT)
+        self.xs = array('i', bytes(4 * NOTE_COUNT))
+        self.ys = array('i', bytes(4 * NOTE_COUNT))
+        self.clicks = [()] * NOTE_COUNT
+        for note, pos in (positions or {}).items():
+            if 0 <= note < NOTE_COUNT and pos:
+                self.set(note, pos)
+
+    def set(self, note, pos):
+        self.playable[note] = 1
+        self.xs[note], self.ys[note] = pos
+        self.clicks[note] = (tuple(pos),)
+
+    def pos(self, note):
+        if 0 <= note < NOTE_COUNT and self.playable[note]:
+            return self.xs[note], self.ys[note]
+        return None
+
+
+# 同一乐器同一分辨率只编译一次，所有实例共用
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def shared_table(cache_id, size, build):
+    key = (cache_id, size)
+    table = _tables.get(key)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(key)
+            if table is None:
+                table = _tables[key] = build()
+    return table
+
 
 class BaseProfile(ABC):
     def __init__(self):
         self.w = 0
         self.h = 0
+        self._table = None
 
     def update_size(self, w, h):
         self.w = w
@@ -17,13 +65,103 @@ class BaseProfile(ABC):
     def name(self) -> str:
         pass
 
-    @abstractmethod
+    @property
+    def cache_id(self) -> str:
+        """区分乐器的缓存键，演奏计划、音轨分析、点击表都按它缓存"""
+        return type(self).__name__
+
+    @property
+    def table(self) -> ClickTable:
+        size = (self.w, self.h)
+        table = self._table
+        if table is None or table.size != size:
+            if self.w and self.h:
+                table = shared_table(self.cache_id, size, self.build_table)
+            else:
+                # 未设置尺寸时没有坐标，所有音都弹不了
+                table = ClickTable(size)
+            self._table = table
+        return table
+
+    def build_table(self) -> ClickTable:
+        """按当前分辨率生成点击表，只在该分辨率第一次使用时调用"""
+        return ClickTable((self.w, self.h), self.positions())
+
+    def positions(self) -> dict[int, tuple[int, int]]:
+        """当前分辨率下 音符 -> 坐标；无状态乐器实现这个即可"""
+        return {}
+
+    def playable_notes(self, pitch: int = 0) -> bytearray:
+        """按原始音符号索引: 移调 pitch 后能否演奏，编译时逐音判断只需一次下标访问"""
+        playable = self.table.playable
+        mask = bytearray(NOTE_COUNT)
+        for note in range(max(0, -pitch), min(NOTE_COUNT, NOTE_COUNT - pitch)):
+            mask[note] = playable[note + pitch]
+        return mask
+
+    def fold_notes(self, pitch: int = 0) -> array:
+        """按原始音符号索引: 移调 pitch 后实际演奏的音。弹不了的音移到最近的可弹八度，
+        上下距离相同时取低八度；任何八度都弹不了为 -1"""
+        playable = self.table.playable
+        folded = array('b', [-1]) * NOTE_COUNT
+        for note in range(NOTE_COUNT):
+            target = note + pitch
+            octave = target % 12
+            best = -1
+            for candidate in range(octave, NOTE_COUNT, 12):
+                if playable[candidate] and (best < 0 or abs(candidate - target) < abs(best - target)):
+                    best = candidate
+            folded[note] = best
+        return folded
+
     def get_pos(self, note: int) -> tuple[int, int] | None:
-        pass
+        return self.table.pos(note)
 
     def can_play(self, note: int) -> bool:
-        return self.get_pos(note) is not None
+        return 0 <= note < NOTE_COUNT and self.table.playable[note] == 1
 
     def get_clicks(self, note: int) -> list[tuple[int, int]]:
-        pos = self.get_pos(note)
-        return [pos] if pos else []
+        if 0 <= note < NOTE_COUNT:
+            return list(self.table.clicks[note])
+        return []
+
+    def plan_batches(self, times, chords, window):
+        """整首曲子的点击编排: chords 为每个批次实际要弹的音符，返回 ([(时间, 点击, 和弦下标)], 统计)。
+        默认逐音调用 get_clicks；有状态的乐器可以看完整个序列再决定，插入的额外批次和弦下标为 None"""
+        self.reset()
+        batches = []
+        for i, notes in enumerate(chords):
+            clicks = []
+            for note in notes:
+                clicks.extend(self.get_clicks(note))
+            batches.append((times[i], clicks, i))
+        return batches, {}
+
+    # 会改变乐器状态的点击(如竖琴踏板)返回状态槽编号，跳转播放位置时据此补发
+    def state_key(self, click: tuple[int, int]) -> int | None:
+        return None
+
+    # 各状态槽在 reset() 后对应的点击位置，下标即状态槽编号
+    def reset_clicks(self) -> list[tuple[int, int]]:
+        return []
+
+
+class LayoutProfile(BaseProfile):
+    """由 layouts/*.json 描述的乐器，坐标、音符映射都来自布局文件"""
+
+    def __init__(self, layout):
+        super().__init__()
+        self.layout = layout
+
+    @classmethod
+    def validate(cls, layout):
+        """加载布局时调用，数据不合法抛出 LayoutError"""
+
+    @property
+    def name(self):
+        return self.layout.name
+
+    @property
+    def cache_id(self):
+        # 布局文件改动后旧缓存自动失效
+        return f"{self.layout.id}-{self.layout.digest[:12]}"
@@ -0,0 +1,193 @@
+import sys
+import time
+import ctypes
+from ctypes import wintypes
+
+# 调度模式 -> 策略
+# eco:      只用粗粒度 sleep，CPU 最低，抖动约 1~2ms
+# balanced: 粗 sleep + 高精度定时器 + 极短自旋，CPU 低，抖动亚毫秒
+# precise:  粗 sleep + 自旋到点，抖动最小但自旋期间占满一个核
+MODES = {
+    "eco": "sleep",
+    "balanced": "hybrid",
+    "precise": "spin",
+}
+MODE_NAMES = {"balanced": "均衡", "eco": "省电", "precise": "精确"}
+
+CREATE_WAITABLE_TIMER_HIGH_RESOLUTION = 0x00000002
+TIMER_ALL_ACCESS = 0x1F0003
+INFINITE = 0xFFFFFFFF
+
+
+class _WaitableTimer:
+    """Windows 高精度可等待定时器，不可用时退化为 time.sleep"""
+
+    def __init__(self):
+        self._kernel32 = None
+        self._handle = None
+        if sys.platform != 'win32':
+            return
+
+        kernel32 = ctypes.windll.kernel32
+        kernel32.CreateWaitableTimerExW.restype = wintypes.HANDLE
+        kernel32.CreateWaitableTimerExW.argtypes = [ctypes.c_void_p, wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD]
+        kernel32.SetWaitableTimer.argtypes = [
+            wintypes.HANDLE, ctypes.POINTER(ctypes.c_longlong), wintypes.LONG,
+            ctypes.c_void_p, ctypes.c_void_p, wintypes.BOOL
+        ]
+        kernel32.WaitForSingleObject.argtypes = [wintypes.HANDLE, wintypes.DWORD]
+        kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+        # Win10 1803 之前不支持高精度标志
+        handle = kernel32.CreateWaitableTimerExW(None, None, CREATE_WAITABLE_TIMER_HIGH_RESOLUTION, TIMER_ALL_ACCESS)
+        if handle:
+            self._kernel32 = kernel32
+            self._handle = handle
+
+    @property
+    def available(self):
+        return self._handle is not None
+
+    def wait(self, seconds):
+        if self._handle is None:
+            time.sleep(seconds)
+            return
+        # 负数表示相对时间，单位 100ns
+        due = ctypes.c_longlong(-int(seconds * 10_000_000))
+        if self._kernel32.SetWaitableTimer(self._handle, ctypes.byref(due), 0, None, None, False):
+            self._kernel32.WaitForSingleObject(self._handle, INFINITE)
+        else:
+            time.sleep(seconds)
+
+    def close(self):
+        if self._handle is not None:
+            self._kernel32.CloseHandle(self._handle)
+            self._handle = None
+
+
+class _Oversleep:
+    """用指数滑动平均估计实际睡眠超出请求时长的部分"""
+
+    ALPHA = 0.1
+
+    def __init__(self, initial, lo, hi):
+        self.mean = initial
+        self.dev = 0.0
+        self.lo = lo
+        self.hi = hi
+        self.samples = 0
+
+    def update(self, sample):
+        self.samples += 1
+        if self.samples == 1:
+            # 初始值只是猜测，第一次实测直接替换
+            self.mean = sample
+            return
+        alpha = max(self.ALPHA, 1.0 / self.samples)
+        diff = sample - self.mean
+        self.mean += alpha * diff
+        self.dev += alpha * (abs(diff) - self.dev)
+
+    @property
+    def margin(self):
+        return min(self.hi, max(self.lo, self.mean + 3 * self.dev))
+
+
+class Scheduler:
+    MIN_SPIN = 0.0002  # hybrid 模式最后的自旋窗口下限
+
+    def __init__(self, mode="balanced", sleep_margin=0.015):
+        if mode not in MODES:
+            mode = "balanced"
+        self.mode = mode
+        self.strategy = MODES[mode]
+        self._coarse = _Oversleep(sleep_margin, 0.0005, 0.02)
+        self._fine = _Oversleep(self.MIN_SPIN, self.MIN_SPIN, 0.002)
+        self._timer = None
+        self._winmm = None
+        self._cpu0 = 0.0
+        self._wall0 = 0.0
+        self.started = False
+        self.counts = {"sleep": 0, "timer": 0, "spin": 0}
+        self.spin_time = 0.0
+
+    def start(self):
+        if sys.platform == 'win32':
+            self._winmm = ctypes.windll.winmm
+            self._winmm.timeBeginPeriod(1)
+        if self.strategy == "hybrid":
+            self._timer = _WaitableTimer()
+        self.counts = {"sleep": 0, "timer": 0, "spin": 0}
+        self.spin_time = 0.0
+        self._cpu0 = time.thread_time()
+        self._wall0 = time.perf_counter()
+        self.started = True
+
+    def stop(self):
+        """结束计时并返回本次运行的统计"""
+        cpu = time.thread_time() - self._cpu0
+        wall = time.perf_counter() - self._wall0
+        report = {
+            "mode": self.mode,
+            "strategy": self.strategy,
+            "high_res_timer": bool(self._timer and self._timer.available),
+            "cpu_s": round(cpu, 4),
+            "wall_s": round(wall, 4),
+            "cpu_pct": round(100.0 * cpu / wall, 2) if wall > 0 else 0.0,
+            "spin_s": round(self.spin_time, 4),
+            "sleep_margin_ms": round(self._coarse.margin * 1000, 3),
+            "timer_margin_ms": round(self._fine.margin * 1000, 3),
+            "waits": dict(self.counts),
+        }
+        if self._timer:
+            self._timer.close()
+            self._timer = None
+        if self._winmm:
+            self._winmm.timeEndPeriod(1)
+            self._winmm = None
+        self.started = False
+        return report
+
+    def _sleep(self, seconds, estimator, wait_fn):
+        t = time.perf_counter()
+        wait_fn(seconds)
+        estimator.update(time.perf_counter() - t - seconds)
+
+    def wait_until(self, deadline, max_wait=None):
+        """等待到 deadline(perf_counter 时间)。若 max_wait 截断了等待则返回 False"""
+        now = time.perf_counter()
+        remaining = deadline - now
+        if remaining <= 0:
+            return True
+
+        if max_wait is not None and remaining > max_wait + self._coarse.margin:
+            # 长间隔分段等待，保证 stop/pause 能及时响应
+            self._sleep(max_wait, self._coarse, time.sleep)
+            self.counts["sleep"] += 1
+            return False
+
+        if self.strategy == "sleep":
+            # 提前平均超睡量醒来，不自旋
+            self._sleep(max(0.0, remaining - self._coarse.mean), self._coarse, time.sleep)
+            self.counts["sleep"] += 1
+            return True
+
+        coarse_margin = self._coarse.margin
+        if remaining > coarse_margin:
+            self._sleep(remaining - coarse_margin, self._coarse, time.sleep)
+            self.counts["sleep"] += 1
+
+        if self.strategy == "hybrid":
+            fine_margin = self._fine.margin
+            remaining = deadline - time.perf_counter()
+            if remaining > fine_margin:
+                self._sleep(remaining - fine_margin, self._fine, self._timer.wait)
+                self.counts["timer"] += 1
+
+        spin_start = time.perf_counter()
+        if spin_start < deadline:
+            while time.perf_counter() < deadline:
+                pass
+            self.counts["spin"] += 1
+            self.spin_time += time.perf_counter() - spin_start
+        return True
@@ -0,0 +1,150 @@
+"""在线曲库搜索索引
+
+曲库加载时建一次: 标题/歌手/简介规范化(NFKC + casefold)后拼成一段文本，
+按单字与相邻两字建倒排表；查询先用倒排表求交得到候选，再逐条确认子串，
+结果与逐条扫描完全一致。上传日期只解析一次，预先排好"最新上传"顺序。
+倒排表在后台线程建立，建好之前查询逐条扫描规范化后的文本。
+
+装了 pypinyin 时另外索引标题的拼音首字母，输入 "qyqx" 可以搜到"千与千寻"。
+"""
+import threading
+import unicodedata
+from array import array
+
+try:
+    from pypinyin import lazy_pinyin, Style
+except ImportError:
+    lazy_pinyin = None
+
+
+def normalize(text):
+    return unicodedata.normalize('NFKC', text or "").casefold()
+
+
+def pinyin_initials(text):
+    if lazy_pinyin is None:
+        return ""
+    # 非汉字原样保留(已规范化)，汉字取拼音首字母
+    return "".join(lazy_pinyin(text, style=Style.FIRST_LETTER, errors='default')).casefold()
+
+
+def parse_date(date_str):
+    """'2024-01-31' -> (2024, 1, 31)，无法解析的排在最后"""
+    try:
+        parts = date_str.split('-')
+        if len(parts) == 3:
+            return int(parts[0]), int(parts[1]), int(parts[2])
+    except (ValueError, AttributeError):
+        pass
+    return 0, 0, 0
+
+
+def _grams(text):
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class _Postings:
+    """文本列表上的 单字/两字 -> 文档下标 倒排表"""
+
+    __slots__ = ("texts", "table")
+
+    def __init__(self, texts):
+        self.texts = texts
+        table = {}
+        for doc, text in enumerate(texts):
+            for gram in _grams(text):
+                ids = table.get(gram)
+                if ids is None:
+                    ids = table[gram] = array('I')
+                ids.append(doc)
+        self.table = table
+
+    def match(self, term, within=None):
+        """包含 term 的文档下标集合；within 限定在上一次的结果内"""
+        grams = [term] if len(term) == 1 else [term[i:i + 2] for i in range(len(term) - 1)]
+        lists = []
+        for gram in set(grams):
+            ids = self.table.get(gram)
+            if ids is None:
+                return set()
+            lists.append(ids)
+        lists.sort(key=len)
+        candidates = set(lists[0]) if within is None else within.intersection(lists[0])
+        for ids in lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(ids)
+        if len(term) <= 2:
+            return candidates
+        texts = self.texts
+        return {doc for doc in candidates if term in texts[doc]}
+
+
+class SearchIndex:
+    def __init__(self, songs):
+        self.songs = songs
+        texts = []
+        titles = []
+        self.types = {}
+        for doc, song in enumerate(songs):
+            title = normalize(song.get('title', '未知'))
+            # 字段之间用换行隔开，查询不会跨字段匹配
+            texts.append("\n".join((title, normalize(song.get('artist', '未知')), normalize(song.get('desc', '')))))
+            titles.append(title)
+            self.types.setdefault(song.get('type', '0'), set()).add(doc)
+        self.texts = texts
+        self._titles = titles
+        self.text = None  # 倒排表，build() 之后可用
+        self.initials = None
+        # 最新上传在前，日期相同保持原顺序
+        dates = [parse_date(song.get('upload_time', '')) for song in songs]
+        self.date_order = sorted(range(len(songs)), key=dates.__getitem__, reverse=True)
+
+    def build(self):
+        initials = _Postings([pinyin_initials(title) for title in self._titles]) if lazy_pinyin is not None else None
+        self.text = _Postings(self.texts)
+        self.initials = initials
+
+    def build_async(self):
+        threading.Thread(target=self.build, name="search-index", daemon=True).start()
+        return self
+
+    @property
+    def ready(self):
+        return self.text is not None
+
+    def __len__(self):
+        return len(self.songs)
+
+    @staticmethod
+    def terms(query):
+        """规范化后按空白拆成多个词，全部命中才算匹配"""
+        return normalize(query).split()
+
+    def search(self, query, type_id=None, by_date=False, within=None):
+        """返回按显示顺序排列的文档下标。within 为上一次结果的下标集合，查询只是在其基础上收窄时传入"""
+        docs = None if within is None else set(within)
+        if type_id is not None:
+            of_type = self.types.get(type_id, set())
+            docs = set(of_type) if docs is None else docs & of_type
+        text, initials = self.text, self.initials
+        for term in self.terms(query):
+            if text is None:
+                pool = range(len(self.texts)) if docs is None else docs
+                found = {doc for doc in pool if term in self.texts[doc]}
+            else:
+                found = text.match(term, docs)
+                if initials is not None and term.isascii():
+                    found |= initials.match(term, docs)
+            docs = found
+            if not docs:
+                return []
+
+        order = self.date_order if by_date else range(len(self.songs))
+        if docs is None:
+            return list(order)
+        if len(docs) * 8 < len(self.songs) and not by_date:
+            return sorted(docs)
+        return [doc for doc in order if doc in docs]
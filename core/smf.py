@@ -0,0 +1,313 @@
+import heapq
+import struct
+from array import array
+from bisect import bisect_right
+
+# 事件类型
+NOTE_ON = 0
+TEMPO = 1
+TIME_SIGNATURE = 2
+
+DEFAULT_TEMPO = 500000
+
+# 通道消息的数据字节数，按高四位索引
+_DATA_BYTES = {0x80: 2, 0x90: 2, 0xA0: 2, 0xB0: 2, 0xC0: 1, 0xD0: 1, 0xE0: 2}
+# 文件中不该出现但需要跳过的系统消息
+_SYSTEM_BYTES = {0xF1: 1, 0xF2: 2, 0xF3: 1}
+
+
+def _read_varlen(buf, pos):
+    value = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        value = (value << 7) | (b & 0x7F)
+        if b < 0x80:
+            return value, pos
+
+
+def read_layout(buf):
+    """解析文件头，返回 (division, [(音轨起点, 音轨终点), ...])"""
+    if len(buf) < 14 or bytes(buf[0:4]) != b'MThd':
+        raise ValueError("不是有效的MIDI文件")
+
+    header_len = struct.unpack_from('>I', buf, 4)[0]
+    _, _, division = struct.unpack_from('>HHH', buf, 8)
+
+    tracks = []
+    pos = 8 + header_len
+    size = len(buf)
+    while pos + 8 <= size:
+        chunk_id = bytes(buf[pos:pos + 4])
+        chunk_len = struct.unpack_from('>I', buf, pos + 4)[0]
+        start = pos + 8
+        if chunk_id == b'MTrk':
+            tracks.append((start, min(start + chunk_len, size)))
+        pos = start + chunk_len
+    return division, tracks
+
+
+def iter_track(buf, start, end, track=0):
+    """按顺序产生单条音轨中演奏需要的事件: (绝对tick, 类型, a, b, c, 音轨号)"""
+    pos = start
+    tick = 0
+    status = 0
+    while pos < end:
+        delta, pos = _read_varlen(buf, pos)
+        tick += delta
+        b = buf[pos]
+
+        if b == 0xFF:
+            meta_type = buf[pos + 1]
+            length, pos = _read_varlen(buf, pos + 2)
+            if meta_type == 0x51 and length >= 3:
+                yield tick, TEMPO, (buf[pos] << 16) | (buf[pos + 1] << 8) | buf[pos + 2], 0, 0, track
+            elif meta_type == 0x58 and length >= 2:
+                yield tick, TIME_SIGNATURE, buf[pos], 1 << buf[pos + 1], 0, track
+            elif meta_type == 0x2F:
+                return
+            pos += length
+            continue
+
+        if b == 0xF0 or b == 0xF7:
+            length, pos = _read_varlen(buf, pos + 1)
+            pos += length
+            continue
+
+        if b >= 0x80:
+            if b >= 0xF0:
+                pos += 1 + _SYSTEM_BYTES.get(b, 0)
+                continue
+            status = b
+            pos += 1
+        elif not status:
+            raise ValueError("MIDI数据损坏: 缺少状态字节")
+
+        kind = status & 0xF0
+        if kind == 0x90 and buf[pos + 1]:
+            yield tick, NOTE_ON, status & 0x0F, buf[pos], buf[pos + 1], track
+        pos += _DATA_BYTES[kind]
+
+
+def _tick_seconds(division):
+    """SMPTE 时间码下每 tick 的秒数；节拍制返回 None"""
+    if division & 0x8000:
+        fps = 256 - (division >> 8)
+        return 1.0 / (fps * (division & 0xFF))
+    return None
+
+
+def iter_timeline(buf):
+    """合并所有音轨，按时间顺序产生 (秒, 类型, a, b, c, 音轨号)；同一 tick 内按音轨顺序"""
+    division, tracks = read_layout(buf)
+    merged = heapq.merge(*(iter_track(buf, s, e, i) for i, (s, e) in enumerate(tracks)), key=lambda ev: ev[0])
+
+    smpte = _tick_seconds(division)
+    if smpte is not None:
+        # SMPTE 时间码，与速度无关
+        for tick, kind, a, b, c, track in merged:
+            yield tick * smpte, kind, a, b, c, track
+        return
+
+    # 按速度段换算，与 TempoMap 结果一致
+    tick_s = DEFAULT_TEMPO / (division * 1_000_000)
+    seg_tick = 0
+    seg_s = 0.0
+    for tick, kind, a, b, c, track in merged:
+        if kind == TEMPO:
+            seg_s += (tick - seg_tick) * tick_s
+            seg_tick = tick
+            tick_s = a / (division * 1_000_000)
+        yield seg_s + (tick - seg_tick) * tick_s, kind, a, b, c, track
+
+
+class TempoMap:
+    """tick -> 秒 的分段换算表，每次变速开始一段"""
+
+    __slots__ = ("ticks", "seconds", "scales")
+
+    def __init__(self, division, tempo_events=()):
+        """tempo_events: 按 tick 排序的 (tick, 微秒每拍)"""
+        smpte = _tick_seconds(division)
+        self.ticks = array('d', [0])
+        self.seconds = array('d', [0.0])
+        self.scales = array('d', [smpte if smpte is not None else DEFAULT_TEMPO / (division * 1_000_000)])
+        if smpte is not None:
+            return
+        for tick, tempo in tempo_events:
+            start = self.seconds[-1] + (tick - self.ticks[-1]) * self.scales[-1]
+            if tick == self.ticks[-1]:
+                # 同一 tick 的多次变速以最后一次为准
+                self.seconds[-1] = start
+                self.scales[-1] = tempo / (division * 1_000_000)
+                continue
+            self.ticks.append(tick)
+            self.seconds.append(start)
+            self.scales.append(tempo / (division * 1_000_000))
+
+    def seconds_at(self, tick):
+        i = bisect_right(self.ticks, tick) - 1
+        return self.seconds[i] + (tick - self.ticks[i]) * self.scales[i]
+
+    def convert(self, sorted_ticks):
+        """把已排序的 tick 序列批量换算为秒，顺序走一遍分段表"""
+        out = array('d')
+        append = out.append
+        seg_ticks, seg_seconds, scales = self.ticks, self.seconds, self.scales
+        last = len(seg_ticks) - 1
+        i = 0
+        next_tick = seg_ticks[1] if last else None
+        base_tick, base_s, scale = seg_ticks[0], seg_seconds[0], scales[0]
+        for tick in sorted_ticks:
+            while next_tick is not None and tick >= next_tick:
+                i += 1
+                base_tick, base_s, scale = seg_ticks[i], seg_seconds[i], scales[i]
+                next_tick = seg_ticks[i + 1] if i < last else None
+            append(base_s + (tick - base_tick) * scale)
+        return out
+
+
+class NoteScan:
+    """扫描结果: 按 (tick, 音轨) 排序的紧凑 note_on 记录，外加速度表与拍号"""
+
+    __slots__ = ("division", "ticks", "tracks", "channels", "notes", "velocities",
+                 "tempos", "time_signatures", "track_names", "end_tick")
+
+    def __init__(self, division):
+        self.division = division
+        self.ticks = array('Q')
+        self.tracks = array('H')
+        self.channels = array('B')
+        self.notes = array('B')
+        self.velocities = array('B')
+        self.tempos = []            # [(tick, 微秒每拍)]
+        self.time_signatures = []   # [(tick, 分子, 分母)]
+        self.track_names = []
+        self.end_tick = 0
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def tempo_map(self):
+        return TempoMap(self.division, self.tempos)
+
+    def bar_ticks(self):
+        """每小节起始 tick，按拍号推算到文件结尾；SMPTE 文件没有小节概念"""
+        if self.division & 0x8000:
+            return [0]
+        division = self.division
+        bars = [0]
+        length = 4 * division
+        next_bar = length
+        for tick, numerator, denominator in self.time_signatures:
+            while next_bar <= tick:
+                bars.append(next_bar)
+                next_bar += length
+            length = numerator * 4 * division / denominator
+            next_bar = tick + length
+        while next_bar <= self.end_tick:
+            bars.append(next_bar)
+            next_bar += length
+        return bars
+
+
+def _decode_name(raw):
+    for encoding in ('utf-8', 'gbk'):
+        try:
+            return raw.decode(encoding)
+        except UnicodeDecodeError:
+            pass
+    return raw.decode('latin-1')
+
+
+def _scan_track(buf, pos, end, track, scan):
+    # 热路径: 直接读字节写入数组，不构造任何消息对象
+    ticks = scan.ticks.append
+    channels = scan.channels.append
+    notes = scan.notes.append
+    velocities = scan.velocities.append
+    data_bytes = _DATA_BYTES
+    name = None
+    tick = 0
+    status = 0
+    count = 0
+    while pos < end:
+        b = buf[pos]
+        pos += 1
+        delta = b & 0x7F
+        while b & 0x80:
+            b = buf[pos]
+            pos += 1
+            delta = (delta << 7) | (b & 0x7F)
+        tick += delta
+        b = buf[pos]
+
+        if b < 0x80:
+            # 运行状态
+            if not status:
+                raise ValueError("MIDI数据损坏: 缺少状态字节")
+        elif b < 0xF0:
+            status = b
+            pos += 1
+        elif b == 0xFF:
+            meta_type = buf[pos + 1]
+            length, pos = _read_varlen(buf, pos + 2)
+            if meta_type == 0x51 and length >= 3:
+                scan.tempos.append((tick, (buf[pos] << 16) | (buf[pos + 1] << 8) | buf[pos + 2]))
+            elif meta_type == 0x58 and length >= 2:
+                scan.time_signatures.append((tick, buf[pos], 1 << buf[pos + 1]))
+            elif meta_type == 0x03 and name is None:
+                name = _decode_name(bytes(buf[pos:pos + length]))
+            elif meta_type == 0x2F:
+                break
+            pos += length
+            continue
+        elif b == 0xF0 or b == 0xF7:
+            length, pos = _read_varlen(buf, pos + 1)
+            pos += length
+            continue
+        else:
+            pos += 1 + _SYSTEM_BYTES.get(b, 0)
+            continue
+
+        kind = status & 0xF0
+        if kind == 0x90 and buf[pos + 1]:
+            ticks(tick)
+            channels(status & 0x0F)
+            notes(buf[pos])
+            velocities(buf[pos + 1])
+            count += 1
+        pos += data_bytes[kind]
+
+    scan.track_names.append(name or "")
+    scan.end_tick = max(scan.end_tick, tick)
+    return count
+
+
+def scan_notes(buf):
+    """一次扫描整个文件(bytes / mmap / memoryview 均可，不复制)，只提取演奏需要的数据"""
+    division, layout = read_layout(buf)
+    scan = NoteScan(division)
+    counts = []
+    for i, (start, end) in enumerate(layout):
+        n = _scan_track(buf, start, end, i, scan)
+        scan.tracks.extend(array('H', [i]) * n)
+        counts.append(n)
+
+    # 各音轨内部已按 tick 有序，多音轨时按 tick 归并；同 tick 保持音轨顺序
+    if sum(1 for n in counts if n) > 1:
+        ticks = scan.ticks
+        runs = []
+        start = 0
+        for n in counts:
+            if n:
+                runs.append(zip(ticks[start:start + n], range(start, start + n)))
+            start += n
+        order = array('L', (i for _, i in heapq.merge(*runs)))
+        for field in ("ticks", "tracks", "channels", "notes", "velocities"):
+            src = getattr(scan, field)
+            setattr(scan, field, array(src.typecode, map(src.__getitem__, order)))
+    # 稳定排序，同 tick 的变速按音轨顺序生效
+    scan.tempos.sort(key=lambda ev: ev[0])
+    scan.time_signatures.sort(key=lambda ev: ev[0])
+    return scan
@@ -0,0 +1,79 @@
+import json
+import os
+import time
+from array import array
+
+REPORT_DIR = "reports"
+
+
+def percentile(sorted_values, pct):
+    # 最近秩法，输入需已排序
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(-(-pct * len(sorted_values) // 100)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class TimingRecorder:
+    """记录每个批次的计划时间、实际发送时间、点击数与发送耗时"""
+
+    def __init__(self):
+        self.scheduled = array('d')
+        self.dispatched = array('d')
+        self.clicks = array('H')
+        self.cost = array('d')
+        self.dropped = array('H')
+
+    def __len__(self):
+        return len(self.scheduled)
+
+    def record(self, scheduled, dispatched, clicks, cost, dropped=0):
+        self.scheduled.append(scheduled)
+        self.dispatched.append(dispatched)
+        self.clicks.append(clicks)
+        self.cost.append(cost)
+        self.dropped.append(dropped)
+
+    def _lateness_ms(self, start=0):
+        return sorted((d - s) * 1000 for s, d in zip(self.scheduled[start:], self.dispatched[start:]))
+
+    def summary(self, start=0):
+        lateness = self._lateness_ms(start)
+        cost = self.cost[start:]
+        dropped = self.dropped[start:]
+        return {
+            "batches": len(lateness),
+            "clicks": sum(self.clicks[start:]),
+            "late_p50_ms": round(percentile(lateness, 50), 3),
+            "late_p95_ms": round(percentile(lateness, 95), 3),
+            "late_p99_ms": round(percentile(lateness, 99), 3),
+            "late_max_ms": round(lateness[-1], 3) if lateness else 0.0,
+            "dropped_batches": sum(1 for d in dropped if d),
+            "dropped_notes": sum(dropped),
+            "dispatch_total_ms": round(sum(cost) * 1000, 3),
+            "dispatch_max_ms": round(max(cost) * 1000, 3) if cost else 0.0,
+        }
+
+    def histogram(self, bucket_ms=0.5, buckets=40):
+        # 迟到时间直方图，最后一格收纳所有超出范围的
+        counts = [0] * buckets
+        for s, d in zip(self.scheduled, self.dispatched):
+            i = int((d - s) * 1000 / bucket_ms)
+            counts[min(max(i, 0), buckets - 1)] += 1
+        return {"bucket_ms": bucket_ms, "counts": counts}
+
+    def report(self, **extra):
+        data = {"created": time.strftime("%Y-%m-%d %H:%M:%S")}
+        data.update(extra)
+        data["timing"] = self.summary()
+        data["histogram"] = self.histogram()
+        return data
+
+
+def save_report(report, name=None):
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    name = name or time.strftime("timing-%Y%m%d-%H%M%S.json")
+    path = os.path.join(REPORT_DIR, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path
@@ -0,0 +1,90 @@
+"""按内容寻址的本地 MIDI 库
+
+文件按 SHA-256 存放在 store/<前两位>/<哈希>.mid，内容相同只存一份；同名
+不同内容的曲子也不会互相覆盖。收藏记录里保存哈希，解析、分析、演奏计划
+的缓存本来就以内容哈希为键，库内文件的哈希直接取自文件名，不必再读一遍。
+
+index.jsonl 是只追加的入库日志，每次入库一行(哈希、大小、标题、来源)，
+库里的文件名只有哈希，需要时可据此查到原来的标题和来源。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+STORE_DIR = "store"
+INDEX_NAME = "index.jsonl"
+BLOB_EXT = ".mid"
+_HEX = set("0123456789abcdef")
+_lock = threading.Lock()
+
+
+def blob_path(digest):
+    return os.path.join(os.path.abspath(STORE_DIR), digest[:2], digest + BLOB_EXT)
+
+
+def digest_of(path):
+    """库内文件返回文件名里的哈希，其它文件返回 None"""
+    name, ext = os.path.splitext(os.path.basename(path))
+    if ext != BLOB_EXT or len(name) != 64 or not _HEX.issuperset(name):
+        return None
+    shard = os.path.dirname(os.path.abspath(path))
+    if os.path.basename(shard) != name[:2] or os.path.dirname(shard) != os.path.abspath(STORE_DIR):
+        return None
+    return name
+
+
+def hash_file(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def temp_path(name):
+    """下载等先写到库目录下的临时位置，入库时同盘 rename"""
+    tmp_dir = os.path.join(os.path.abspath(STORE_DIR), "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, name)
+
+
+def put_file(path, title, source=None, move=False):
+    """把文件放入库中，返回内容哈希。move=True 时源文件被移走(已存在相同内容时删除)"""
+    digest = hash_file(path)
+    dest = blob_path(digest)
+    with _lock:
+        if os.path.exists(dest):
+            if move:
+                os.remove(path)
+        else:
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            if move:
+                os.replace(path, dest)
+            else:
+                tmp_path = f"{dest}.{threading.get_ident()}.tmp"
+                try:
+                    shutil.copyfile(path, tmp_path)
+                    os.replace(tmp_path, dest)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+        _append_index({
+            'hash': digest,
+            'size': os.path.getsize(dest),
+            'title': title,
+            'source': source,
+            'added': time.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return digest
+
+
+def _append_index(entry):
+    try:
+        with open(os.path.join(STORE_DIR, INDEX_NAME), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"[DEBUG] 曲库索引写入失败: {e}")
+
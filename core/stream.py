@@ -0,0 +1,148 @@
+import mmap
+import queue
+import threading
+from array import array
+
+from core.chords import reduce_chord
+from core.notes import parse_track_keys
+from core.profile_base import BaseProfile
+from core.window import pack_lparam
+from core.smf import iter_timeline, NOTE_ON
+
+STREAM_THRESHOLD_BYTES = 2 * 1024 * 1024  # 自动模式下超过此大小改用流式
+LOAD_MODES = {"auto": "自动", "plan": "预编译(可跳转)", "stream": "流式(低内存)"}
+
+
+class NoteStream:
+    """边解码边编译的演奏流，内存中只保留有限的前瞻批次。不支持跳转"""
+
+    BUFFER_BATCHES = 512
+    PRELOAD_S = 3.0
+
+    _END = object()
+
+    def __init__(self, midi_path, profile: BaseProfile, size, pitch=0, speed=1.0,
+                 batch_window=0.01, max_polyphony=5, chord_policy="melody", tracks=None, range_mode="drop"):
+        self.midi_path = midi_path
+        self.profile = profile
+        self.size = size
+        self.pitch = pitch
+        self.window = batch_window * speed  # 换算到 MIDI 时间
+        self.max_polyphony = max_polyphony
+        self.chord_policy = chord_policy
+        self.range_mode = range_mode
+        self.tracks = parse_track_keys(tracks)
+
+        self.decoded_until = 0.0  # 已解码到的 MIDI 时间，也是目前已知的时长下限
+        self.batches = 0
+        self.finished = False
+        self._queue = queue.Queue(maxsize=self.BUFFER_BATCHES)
+        self._ready = threading.Event()
+        self._closed = False
+        self._error = None
+        self._pending_size = None
+        self._thread = threading.Thread(target=self._produce, name="note-stream", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def close(self):
+        self._closed = True
+        # 让阻塞在满队列上的生产者退出
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
+
+    def resize(self, size):
+        """由生产线程在下一个批次前应用，避免与解码并发修改乐器尺寸"""
+        self._pending_size = tuple(size)
+
+    def wait_ready(self):
+        """阻塞到前几秒已解码或文件已读完，期间的解析错误直接抛出"""
+        self._ready.wait()
+        if self._error:
+            raise self._error
+        if self.finished and not self.batches:
+            raise ValueError("没有可演奏的音符")
+
+    def get(self, timeout=None):
+        """取下一个批次 (MIDI 时间, xs, ys, lparams, 丢弃数)；结束返回 None，超时抛出 queue.Empty"""
+        item = self._queue.get(timeout=timeout)
+        if item is self._END:
+            if self._error:
+                raise self._error
+            return None
+        return item
+
+    def _put(self, item):
+        while not self._closed:
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                # 缓冲已满说明前瞻足够，可以开始演奏
+                self._ready.set()
+        return False
+
+    def _flush(self, start, chord):
+        kept, dropped = reduce_chord(chord, self.max_polyphony, self.chord_policy)
+        if self._pending_size:
+            # 窗口缩放后，之后解码的批次改用新尺寸；已在缓冲里的批次不变
+            self.profile.update_size(*self._pending_size)
+            self._pending_size = None
+        xs, ys, lparams = array('i'), array('i'), array('I')
+        for note in kept:
+            for x, y in self.profile.get_clicks(note):
+                xs.append(int(x))
+                ys.append(int(y))
+                lparams.append(pack_lparam(int(x), int(y)))
+        self.batches += 1
+        self.decoded_until = start
+        if start >= self.PRELOAD_S:
+            self._ready.set()
+        return self._put((start, xs, ys, lparams, dropped))
+
+    def _produce(self):
+        profile = self.profile
+        profile.update_size(*self.size)
+        profile.reset()
+        # 与预编译计划相同: 查一次表得到移调(及折叠)后的音，-1 表示弹不了
+        if self.range_mode == "fold":
+            targets = profile.fold_notes(self.pitch)
+        else:
+            playable = profile.playable_notes(self.pitch)
+            targets = [note + self.pitch if playable[note] else -1 for note in range(len(playable))]
+        window = self.window
+        selected = self.tracks
+
+        try:
+            with open(self.midi_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                chord_start = 0.0
+                chord = []
+                for seconds, kind, channel, note, _, track in iter_timeline(buf):
+                    if kind != NOTE_ON:
+                        continue
+                    if selected is not None and (track, channel) not in selected:
+                        continue
+                    note = targets[note]
+                    if note < 0:
+                        continue
+                    if chord and seconds - chord_start >= window:
+                        if not self._flush(chord_start, chord):
+                            return
+                        chord = []
+                    if not chord:
+                        chord_start = seconds
+                    chord.append(note)
+                    if self._closed:
+                        return
+                if chord:
+                    self._flush(chord_start, chord)
+        except Exception as e:
+            self._error = e if isinstance(e, ValueError) else ValueError(f"MIDI解析失败: {e}")
+        finally:
+            self.finished = True
+            self._ready.set()
+            self._put(self._END)
@@ -0,0 +1,65 @@
+import ctypes
+from ctypes import wintypes
+
+class RECT(ctypes.Structure):
+    _fields_ = [("left", ctypes.c_long), ("top", ctypes.c_long), ("right", ctypes.c_long), ("bottom", ctypes.c_long)]
+
+
+class WindowGeometry:
+    """游戏窗口客户区: 大小(物理像素)与屏幕原点
+
+    Qt6 让进程按显示器感知 DPI，GetClientRect 拿到的就是物理像素，布局按客户区
+    大小缩放时 DPI 已经算在里面，不再单独读取。
+    """
+
+    __slots__ = ("width", "height", "left", "top")
+
+    def __init__(self, width, height, left, top):
+        self.width = width
+        self.height = height
+        self.left = left
+        self.top = top
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def pack_lparam(x, y):
+    # 鼠标消息的 lParam: 低 16 位 x，高 16 位 y，均为客户区坐标
+    return ((y & 0xFFFF) << 16) | (x & 0xFFFF)
+
+
+class WindowTracker:
+    """读取一次客户区，之后由调用方定期 poll 检查移动/缩放，热路径不再做坐标换算"""
+
+    def __init__(self, user32, hwnd):
+        self.hwnd = hwnd
+        self._get_client_rect = user32.GetClientRect
+        self._client_to_screen = user32.ClientToScreen
+        self._is_window = user32.IsWindow
+        self.geometry = self.read()
+
+    def read(self) -> WindowGeometry | None:
+        hwnd = self.hwnd
+        if not hwnd or not self._is_window(hwnd):
+            return None
+        rect = RECT()
+        if not self._get_client_rect(hwnd, ctypes.byref(rect)):
+            return None
+        origin = wintypes.POINT(0, 0)
+        self._client_to_screen(hwnd, ctypes.byref(origin))
+        return WindowGeometry(rect.right - rect.left, rect.bottom - rect.top, origin.x, origin.y)
+
+    def poll(self):
+        """重新读取几何信息，返回 (是否移动, 是否改变大小)。窗口已关闭时 geometry 变为 None"""
+        old, new = self.geometry, self.read()
+        self.geometry = new
+        if old is None or new is None:
+            return old is not new, old is not new
+        moved = (old.left, old.top) != (new.left, new.top)
+        resized = (old.width, old.height) != (new.width, new.height)
+        return moved, resized
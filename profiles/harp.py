@@ -1,134 +1,116 @@
-from core.profile_base import BaseProfile
+from core.layout import check_int, check_list, fail
+from core.profile_base import ClickTable, LayoutProfile, NOTE_COUNT
+from profiles.harp_planner import plan_pedals
 
 
-class HarpProfile(BaseProfile):
+class HarpTable(ClickTable):
+    """竖琴点击表: 每个音符的候选弦(按弦序)，以及 7 个踏板 x 3 种状态的踏板点击"""
 
-    REF_W, REF_H = 2047, 1151
+    __slots__ = ("candidates", "pedal_clicks", "pedal_keys")
 
-    Y_SHARP = 45
-    Y_NAT = 110
-    Y_FLAT = 170
+    def __init__(self, size):
+        super().__init__(size)
+        self.candidates = [()] * NOTE_COUNT  # ((弦点击, 踏板编号, 所需状态), ...)
+        self.pedal_clicks = [None] * 21      # 下标 踏板编号 * 3 + 状态 + 1
+        self.pedal_keys = {}                 # 踏板点击 -> 踏板编号
 
-    PEDAL_XS = [695, 815, 940, 1100, 1220, 1340, 1465]  # C D E F G A B
-    STRING_Y = 910
+    def pedal_click(self, diatonic_idx, state):
+        return self.pedal_clicks[diatonic_idx * 3 + state + 1]
 
-    BASE_NOTE = 24  # 第1弦 MIDI码
-    SCALE_INTERVALS = [0, 2, 4, 5, 7, 9, 11]  # 大调自然音阶
 
-    STRING_XS = [
-        155, 190, 230, 265, 305, 340, 380, 420, 460, 495, 535, 570, 610, 645, 685, 725, 760,
-        800, 840, 875, 915, 950, 990, 1030, 1065, 1105, 1140, 1175, 1215, 1255, 1290, 1330,
-        1370, 1405, 1445, 1480, 1520, 1560, 1595, 1635, 1670, 1710, 1750, 1790, 1825, 1860, 1900
-    ]  # 47根
+class HarpProfile(LayoutProfile):
+    """带 7 个踏板的竖琴: 每根弦 ♮ 音高由 base_note + 音阶推出，踏板 #/b 可升降半音"""
 
-    def __init__(self):
-        super().__init__()
-        self._last_size = (0, 0)
-
-        self._rx = 1.0
-        self._ry = 1.0
-
-        self._pedal_x_scaled = []
-        self._y_sharp_scaled = 0
-        self._y_nat_scaled = 0
-        self._y_flat_scaled = 0
-
-        self._string_x_scaled = []
-        self._string_y_scaled = 0
+    PEDAL_STATES = {"sharp": 1, "natural": 0, "flat": -1}
 
+    def __init__(self, layout):
+        super().__init__(layout)
         # 记录当前踏板状态：0=♮, 1=#, -1=b
-        self.current_pedal_states = {k: 0 for k in range(7)}
-
-    @property
-    def name(self):
-        return "PC 竖琴 (含踏板47键)"
+        self.current_pedal_states = [0] * 7
+
+    @classmethod
+    def validate(cls, layout):
+        path = layout.path
+        strings = layout.data.get('strings')
+        pedals = layout.data.get('pedals')
+        if not isinstance(strings, dict) or not isinstance(pedals, dict):
+            fail(path, "缺少 strings 或 pedals")
+        check_int(path, strings.get('base_note'), "strings.base_note", 0, 127)
+        check_list(path, strings.get('scale'), "strings.scale", 7, 0, 11)
+        check_int(path, strings.get('y'), "strings.y", 0)
+        check_list(path, strings.get('xs'), "strings.xs", lo=0)
+        check_list(path, pedals.get('xs'), "pedals.xs", 7, lo=0)
+        ys = pedals.get('y')
+        if not isinstance(ys, dict) or set(ys) != set(cls.PEDAL_STATES):
+            fail(path, "pedals.y 应包含 sharp / natural / flat")
+        for state in cls.PEDAL_STATES:
+            check_int(path, ys[state], f"pedals.y.{state}", 0)
 
     def reset(self):
         # 每次播放开始前重置踏板状态
-        self.current_pedal_states = {k: 0 for k in range(7)}
-
-    def _remap(self):
-        if (self.w, self.h) == self._last_size:
-            return
-
-        self._rx = self.w / self.REF_W
-        self._ry = self.h / self.REF_H
-
-        self._pedal_x_scaled = [int(x * self._rx) for x in self.PEDAL_XS]
-        self._y_sharp_scaled = int(self.Y_SHARP * self._ry)
-        self._y_nat_scaled = int(self.Y_NAT * self._ry)
-        self._y_flat_scaled = int(self.Y_FLAT * self._ry)
-
-        self._string_x_scaled = [int(x * self._rx) for x in self.STRING_XS]
-        self._string_y_scaled = int(self.STRING_Y * self._ry)
-
-        self._last_size = (self.w, self.h)
-
-    def _pedal_pos(self, diatonic_idx: int, state: int) -> tuple[int, int]:
-        # state: 1(#), 0(♮), -1(b)
-        x = self._pedal_x_scaled[diatonic_idx]
-        if state == 1:
-            y = self._y_sharp_scaled
-        elif state == 0:
-            y = self._y_nat_scaled
-        else:
-            y = self._y_flat_scaled
-        return x, y
-
-    def can_play(self, note: int) -> bool:
-        """算法:不改变踏板状态的前提下，判断这个音符是否能被某根弦覆盖"""
-        self._remap()
-        for s_idx in range(len(self._string_x_scaled)):
+        self.current_pedal_states = [0] * 7
+
+    def build_table(self):
+        rx, ry = self.layout.scale(self.w, self.h)
+        strings = self.layout.data['strings']
+        pedals = self.layout.data['pedals']
+        table = HarpTable((self.w, self.h))
+
+        pedal_xs = [int(x * rx) for x in pedals['xs']]
+        state_ys = {self.PEDAL_STATES[name]: int(y * ry) for name, y in pedals['y'].items()}
+        for d_idx, x in enumerate(pedal_xs):
+            for state, y in state_ys.items():
+                table.pedal_clicks[d_idx * 3 + state + 1] = (x, y)
+                table.pedal_keys[(x, y)] = d_idx
+
+        # 每根弦在 ♮ 状态下的音高，踏板 #/b 可升降半音；按弦序收集每个音符的候选
+        base_note, scale = strings['base_note'], strings['scale']
+        string_y = int(strings['y'] * ry)
+        candidates = [[] for _ in range(NOTE_COUNT)]
+        for s_idx, x in enumerate(strings['xs']):
             diatonic_idx = s_idx % 7
             octave = s_idx // 7
-            natural_pitch = self.BASE_NOTE + (octave * 12) + self.SCALE_INTERVALS[diatonic_idx]
-            diff = note - natural_pitch
-            if diff in (-1, 0, 1):
-                return True
-        return False
-
-    def get_pos(self, note: int):
-        return None
+            natural_pitch = base_note + (octave * 12) + scale[diatonic_idx]
+            for diff in (-1, 0, 1):
+                note = natural_pitch + diff
+                if 0 <= note < NOTE_COUNT:
+                    candidates[note].append(((int(x * rx), string_y), diatonic_idx, diff))
+
+        for note, options in enumerate(candidates):
+            if options:
+                table.candidates[note] = tuple(options)
+                table.set(note, options[0][0])
+        return table
+
+    def state_key(self, click):
+        return self.table.pedal_keys.get(tuple(click))
+
+    def reset_clicks(self):
+        table = self.table
+        return [table.pedal_click(d_idx, 0) for d_idx in range(7)]
+
+    def plan_batches(self, times, chords, window):
+        """看完整首曲子再决定弦与踏板，代替逐音贪心"""
+        self.reset()
+        batches, info = plan_pedals(self.table, times, chords, window)
+        print(f"[DEBUG] 踏板编排: 贪心 {info['greedy_pedal_clicks']} 次 -> {info['pedal_clicks']} 次，"
+              f"提前 {info['pedal_moves_relocated']} 次")
+        return batches, info
 
     def get_clicks(self, note: int) -> list[tuple[int, int]]:
-        self._remap()
-
-        best_string_idx = -1
-        required_state = 0
-        pedal_note_idx = 0
-        found = False
-
-        for s_idx in range(len(self._string_x_scaled)):
-            diatonic_idx = s_idx % 7
-            octave = s_idx // 7
-            natural_pitch = self.BASE_NOTE + (octave * 12) + self.SCALE_INTERVALS[diatonic_idx]
-            diff = note - natural_pitch
-
-            if diff in (-1, 0, 1):
-                if not found:
-                    best_string_idx = s_idx
-                    required_state = diff
-                    pedal_note_idx = diatonic_idx
-                    found = True
-
-                cur_state = self.current_pedal_states[diatonic_idx]
-                if cur_state == diff:
-                    best_string_idx = s_idx
-                    required_state = diff
-                    pedal_note_idx = diatonic_idx
-                    break
-
-        if not found:
+        """优先选不用踩踏板就能弹的弦，否则用第一根能覆盖的弦并先踩踏板"""
+        if not 0 <= note < NOTE_COUNT:
+            return []
+        options = self.table.candidates[note]
+        if not options:
             return []
 
-        clicks: list[tuple[int, int]] = []
-
-        # 先踩踏板
-        if self.current_pedal_states[pedal_note_idx] != required_state:
-            clicks.append(self._pedal_pos(pedal_note_idx, required_state))
-            self.current_pedal_states[pedal_note_idx] = required_state
+        states = self.current_pedal_states
+        for string_click, pedal_idx, required_state in options:
+            if states[pedal_idx] == required_state:
+                return [string_click]
 
-        # 再弹弦
-        sx = self._string_x_scaled[best_string_idx]
-        clicks.append((sx, self._string_y_scaled))
-        return clicks
+        string_click, pedal_idx, required_state = options[0]
+        states[pedal_idx] = required_state
+        # 先踩踏板，再弹弦
+        return [self.table.pedal_click(pedal_idx, required_state), string_click]
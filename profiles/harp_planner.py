@@ -0,0 +1,140 @@
+"""竖琴踏板离线编排
+
+逐音贪心时，每个音只看当前踏板状态，经常踩了又踩回来。这里在整首曲子上
+对 7 个踏板的组合状态做束搜索(动态规划 + 剪枝)，为每个音选择弦与踏板状态，
+使踏板点击总数最少；再把剩下的踏板动作挪到前面较空闲的批次，不占用和弦时刻。
+"""
+
+BEAM_WIDTH = 24      # 每个和弦后保留的踏板状态数
+LOOKBACK = 32        # 踏板动作最多提前到多少个批次之前
+START_STATE = (0,) * 7
+
+
+def _greedy_choices(table, chords):
+    """与 HarpProfile.get_clicks 相同的逐音选择，返回 (每个和弦的候选下标, 踏板点击数)"""
+    state = list(START_STATE)
+    result = []
+    pedals = 0
+    for notes in chords:
+        choices = []
+        for note in notes:
+            options = table.candidates[note]
+            pick = 0
+            for k, (_, pedal, need) in enumerate(options):
+                if state[pedal] == need:
+                    pick = k
+                    break
+            else:
+                _, pedal, need = options[0]
+                state[pedal] = need
+                pedals += 1
+            choices.append(pick)
+        result.append(tuple(choices))
+    return result, pedals
+
+
+def _beam_choices(table, chords, beam_width):
+    """束搜索，返回 (每个和弦的候选下标, 踏板点击数)"""
+    beam = {START_STATE: 0}
+    history = []  # 每个和弦: 状态 -> (上一个和弦后的状态, 候选下标)
+    limit = beam_width * 4
+    for notes in chords:
+        # 状态 -> (代价, 和弦开始前的状态, 已选候选)
+        frontier = {state: (cost, state, ()) for state, cost in beam.items()}
+        for note in notes:
+            options = table.candidates[note]
+            expanded = {}
+            for state, (cost, origin, choices) in frontier.items():
+                for k, (_, pedal, need) in enumerate(options):
+                    if state[pedal] == need:
+                        new_state, new_cost = state, cost
+                    else:
+                        new_state = state[:pedal] + (need,) + state[pedal + 1:]
+                        new_cost = cost + 1
+                    best = expanded.get(new_state)
+                    if best is None or new_cost < best[0]:
+                        expanded[new_state] = (new_cost, origin, choices + (k,))
+            frontier = expanded
+            if len(frontier) > limit:
+                frontier = dict(sorted(frontier.items(), key=lambda item: item[1][0])[:limit])
+
+        if len(frontier) > beam_width:
+            # 稳定排序: 代价相同时保留先展开的，即更接近贪心的选择
+            frontier = dict(sorted(frontier.items(), key=lambda item: item[1][0])[:beam_width])
+        history.append({state: (origin, choices) for state, (_, origin, choices) in frontier.items()})
+        beam = {state: cost for state, (cost, _, _) in frontier.items()}
+
+    if not history:
+        return [], 0
+    state = min(beam, key=beam.get)
+    cost = beam[state]
+    result = [()] * len(history)
+    for i in range(len(history) - 1, -1, -1):
+        state, result[i] = history[i][state]
+    return result, cost
+
+
+def _build_batches(table, times, chords, choices, window):
+    """按选定的候选生成点击；踏板动作尽量挪到上次用到该踏板之后、最空闲的批次末尾"""
+    count = len(chords)
+    inline = [[] for _ in range(count)]
+    tail = [[] for _ in range(count)]
+    inserted = {}
+    load = [len(notes) for notes in chords]
+    state = list(START_STATE)
+    last_use = [-1] * 7
+    pedals = moved = 0
+
+    for j, notes in enumerate(chords):
+        used_here = set()
+        for note, k in zip(notes, choices[j]):
+            string_click, pedal, need = table.candidates[note][k]
+            if state[pedal] != need:
+                click = table.pedal_click(pedal, need)
+                pedals += 1
+                lo = max(last_use[pedal] + 1, j - LOOKBACK)
+                prev_t = times[j - 1] if j else 0.0
+                if pedal in used_here:
+                    # 同一和弦里同一踏板要两种状态，只能现场切换
+                    inline[j].append(click)
+                elif lo < j:
+                    host = min(range(lo, j), key=lambda i: (load[i], i))
+                    tail[host].append(click)
+                    load[host] += 1
+                    moved += 1
+                elif times[j] - prev_t >= 2 * window:
+                    # 紧挨着的上一批还在用这个踏板，空隙够大就在中间单独踩
+                    inserted.setdefault(j, []).append(click)
+                    moved += 1
+                else:
+                    inline[j].append(click)
+                state[pedal] = need
+            inline[j].append(string_click)
+            used_here.add(pedal)
+            last_use[pedal] = j
+
+    batches = []
+    for j in range(count):
+        if j in inserted:
+            prev_t = times[j - 1] if j else 0.0
+            batches.append(((prev_t + times[j]) / 2, inserted[j], None))
+        batches.append((times[j], inline[j] + tail[j], j))
+    return batches, pedals, moved
+
+
+def plan_pedals(table, times, chords, window, beam_width=BEAM_WIDTH):
+    """table: HarpTable；chords: 每个批次要弹的音符(均可演奏)。返回 (批次列表, 统计)"""
+    greedy, greedy_pedals = _greedy_choices(table, chords)
+    planned, planned_pedals = _beam_choices(table, chords, beam_width)
+    if planned_pedals >= greedy_pedals:
+        # 剪枝后不一定更优，至少不比贪心差
+        planned, planned_pedals = greedy, greedy_pedals
+
+    batches, pedals, moved = _build_batches(table, times, chords, planned, window)
+    info = {
+        'greedy_pedal_clicks': greedy_pedals,
+        'pedal_clicks': pedals,
+        'clicks_saved': greedy_pedals - pedals,
+        'pedal_moves_relocated': moved,
+    }
+    return batches, info
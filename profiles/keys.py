@@ -0,0 +1,65 @@
+from core.layout import check_int, check_list, check_note_range, fail
+from core.profile_base import LayoutProfile
+
+
+class KeyLayoutProfile(LayoutProfile):
+    """每个音符固定一个点击位置的乐器(钢琴、吉他等)。
+
+    keys 中的映射规则依次生效，后面的规则覆盖前面的:
+      sequence: 音域内属于 pitch_classes 的音按从低到高依次取 xs，y 固定
+      columns:  x 按音名取 xs[音符 % 12]，y 按 rows 中所在音域取
+    """
+
+    @classmethod
+    def validate(cls, layout):
+        path = layout.path
+        rules = layout.data.get('keys')
+        if not isinstance(rules, list) or not rules:
+            fail(path, "keys 应为非空数组")
+        for i, rule in enumerate(rules):
+            field = f"keys[{i}]"
+            if not isinstance(rule, dict):
+                fail(path, f"{field} 应为对象")
+            check_note_range(path, rule.get('notes'), f"{field}.notes")
+            kind = rule.get('type')
+            if kind == "sequence":
+                check_list(path, rule.get('pitch_classes'), f"{field}.pitch_classes", lo=0, hi=11)
+                check_int(path, rule.get('y'), f"{field}.y", 0)
+                check_list(path, rule.get('xs'), f"{field}.xs", lo=0)
+            elif kind == "columns":
+                check_list(path, rule.get('xs'), f"{field}.xs", 12, lo=0)
+                rows = rule.get('rows')
+                if not isinstance(rows, list) or not rows:
+                    fail(path, f"{field}.rows 应为非空数组")
+                for j, row in enumerate(rows):
+                    if not isinstance(row, dict):
+                        fail(path, f"{field}.rows[{j}] 应为对象")
+                    check_note_range(path, row.get('notes'), f"{field}.rows[{j}].notes")
+                    check_int(path, row.get('y'), f"{field}.rows[{j}].y", 0)
+            else:
+                fail(path, f"{field}.type 未知: {kind!r}")
+
+    def positions(self):
+        rx, ry = self.layout.scale(self.w, self.h)
+        positions = {}
+        for rule in self.layout.data['keys']:
+            lo, hi = rule['notes']
+            if rule['type'] == "sequence":
+                classes = set(rule['pitch_classes'])
+                y = int(rule['y'] * ry)
+                xs = rule['xs']
+                ptr = 0
+                for note in range(lo, hi + 1):
+                    if note % 12 not in classes:
+                        continue
+                    if ptr < len(xs):
+                        positions[note] = (int(xs[ptr] * rx), y)
+                    ptr += 1
+            else:
+                xs = [int(x * rx) for x in rule['xs']]
+                for row in rule['rows']:
+                    row_lo, row_hi = row['notes']
+                    y = int(row['y'] * ry)
+                    for note in range(max(lo, row_lo), min(hi, row_hi) + 1):
+                        positions[note] = (xs[note % 12], y)
+        return positions
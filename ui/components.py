@@ -1,8 +1,11 @@
-from PyQt6.QtCore import Qt
-from PyQt6.QtWidgets import QHBoxLayout, QFrame, QLabel
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize, QSortFilterProxyModel
+from PyQt6.QtGui import QColor, QFont, QFontMetrics
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout
 from qfluentwidgets import (
     SettingCard, ComboBox, SpinBox, DoubleSpinBox,
-    ColorPickerButton, FluentIcon, StrongBodyLabel, BodyLabel, isDarkTheme
+    ColorPickerButton, FluentIcon, BodyLabel, isDarkTheme,
+    MessageBoxBase, SubtitleLabel, CheckBox, PushButton, ListItemDelegate, getFont,
+    CardWidget, StrongBodyLabel, CaptionLabel, ProgressBar, TransparentToolButton, ToolTipFilter
 )
 
 
@@ -34,19 +37,352 @@ class ColorSettingCard(SettingCard):
         self.hBoxLayout.addSpacing(16)
 
 
-class SongCard(QFrame):
-    def __init__(self, title, artist, parent=None):
+# 歌曲列表的数据角色: UserRole 为整条记录
+SongRole = Qt.ItemDataRole.UserRole
+SubtitleRole = Qt.ItemDataRole.UserRole + 1
+MissingRole = Qt.ItemDataRole.UserRole + 2
+
+
+class SongListModel(QAbstractListModel):
+    """歌曲列表模型，每行一个 dict。key 区分同一首歌，sync 只增删改有变化的行"""
+
+    def __init__(self, key, subtitle, missing=None, parent=None):
         super().__init__(parent)
-        self.setFixedHeight(60)
-
-        layout = QHBoxLayout(self)
-        layout.setContentsMargins(13, 5, 10, 5)
-        layout.setSpacing(10)
-
-        # 内容区域
-        icon = StrongBodyLabel()
-        icon.setPixmap(FluentIcon.MUSIC.icon().pixmap(20, 20))
-        layout.addWidget(icon)
-        layout.addWidget(StrongBodyLabel(title, self))
-        layout.addStretch(1)
-        layout.addWidget(BodyLabel(artist, self))
\ No newline at end of file
+        self.rows = []
+        self.revision = 0  # 行结构每变一次加一
+        self.key = key
+        self.subtitle = subtitle
+        self.missing = missing
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        song = self.rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            title = song.get('title', '未知')
+            return f"{title} (文件丢失)" if self.is_missing(song) else title
+        if role == SongRole:
+            return song
+        if role == SubtitleRole:
+            return self.subtitle(song)
+        if role == MissingRole:
+            return self.is_missing(song)
+        return None
+
+    def is_missing(self, song):
+        return bool(self.missing and self.missing(song))
+
+    def set_songs(self, songs):
+        self.beginResetModel()
+        self.rows = list(songs)
+        self.revision += 1
+        self.endResetModel()
+
+    def row_of(self, key):
+        for row, song in enumerate(self.rows):
+            if self.key(song) == key:
+                return row
+        return -1
+
+    def refresh_rows(self, keys):
+        """行的内容没变、显示状态(如文件丢失)变了时只重绘这些行"""
+        for row, song in enumerate(self.rows):
+            if self.key(song) in keys:
+                index = self.index(row)
+                self.dataChanged.emit(index, index)
+
+    def sync(self, songs, changed=()):
+        """把列表改成 songs: 只删除、插入、更新有变化的行；剩余行的先后顺序变了才整体重置"""
+        key = self.key
+        target = [key(song) for song in songs]
+        position = {k: i for i, k in enumerate(target)}
+        if len(position) != len(target):
+            self.set_songs(songs)
+            return
+
+        row = len(self.rows) - 1
+        while row >= 0:
+            # 连续要删的行一次删掉
+            if key(self.rows[row]) in position:
+                row -= 1
+                continue
+            last = row
+            while row >= 0 and key(self.rows[row]) not in position:
+                row -= 1
+            self.beginRemoveRows(QModelIndex(), row + 1, last)
+            del self.rows[row + 1:last + 1]
+            self.revision += 1
+            self.endRemoveRows()
+
+        remaining = [position[key(song)] for song in self.rows]
+        if any(a >= b for a, b in zip(remaining, remaining[1:])):
+            self.set_songs(songs)
+            return
+
+        row = 0
+        for song, k in zip(songs, target):
+            if row < len(self.rows) and key(self.rows[row]) == k:
+                old = self.rows[row]
+                self.rows[row] = song
+                if k in changed or old != song:
+                    index = self.index(row)
+                    self.dataChanged.emit(index, index)
+            else:
+                self.beginInsertRows(QModelIndex(), row, row)
+                self.rows.insert(row, song)
+                self.revision += 1
+                self.endInsertRows()
+            row += 1
+
+
+class SongFilterProxy(QSortFilterProxyModel):
+    """按搜索结果过滤: accepted 为命中记录的 id() 集合，None 表示全部显示"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.accepted = None
+        # 按源模型行号预先算好，过滤回调里只做一次下标访问；源模型增删行后重算
+        self._mask = bytearray()
+        self._mask_revision = -1
+
+    def set_accepted(self, accepted):
+        self.accepted = accepted
+        self._mask_revision = -1
+        self.invalidateRowsFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        accepted = self.accepted
+        if accepted is None:
+            return True
+        model = self.sourceModel()
+        if self._mask_revision != model.revision:
+            self._mask = bytearray(id(song) in accepted for song in model.rows)
+            self._mask_revision = model.revision
+        return self._mask[source_row] == 1
+
+
+class SongItemDelegate(ListItemDelegate):
+    """只绘制可见行: 图标 + 标题，副标题靠右"""
+
+    def __init__(self, parent, row_height):
+        super().__init__(parent)
+        self.row_height = row_height
+        self.icon = FluentIcon.MUSIC.icon().pixmap(20, 20)
+        self.title_font = getFont(14, QFont.Weight.DemiBold)
+        self.subtitle_font = getFont(14)
+
+    def sizeHint(self, option, index):
+        return QSize(0, self.row_height)
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        # 文字在 paint 里自己画
+        option.text = ""
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+        rect = option.rect.adjusted(13, 0, -10, 0)
+        if index.data(MissingRole):
+            color = QColor(Qt.GlobalColor.red)
+        else:
+            color = QColor(Qt.GlobalColor.white if isDarkTheme() else Qt.GlobalColor.black)
+
+        painter.save()
+        painter.setPen(color)
+        painter.drawPixmap(rect.x(), rect.center().y() - 10, self.icon)
+        rect.setLeft(rect.left() + 30)
+
+        painter.setFont(self.subtitle_font)
+        subtitle = QFontMetrics(self.subtitle_font).elidedText(
+            index.data(SubtitleRole) or "", Qt.TextElideMode.ElideLeft, rect.width() // 2)
+        painter.drawText(rect, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, subtitle)
+        rect.setRight(rect.right() - QFontMetrics(self.subtitle_font).horizontalAdvance(subtitle) - 10)
+
+        painter.setFont(self.title_font)
+        title = QFontMetrics(self.title_font).elidedText(
+            index.data(Qt.ItemDataRole.DisplayRole) or "", Qt.TextElideMode.ElideRight, rect.width())
+        painter.drawText(rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, title)
+        painter.restore()
+
+
+class DownloadJobRow(QWidget):
+    """下载队列里的一行: 标题、状态、进度条，进行中可取消，失败或取消后可重试"""
+
+    def __init__(self, job, manager, parent=None):
+        super().__init__(parent)
+        self.job_id = job.id
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 2, 0, 2)
+        layout.setSpacing(2)
+
+        top = QHBoxLayout()
+        self.lbl_title = BodyLabel(job.title, self)
+        self.lbl_state = CaptionLabel(self)
+        self.btn_cancel = TransparentToolButton(FluentIcon.CLOSE, self)
+        self.btn_cancel.setToolTip("取消")
+        self.btn_cancel.installEventFilter(ToolTipFilter(self.btn_cancel))
+        self.btn_cancel.clicked.connect(lambda: manager.cancel(self.job_id))
+        self.btn_retry = TransparentToolButton(FluentIcon.SYNC, self)
+        self.btn_retry.setToolTip("重试")
+        self.btn_retry.installEventFilter(ToolTipFilter(self.btn_retry))
+        self.btn_retry.clicked.connect(lambda: manager.retry(self.job_id))
+        top.addWidget(self.lbl_title, 1)
+        top.addWidget(self.lbl_state)
+        top.addWidget(self.btn_cancel)
+        top.addWidget(self.btn_retry)
+        layout.addLayout(top)
+
+        self.progress = ProgressBar(self)
+        self.progress.setRange(0, 100)
+        layout.addWidget(self.progress)
+        self.update_job(job)
+
+    def update_job(self, job):
+        self.lbl_state.setText(job.state_text)
+        self.lbl_state.setToolTip(job.error)
+        self.progress.setValue(100 if job.state == "done" else job.percent)
+        self.progress.setError(job.state == "failed")
+        self.btn_cancel.setVisible(not job.finished)
+        self.btn_retry.setVisible(job.state in ("failed", "cancelled"))
+
+
+class DownloadQueueCard(CardWidget):
+    """下载队列面板，没有任务时隐藏。批量任务只在下载中或失败时占一行，其余计入标题"""
+
+    def __init__(self, manager, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+        self.rows = {}
+        layout = QVBoxLayout(self)
+        header = QHBoxLayout()
+        self.lbl_header = StrongBodyLabel("下载队列", self)
+        self.btn_cancel_all = TransparentToolButton(FluentIcon.CLOSE, self)
+        self.btn_cancel_all.setToolTip("全部取消")
+        self.btn_cancel_all.installEventFilter(ToolTipFilter(self.btn_cancel_all))
+        self.btn_cancel_all.clicked.connect(manager.cancel_all)
+        self.btn_clear = PushButton("清除已完成", self, FluentIcon.BROOM)
+        self.btn_clear.clicked.connect(manager.remove_finished)
+        header.addWidget(self.lbl_header, 1)
+        header.addWidget(self.btn_cancel_all)
+        header.addWidget(self.btn_clear)
+        layout.addLayout(header)
+        self.rows_layout = QVBoxLayout()
+        self.rows_layout.setSpacing(4)
+        layout.addLayout(self.rows_layout)
+
+        manager.job_added.connect(self.update_job)
+        manager.job_changed.connect(self.update_job)
+        manager.job_finished.connect(self.update_job)
+        manager.job_removed.connect(self.remove_job)
+        for job in manager.jobs():
+            self.update_job(job)
+        self._update_header()
+
+    @staticmethod
+    def _shows_row(job):
+        if job.batch is None:
+            return True
+        return job.state in ("running", "retrying", "failed")
+
+    def update_job(self, job):
+        row = self.rows.get(job.id)
+        if not self._shows_row(job):
+            if row is not None:
+                self.remove_job(job)
+            else:
+                self._update_header()
+            return
+        if row is None:
+            row = self.rows[job.id] = DownloadJobRow(job, self.manager, self)
+            self.rows_layout.addWidget(row)
+        else:
+            row.update_job(job)
+        self._update_header()
+
+    def remove_job(self, job):
+        row = self.rows.pop(job.id, None)
+        if row is not None:
+            self.rows_layout.removeWidget(row)
+            row.deleteLater()
+        self._update_header()
+
+    def _update_header(self):
+        jobs = self.manager.jobs()
+        active = sum(not job.finished for job in jobs)
+        text = "下载队列"
+        if active:
+            text += f" · 剩余 {active} 个"
+        batches = {id(job.batch): job.batch for job in jobs if job.batch is not None and not job.batch.reported}
+        for batch in batches.values():
+            text += f" · {batch.label} {batch.done_count}/{len(batch.jobs)}"
+        self.lbl_header.setText(text)
+        self.btn_cancel_all.setVisible(active > 0)
+        self.btn_clear.setEnabled(active < len(jobs))
+        self.setVisible(bool(jobs))
+
+
+class TrackSelectDialog(MessageBoxBase):
+    def __init__(self, tracks, selected, auto_keys, parent=None):
+        super().__init__(parent)
+        self.viewLayout.addWidget(SubtitleLabel("选择演奏音轨", self))
+
+        self.boxes = []
+        for track in tracks:
+            text = (f"{track['name']} · 通道{track['channel'] + 1} · {track['notes']}音 · "
+                    f"音域 {track['low']}-{track['high']} · 可弹 {track['playable_pct']}%")
+            if track['drums']:
+                text += " · 打击乐"
+            box = CheckBox(text, self)
+            box.setChecked(selected is None or track['key'] in selected)
+            self.boxes.append((track['key'], box))
+            self.viewLayout.addWidget(box)
+
+        btn_auto = PushButton("自动选择", self, FluentIcon.ROBOT)
+        btn_auto.clicked.connect(lambda: self.check_keys(auto_keys))
+        self.viewLayout.addWidget(btn_auto, 0, Qt.AlignmentFlag.AlignLeft)
+
+        self.yesButton.setText("确定")
+        self.cancelButton.setText("取消")
+        self.widget.setMinimumWidth(480)
+
+    def check_keys(self, keys):
+        for key, box in self.boxes:
+            box.setChecked(key in keys)
+
+    def selected_keys(self):
+        keys = [key for key, box in self.boxes if box.isChecked()]
+        # 全选等价于不过滤
+        return None if len(keys) == len(self.boxes) else keys
+
+
+class TransposeDialog(MessageBoxBase):
+    def __init__(self, result, current, parent=None):
+        super().__init__(parent)
+        self.viewLayout.addWidget(SubtitleLabel("移调建议", self))
+
+        by_offset = {o['offset']: o for o in result['options']}
+        best = by_offset[result['best']]
+        now = by_offset.get(current)
+        summary = f"推荐 {best['offset']:+d}，丢弃 {best['dropped_pct']}% 的音符"
+        if now:
+            summary += f"（当前 {current:+d} 丢弃 {now['dropped_pct']}%）"
+        self.viewLayout.addWidget(BodyLabel(summary, self))
+
+        # 按丢弃比例排序，同比例时偏移小的在前
+        self.offsets = [o['offset'] for o in sorted(result['options'],
+                                                    key=lambda o: (o['dropped'], abs(o['offset'])))]
+        self.comboBox = ComboBox(self)
+        self.comboBox.addItems([f"{by_offset[o]['offset']:+d} · 丢弃 {by_offset[o]['dropped_pct']}%"
+                                for o in self.offsets])
+        self.comboBox.setCurrentIndex(self.offsets.index(result['best']))
+        self.viewLayout.addWidget(self.comboBox)
+
+        self.yesButton.setText("应用")
+        self.cancelButton.setText("取消")
+        self.widget.setMinimumWidth(360)
+
+    def selected_offset(self):
+        return self.offsets[self.comboBox.currentIndex()]
@@ -1,17 +1,21 @@
 import keyboard
 from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import QSettings
+from PyQt6.QtCore import QSettings, pyqtSignal
 from qfluentwidgets import FluentWindow, FluentIcon, InfoBar, NavigationItemPosition
 
 from ui.pages import LibraryPage, CollectionPage, SettingsPage, AboutPage
 from core.player import MidiPlayer
+from core.analysis import TrackAnalysisWorker, TransposeWorker, auto_select
 from core.driver import WinInput
-from profiles.piano import PianoProfile
-from profiles.guitar import GuitarProfile
-from profiles.harp import HarpProfile
+from core.layout import LayoutError, create_profile
+from ui.components import TrackSelectDialog, TransposeDialog
 
 
 class MainWindow(FluentWindow):
+    # 热键回调在 keyboard 的钩子线程里执行，经信号转到界面线程处理
+    hotkey_play = pyqtSignal()
+    hotkey_pause = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("MidiDo-自动演奏]")
@@ -21,9 +25,14 @@ class MainWindow(FluentWindow):
         # 初始化配置与核心
         self.settings_conf = QSettings("AutoPiano", "UserConfig")
         self.player = MidiPlayer()
+        self.track_selection = {}  # path -> 选中的音轨，None 为全部
+        self.analysis_worker = None
+        self.transpose_worker = None
         self.player.on_progress.connect(self.on_progress)
         self.player.on_finished.connect(lambda: self.update_status(False, False, "完成"))
         self.player.on_error.connect(lambda e: self.update_status(False, False, f"错误: {e}"))
+        self.player.on_report.connect(self.on_report)
+        self.player.on_position.connect(lambda pos, total: self.collection_page.update_position(pos, total))
 
         # 初始化页面
         self.collection_page = CollectionPage(self)
@@ -48,9 +57,33 @@ class MainWindow(FluentWindow):
         # 信号
         self.collection_page.play_signal.connect(self.start_play)
         self.collection_page.stop_signal.connect(self.player.stop)
-        keyboard.add_hotkey('f1', self.toggle_play)
+        self.collection_page.pause_signal.connect(self.toggle_pause)
+        self.collection_page.seek_signal.connect(self.player.seek)
+        self.collection_page.seek_bar_signal.connect(self.player.seek_bar)
+        self.collection_page.tracks_signal.connect(self.open_track_dialog)
+        self.collection_page.transpose_signal.connect(self.open_transpose_dialog)
+        self.settings_page.card_speed.spinBox.valueChanged.connect(self.on_speed_changed)
+        self.hotkey_play.connect(self.toggle_play)
+        self.hotkey_pause.connect(self.toggle_pause)
+        keyboard.add_hotkey('f1', self.hotkey_play.emit)
+        keyboard.add_hotkey('f2', self.hotkey_pause.emit)
 
     def start_play(self, path):
+        if self.settings_page.transpose_mode() == "auto":
+            # 先在后台选出丢音最少的音调，结果按文件与乐器缓存
+            self.run_transpose(path, self.apply_transpose_and_play)
+            return
+        self._start_play(path)
+
+    def apply_transpose_and_play(self, path, result):
+        if result:
+            self.settings_page.card_pitch.spinBox.setValue(result['best'])
+        self._start_play(path)
+
+    def _start_play(self, path):
+        if self.player.isRunning():
+            # 演奏线程还在运行时重新 load 会丢掉正在使用的编译结果
+            return
         # 从设置页获取参数
         s_page = self.settings_page
         game = s_page.card_game.comboBox.currentText()
@@ -60,29 +93,124 @@ class MainWindow(FluentWindow):
             InfoBar.error(title="错误", content=f"未找到游戏窗口: {game}", parent=self)
             return
 
-        p_idx = s_page.card_profile.comboBox.currentIndex()
-        profiles = {0: PianoProfile(), 1: GuitarProfile(), 2: HarpProfile()}
-        profile = profiles.get(p_idx, PianoProfile())
+        profile = self.current_profile()
+        if not profile:
+            return
 
         self.player.load(
             hwnd, path, profile,
             s_page.card_speed.spinBox.value(),
             s_page.card_pitch.spinBox.value(),
-            s_page.card_delay.spinBox.value()
+            s_page.card_delay.spinBox.value(),
+            s_page.scheduler_mode(),
+            s_page.card_polyphony.spinBox.value(),
+            s_page.chord_policy(),
+            s_page.load_mode(),
+            self.track_selection.get(path),
+            s_page.range_mode()
         )
         self.update_status(False, True, "准备中...")
         self.player.start()
 
+    def current_profile(self):
+        layout_id = self.settings_page.layout_id()
+        if not layout_id:
+            InfoBar.error(title="错误", content="没有可用的乐器布局", parent=self)
+            return None
+        try:
+            return create_profile(layout_id)
+        except (LayoutError, OSError) as e:
+            InfoBar.error(title="错误", content=str(e), parent=self)
+            return None
+
+    def open_track_dialog(self, path):
+        if self.analysis_worker is not None and self.analysis_worker.isRunning():
+            # 上一次分析还没结束，忽略重复点击，避免替换掉仍在运行的线程
+            print("[DEBUG] 音轨分析进行中，忽略本次请求")
+            return
+        profile = self.current_profile()
+        if not profile:
+            return
+        self.analysis_worker = TrackAnalysisWorker(path, profile,
+                                                   self.settings_page.card_pitch.spinBox.value())
+        self.analysis_worker.success.connect(lambda tracks: self.show_track_dialog(path, tracks))
+        self.analysis_worker.failed.connect(lambda msg: InfoBar.error(title="错误", content=msg, parent=self))
+        self.analysis_worker.start()
+
+    def run_transpose(self, path, callback):
+        if self.transpose_worker is not None and self.transpose_worker.isRunning():
+            # 上一次计算还没结束，忽略重复请求(连按 F1 等)，避免替换掉仍在运行的线程
+            print("[DEBUG] 音调计算进行中，忽略本次请求")
+            return
+        profile = self.current_profile()
+        if not profile:
+            return
+        self.transpose_worker = TransposeWorker(path, profile, self.track_selection.get(path))
+        self.transpose_worker.success.connect(lambda result: callback(path, result))
+        self.transpose_worker.failed.connect(lambda msg: self.on_transpose_failed(path, msg, callback))
+        self.transpose_worker.start()
+
+    def on_transpose_failed(self, path, msg, callback):
+        InfoBar.error(title="错误", content=msg, parent=self)
+        callback(path, None)
+
+    def open_transpose_dialog(self, path):
+        self.run_transpose(path, self.show_transpose_dialog)
+
+    def show_transpose_dialog(self, path, result):
+        if not result:
+            return
+        if not any(o['kept'] or o['dropped'] for o in result['options']):
+            InfoBar.warning(title="提示", content="该文件没有音符", parent=self)
+            return
+        pitch_box = self.settings_page.card_pitch.spinBox
+        dialog = TransposeDialog(result, pitch_box.value(), self)
+        if dialog.exec():
+            pitch_box.setValue(dialog.selected_offset())
+
+    def show_track_dialog(self, path, tracks):
+        if not tracks:
+            InfoBar.warning(title="提示", content="该文件没有音符", parent=self)
+            return
+        auto_keys = auto_select(tracks, self.settings_page.card_polyphony.spinBox.value())
+        dialog = TrackSelectDialog(tracks, self.track_selection.get(path), auto_keys, self)
+        if dialog.exec():
+            self.track_selection[path] = dialog.selected_keys()
+
     def toggle_play(self):
         if self.player.isRunning():
             self.player.stop()
         elif self.collection_page.curr_path:
             self.start_play(self.collection_page.curr_path)
 
-    def on_progress(self, msg):
-        is_countdown = "倒计时" in msg
-        is_playing = "开始" in msg or "演奏" in msg
-        self.update_status(is_playing, is_countdown, msg)
+    def toggle_pause(self):
+        if self.player.isRunning():
+            self.player.toggle_pause()
+
+    def on_speed_changed(self, speed):
+        # 演奏中变速无需重新加载
+        if self.player.isRunning():
+            self.player.set_speed(speed)
 
-    def update_status(self, playing, countdown, msg):
-        self.collection_page.update_state(playing, countdown, msg)
\ No newline at end of file
+    def on_progress(self, state, msg):
+        # 准备音符时还没开始发送，和倒计时一样可以停止，暂停/跳转不可用
+        is_countdown = state in (MidiPlayer.COUNTDOWN, MidiPlayer.PREPARING)
+        is_playing = state in (MidiPlayer.PLAYING, MidiPlayer.PAUSED)
+        self.update_status(is_playing, is_countdown, msg, state == MidiPlayer.PAUSED)
+
+    def on_report(self, report):
+        timing = report.get('timing', {})
+        if not timing.get('batches'):
+            return
+        content = (f"延迟 p50 {timing['late_p50_ms']}ms / p95 {timing['late_p95_ms']}ms / "
+                   f"最大 {timing['late_max_ms']}ms，复音截断 {timing['dropped_batches']} 处")
+        saved = report.get('plan', {}).get('clicks_saved')
+        if saved:
+            content += f"，踏板编排省去 {saved} 次点击"
+        folded = report.get('plan', {}).get('folded_notes')
+        if folded:
+            content += f"，{folded} 个音折叠到可弹八度"
+        InfoBar.info(title="演奏统计", content=content, parent=self)
+
+    def update_status(self, playing, countdown, msg, paused=False):
+        self.collection_page.update_state(playing, countdown, msg, paused)
\ No newline at end of file
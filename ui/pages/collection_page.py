@@ -1,18 +1,28 @@
 import os
-from PyQt6.QtCore import Qt, pyqtSignal, QSize
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QListWidgetItem, QFileDialog
+
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QFileDialog, QAbstractItemView
 from qfluentwidgets import (
     ScrollArea, BodyLabel, SubtitleLabel, StrongBodyLabel,
     PrimaryPushButton, PushButton, FluentIcon, CardWidget,
-    IndeterminateProgressRing, ListWidget
+    IndeterminateProgressRing, ListView, Slider, SpinBox, SearchLineEdit, ComboBox, InfoBar
 )
 
-from ui.components import SongCard
+from ui.components import SongListModel, SongItemDelegate, SongRole
 from core.data import get_data_manager
+from core.favorites import ORDERS
+from core.filestatus import FileStatusScanner
+
+SEEK_DELAY_MS = 150  # 点击、拖动轨道或按键调整进度后停这么久才跳转
 
 class CollectionPage(ScrollArea):
     play_signal = pyqtSignal(str)
     stop_signal = pyqtSignal()
+    pause_signal = pyqtSignal()
+    seek_signal = pyqtSignal(float)  # 秒
+    seek_bar_signal = pyqtSignal(int)
+    tracks_signal = pyqtSignal(str)
+    transpose_signal = pyqtSignal(str)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -20,6 +30,12 @@ class CollectionPage(ScrollArea):
         self.data_mgr = get_data_manager()
         self.data_mgr.favorites_changed.connect(self.refresh)
         self.curr_path = None
+        self.curr_title = None
+        self.missing = set()  # 文件不存在的收藏路径
+        self._titles_by_path = {}
+        # 文件是否存在由后台检查，状态变化时只重绘对应的行
+        self.scanner = FileStatusScanner(self)
+        self.scanner.status_changed.connect(self.on_status_changed)
 
         self.view = QWidget(self)
         self.view.setObjectName("CollectionView")
@@ -33,7 +49,9 @@ class CollectionPage(ScrollArea):
 
         # 播放控制
         self.control_panel = CardWidget()
-        cp_layout = QHBoxLayout(self.control_panel)
+        panel_layout = QVBoxLayout(self.control_panel)
+        cp_layout = QHBoxLayout()
+        panel_layout.addLayout(cp_layout)
 
         info_layout = QVBoxLayout()
         self.lbl_status = SubtitleLabel("就绪")
@@ -51,68 +69,161 @@ class CollectionPage(ScrollArea):
         self.btn_stop = PushButton("停止 (F1)", self, FluentIcon.PAUSE)
         self.btn_stop.clicked.connect(self.req_stop)
         self.btn_stop.setEnabled(False)
+        self.btn_pause = PushButton("暂停 (F2)", self, FluentIcon.PAUSE_BOLD)
+        self.btn_pause.clicked.connect(self.pause_signal.emit)
+        self.btn_pause.setEnabled(False)
 
         cp_layout.addLayout(info_layout)
         cp_layout.addStretch(1)
         cp_layout.addWidget(self.loading)
         cp_layout.addSpacing(16)
         cp_layout.addWidget(self.btn_play)
+        cp_layout.addWidget(self.btn_pause)
         cp_layout.addWidget(self.btn_stop)
+
+        # 进度与跳转
+        seek_layout = QHBoxLayout()
+        self.slider = Slider(Qt.Orientation.Horizontal)
+        self.slider.setRange(0, 0)
+        # qfluentwidgets 的 Slider 拖动手柄时 isSliderDown() 始终为 False，按下状态自己记录；
+        # 点击/拖动轨道、方向键和滚轮没有松开信号，停一会儿后再跳转
+        self._slider_held = False
+        self.seek_timer = QTimer(self)
+        self.seek_timer.setSingleShot(True)
+        self.seek_timer.setInterval(SEEK_DELAY_MS)
+        self.seek_timer.timeout.connect(self._emit_seek)
+        self.slider.sliderPressed.connect(self._on_slider_pressed)
+        self.slider.sliderReleased.connect(self._on_slider_released)
+        self.slider.clicked.connect(self._on_slider_changed)
+        self.slider.sliderMoved.connect(self._on_slider_changed)
+        self.slider.actionTriggered.connect(self._on_slider_changed)
+        self.lbl_time = BodyLabel("0:00 / 0:00")
+        self.spin_bar = SpinBox()
+        self.spin_bar.setRange(1, 9999)
+        self.btn_bar = PushButton("跳到小节", self, FluentIcon.RIGHT_ARROW)
+        self.btn_bar.clicked.connect(lambda: self.seek_bar_signal.emit(self.spin_bar.value()))
+        seek_layout.addWidget(self.slider, 1)
+        seek_layout.addWidget(self.lbl_time)
+        seek_layout.addSpacing(16)
+        seek_layout.addWidget(self.spin_bar)
+        seek_layout.addWidget(self.btn_bar)
+        panel_layout.addLayout(seek_layout)
+        self.set_seek_enabled(False)
         layout.addWidget(self.control_panel)
 
         # 列表区
         tool_layout = QHBoxLayout()
         tool_layout.addWidget(StrongBodyLabel("收藏列表"))
+        # 筛选与排序在数据库里完成
+        self.search_box = SearchLineEdit(self.view)
+        self.search_box.setPlaceholderText("搜索收藏...")
+        self.search_box.setFixedWidth(200)
+        self.search_box.textChanged.connect(self.refresh)
+        self.combo_order = ComboBox()
+        self.combo_order.addItems(list(ORDERS.values()))
+        self.combo_order.setFixedWidth(120)
+        self.combo_order.currentIndexChanged.connect(self.refresh)
+        tool_layout.addWidget(self.search_box)
+        tool_layout.addWidget(self.combo_order)
         tool_layout.addStretch(1)
         self.btn_del = PushButton("删除选中", self, FluentIcon.DELETE)
         self.btn_del.clicked.connect(self.delete_selected)
         self.btn_del.setEnabled(False)
+        self.btn_tracks = PushButton("音轨", self, FluentIcon.MENU)
+        self.btn_tracks.clicked.connect(lambda: self.curr_path and self.tracks_signal.emit(self.curr_path))
+        self.btn_tracks.setEnabled(False)
+        self.btn_transpose = PushButton("移调", self, FluentIcon.SYNC)
+        self.btn_transpose.clicked.connect(lambda: self.curr_path and self.transpose_signal.emit(self.curr_path))
+        self.btn_transpose.setEnabled(False)
         self.btn_import = PushButton("导入本地", self, FluentIcon.FOLDER)
         self.btn_import.clicked.connect(self.import_midi)
 
+        tool_layout.addWidget(self.btn_tracks)
+        tool_layout.addWidget(self.btn_transpose)
         tool_layout.addWidget(self.btn_del)
         tool_layout.addWidget(self.btn_import)
         layout.addLayout(tool_layout)
 
-        self.list_widget = ListWidget()
-        self.list_widget.setStyleSheet("ListWidget{background:transparent; border:none}")
-        self.list_widget.itemClicked.connect(self.select_song)
-        layout.addWidget(self.list_widget)
+        # 收藏按标题区分；内容相同的多首曲子共用一个库内文件，副标题显示来源
+        self.model = SongListModel(lambda f: f['title'], lambda f: f.get('source') or f['path'],
+                                   lambda f: f['path'] in self.missing, self)
+        self.list_view = ListView()
+        self.list_view.setItemDelegate(SongItemDelegate(self.list_view, 60))
+        self.list_view.setModel(self.model)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setStyleSheet("ListView{background:transparent; border:none}")
+        self.list_view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.list_view.clicked.connect(self.select_song)
+        self.list_view.selectionModel().selectionChanged.connect(
+            lambda: self.btn_del.setEnabled(self.list_view.selectionModel().hasSelection()))
+        layout.addWidget(self.list_view)
 
         self.refresh()
 
     def refresh(self):
-        self.list_widget.clear()
-        for favorite in self.data_mgr.get_favorites():
-            list_item = QListWidgetItem(self.list_widget)
-            list_item.setSizeHint(QSize(0, 60))
-            list_item.setData(Qt.ItemDataRole.UserRole, favorite)
-            path = favorite['path']
-            exists = os.path.exists(path)
-            title = favorite['title'] if exists else f"{favorite['title']} (文件丢失)"
-            widget = SongCard(title, path)
-            if not exists: widget.setStyleSheet("opacity: 0.5; color: red;")
-            self.list_widget.setItemWidget(list_item, widget)
-
-    def select_song(self, list_item):
-        favorite_data = list_item.data(Qt.ItemDataRole.UserRole)
+        order = list(ORDERS)[self.combo_order.currentIndex()]
+        favorites = self.data_mgr.get_favorites(self.search_box.text(), order)
+        titles_by_path = {}
+        for f in favorites:
+            titles_by_path.setdefault(f['path'], []).append(f['title'])
+        self._titles_by_path = titles_by_path
+        self.missing = {path for path in titles_by_path if self.scanner.is_missing(path)}
+        self.model.sync(favorites)
+        self.scanner.watch(titles_by_path)
+
+    def on_status_changed(self, changes):
+        keys = set()
+        for path, exists in changes.items():
+            if exists:
+                self.missing.discard(path)
+            else:
+                self.missing.add(path)
+            keys.update(self._titles_by_path.get(path, ()))
+        self.model.refresh_rows(keys)
+        if self.curr_path in changes:
+            self._update_song_buttons()
+
+    def _update_song_buttons(self):
+        available = bool(self.curr_path) and self.curr_path not in self.missing
+        self.btn_play.setEnabled(available)
+        self.btn_tracks.setEnabled(available)
+        self.btn_transpose.setEnabled(available)
+
+    def select_song(self, index):
+        favorite_data = index.data(SongRole)
         self.curr_path = favorite_data['path']
+        self.curr_title = favorite_data['title']
         self.lbl_song.setText(favorite_data['title'])
-        self.btn_play.setEnabled(os.path.exists(self.curr_path))
-        self.btn_del.setEnabled(True)
+        self._update_song_buttons()
 
     def import_midi(self):
         path, _ = QFileDialog.getOpenFileName(self, "选择MIDI", "", "MIDI (*.mid)")
-        if path:
-            self.data_mgr.add_favorite(os.path.basename(path), path)
+        if not path:
+            return
+        try:
+            title = self.data_mgr.import_midi(path)
+        except OSError as e:
+            InfoBar.error(title="导入失败", content=str(e), parent=self)
+            return
+        if title:
+            InfoBar.success(title="已导入", content=title, parent=self)
+        else:
+            InfoBar.info(title="已收藏", content=f"{os.path.basename(path)} 已在收藏中", parent=self)
 
     def delete_selected(self):
-        if self.curr_path:
-            self.data_mgr.remove_favorite(self.curr_path)
+        # 支持 Ctrl/Shift 多选，一次事务删除
+        titles = [index.data(SongRole)['title'] for index in self.list_view.selectionModel().selectedRows()]
+        if not titles:
+            return
+        self.data_mgr.remove_favorites(titles)
+        self.btn_del.setEnabled(False)
+        if self.curr_title in titles:
             self.lbl_song.setText("未选择曲目")
             self.curr_path = None
+            self.curr_title = None
             self.btn_play.setEnabled(False)
-            self.btn_del.setEnabled(False)
+            self.btn_tracks.setEnabled(False)
+            self.btn_transpose.setEnabled(False)
 
     def req_play(self):
         if self.curr_path: self.play_signal.emit(self.curr_path)
@@ -120,9 +231,41 @@ class CollectionPage(ScrollArea):
     def req_stop(self):
         self.stop_signal.emit()
 
-    def update_state(self, is_playing, is_countdown, msg):
+    def update_state(self, is_playing, is_countdown, msg, is_paused=False):
         self.lbl_status.setText(msg)
         self.loading.setVisible(is_playing or is_countdown)
         if is_countdown: self.loading.start()
         self.btn_play.setEnabled(not is_playing and not is_countdown)
-        self.btn_stop.setEnabled(is_playing or is_countdown)
\ No newline at end of file
+        self.btn_stop.setEnabled(is_playing or is_countdown)
+        self.btn_pause.setEnabled(is_playing)
+        self.btn_pause.setText("继续 (F2)" if is_paused else "暂停 (F2)")
+        self.set_seek_enabled(is_playing)
+
+    def set_seek_enabled(self, enabled):
+        self.slider.setEnabled(enabled)
+        self.spin_bar.setEnabled(enabled)
+        self.btn_bar.setEnabled(enabled)
+
+    def _on_slider_pressed(self):
+        self._slider_held = True
+        self.seek_timer.stop()
+
+    def _on_slider_changed(self, _):
+        # 拖动手柄时等松开再跳转
+        if not self._slider_held:
+            self.seek_timer.start()
+
+    def _on_slider_released(self):
+        self._slider_held = False
+        self._emit_seek()
+
+    def _emit_seek(self):
+        self.seek_timer.stop()
+        self.seek_signal.emit(self.slider.value() / 10)
+
+    def update_position(self, pos, total):
+        # 用户正在调整进度时不回写，避免滑块跳回去
+        if self._slider_held or self.seek_timer.isActive(): return
+        self.slider.setMaximum(int(total * 10))
+        self.slider.setValue(int(pos * 10))
+        self.lbl_time.setText(f"{int(pos) // 60}:{int(pos) % 60:02d} / {int(total) // 60}:{int(total) % 60:02d}")
\ No newline at end of file
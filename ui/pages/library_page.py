@@ -1,19 +1,23 @@
 import os
-from datetime import datetime
-from PyQt6.QtCore import Qt, QSize, QUrl
+from PyQt6.QtCore import Qt, QUrl, QTimer
 from PyQt6.QtGui import QDesktopServices
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QListWidgetItem, QInputDialog
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QInputDialog
 from qfluentwidgets import (
     ScrollArea, TitleLabel, BodyLabel, SubtitleLabel,
     PrimaryPushButton, PushButton, FluentIcon, InfoBar, CardWidget,
-    IndeterminateProgressRing, ListWidget, SearchLineEdit, ComboBox
+    IndeterminateProgressRing, ListView, SearchLineEdit, ComboBox,
+    DropDownPushButton, RoundMenu, Action, MessageBox
 )
 
-from ui.components import SongCard
+from ui.components import SongListModel, SongFilterProxy, SongItemDelegate, SongRole, DownloadQueueCard
 from core.data import get_data_manager
+from core.library import song_key
+from core.search import SearchIndex
 
 QQ_GROUP_URL = "https://qm.qq.com/cgi-bin/qm/qr?k=LcBVvZdH05AILOPso4QSAEM6bbtj3qsI&jump_from=webapi&authKey=Nyna4+DSJGk/+Am6cLzQKsedbyeHUf3MU68Ik+C6nIgz50NEya5lAu+aZi3cM8XT"
 
+SEARCH_DELAY_MS = 150  # 停止输入这么久后才搜索
+
 TYPE_MAP = {
     "1": "游戏音乐",
     "2": "古典音乐",
@@ -30,12 +34,20 @@ class LibraryPage(ScrollArea):
         self.setObjectName("LibraryPage")
         self.data_mgr = get_data_manager()
         self.all_songs = []
+        self.search_index = SearchIndex([])
+        self._last_query = None  # (搜索词, 类型, 结果下标)，用于在上次结果里继续收窄
         self.current_song = None
 
         # 信号
         self.data_mgr.library_loaded.connect(self.on_library_loaded)
+        self.data_mgr.library_updated.connect(self.on_library_updated)
+        self.data_mgr.library_unchanged.connect(self.on_library_unchanged)
         self.data_mgr.load_failed.connect(self.on_load_failed)
         self.data_mgr.download_finished.connect(self.on_download_finished)
+        self.data_mgr.bulk_finished.connect(self.on_bulk_finished)
+        self.data_mgr.downloads.job_added.connect(self.update_add_button)
+        self.data_mgr.downloads.job_changed.connect(self.update_add_button)
+        self.data_mgr.downloads.job_finished.connect(self.update_add_button)
 
         self.view = QWidget(self)
         self.setWidget(self.view)
@@ -55,7 +67,11 @@ class LibraryPage(ScrollArea):
         self.search_box = SearchLineEdit(self.view)
         self.search_box.setPlaceholderText("搜索歌曲、歌手...")
         self.search_box.setFixedWidth(200)
-        self.search_box.textChanged.connect(lambda: self.filter_library())
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.filter_library)
+        self.search_box.textChanged.connect(self.search_timer.start)
 
         self.combo_type = ComboBox()
         self.combo_type.addItems(["全部类型", "游戏音乐", "古典音乐", "流行歌曲", "影视配乐", "其他"])
@@ -65,7 +81,7 @@ class LibraryPage(ScrollArea):
         self.combo_sort = ComboBox()
         self.combo_sort.addItems(["默认排序", "最新上传"])
         self.combo_sort.setFixedWidth(120)
-        self.combo_sort.currentIndexChanged.connect(lambda: self.filter_library())
+        self.combo_sort.currentIndexChanged.connect(self.sort_library)
 
         search_layout.addWidget(self.search_box)
         search_layout.addWidget(self.combo_type)
@@ -82,7 +98,18 @@ class LibraryPage(ScrollArea):
         self.btn_group = PushButton("进群求音乐", self, FluentIcon.CHAT)
         self.btn_group.clicked.connect(lambda: QDesktopServices.openUrl(QUrl(QQ_GROUP_URL)))
 
+        # 批量下载: 当前筛选结果或整个分类
+        self.btn_bulk = DropDownPushButton("批量下载", self, FluentIcon.DOWNLOAD)
+        self.bulk_menu = RoundMenu(parent=self)
+        self.bulk_menu.addAction(Action(FluentIcon.FILTER, "下载当前列表", triggered=self.download_filtered))
+        self.bulk_menu.addSeparator()
+        for type_id, type_name in TYPE_MAP.items():
+            self.bulk_menu.addAction(Action(FluentIcon.FOLDER, f"下载分类: {type_name}",
+                                            triggered=lambda _, t=type_id: self.download_category(t)))
+        self.btn_bulk.setMenu(self.bulk_menu)
+
         header_layout.addWidget(self.btn_group)
+        header_layout.addWidget(self.btn_bulk)
         header_layout.addWidget(self.btn_refresh)
         layout.addLayout(header_layout)
 
@@ -93,11 +120,17 @@ class LibraryPage(ScrollArea):
 
         # 内容
         content = QHBoxLayout()
-        self.list_widget = ListWidget()
-        self.list_widget.setStyleSheet(
-            "ListWidget{background:transparent; border:none} ListWidget::item{padding:4px}")
-        self.list_widget.itemClicked.connect(self.on_item_click)
-        content.addWidget(self.list_widget, 4)
+        # 模型只存数据，委托只画可见的行；搜索、类型筛选由代理模型完成
+        self.model = SongListModel(song_key, lambda song: song.get('artist', '未知'), parent=self)
+        self.proxy = SongFilterProxy(self)
+        self.proxy.setSourceModel(self.model)
+        self.list_view = ListView()
+        self.list_view.setItemDelegate(SongItemDelegate(self.list_view, 70))
+        self.list_view.setModel(self.proxy)
+        self.list_view.setUniformItemSizes(True)
+        self.list_view.setStyleSheet("ListView{background:transparent; border:none}")
+        self.list_view.clicked.connect(self.on_item_click)
+        content.addWidget(self.list_view, 4)
 
         # 详情卡片
         self.info_card = CardWidget()
@@ -115,81 +148,108 @@ class LibraryPage(ScrollArea):
         info_layout.addStretch(1)
         info_layout.addWidget(self.btn_add)
 
-        content.addWidget(self.info_card, 3)
+        side = QVBoxLayout()
+        side.addWidget(self.info_card, 1)
+        self.queue_card = DownloadQueueCard(self.data_mgr.downloads)
+        side.addWidget(self.queue_card)
+        content.addLayout(side, 3)
         layout.addLayout(content)
 
         self.refresh_library()
 
     def refresh_library(self):
-        self.list_widget.clear()
-        self.all_songs = []
+        # 列表保留到后台校验结束，有变化时只更新变化的行
         self.loading.show()
         self.loading.start()
         self.btn_refresh.setEnabled(False)
-        self.lbl_desc.setText("正在加载...")
+        if not self.all_songs:
+            self.lbl_desc.setText("正在加载...")
         self.data_mgr.fetch_library()
 
-    def on_library_loaded(self, library_data):
+    def _finish_loading(self, msg=None):
         self.loading.stop()
         self.loading.hide()
         self.btn_refresh.setEnabled(True)
-        self.lbl_desc.setText("加载完成，请选择曲目")
-        self.all_songs = library_data
-        self.filter_library()
+        if msg and not self.current_song:
+            self.lbl_desc.setText(msg)
 
-    def filter_library(self):
+    def _set_songs(self, songs):
+        self.all_songs = songs
+        self.search_index = SearchIndex(songs).build_async()
+        self._last_query = None
 
-        self.list_widget.clear()
+    def _ordered_songs(self):
+        # 排序只改变源模型的行顺序，日期顺序由搜索索引预先算好
+        if self.combo_sort.currentIndex() == 1:
+            return [self.all_songs[doc] for doc in self.search_index.date_order]
+        return self.all_songs
 
-        search_text = self.search_box.text().lower().strip()
+    def on_library_loaded(self, library_data):
+        self._set_songs(library_data)
+        self.model.set_songs(self._ordered_songs())
+        self.filter_library()
+        if not self.data_mgr.fetching:
+            self._finish_loading("加载完成，请选择曲目")
+        elif library_data and not self.current_song:
+            self.lbl_desc.setText("已显示本地曲库，正在检查更新...")
+
+    def on_library_updated(self, delta):
+        self._set_songs(delta['songs'])
+        changed = {song_key(song) for song in delta['changed']}
+        if self.current_song:
+            key = song_key(self.current_song)
+            self.current_song = next((song for song in delta['changed'] if song_key(song) == key),
+                                     None if key in delta['removed'] else self.current_song)
+        self.model.sync(self._ordered_songs(), changed)
+        self.filter_library()
+        self._finish_loading("加载完成，请选择曲目")
+        InfoBar.info(title="曲库已更新",
+                     content=f"新增 {len(delta['added'])} 首，更新 {len(delta['changed'])} 首，"
+                             f"移除 {len(delta['removed'])} 首",
+                     parent=self)
+
+    def on_library_unchanged(self):
+        self._finish_loading("曲库已是最新，请选择曲目")
+
+    def _search(self):
+        """当前搜索词与类型命中的记录 id() 集合，没有条件时为 None"""
+        query = self.search_box.text()
         type_idx = self.combo_type.currentIndex()
-        sort_idx = self.combo_sort.currentIndex()
-
-        filtered = []
-        for song in self.all_songs:
-            title = song.get('title', '未知')
-            artist = song.get('artist', '未知')
-            desc = song.get('desc', '')
-            if search_text and (search_text not in title.lower()) and (search_text not in artist.lower()) and (search_text not in desc.lower()):
-                continue
-
-            if type_idx > 0:
-                type_ids = ["1", "2", "3", "4", "0"]
-                target_id = type_ids[type_idx - 1]
-                if song.get('type', '0') != target_id:
-                    continue
-
-            filtered.append(song)
-
-        # 排序
-        if sort_idx == 1:
-            def parse_date(date_str):
-                try:
-                    parts = date_str.split('-')
-                    if len(parts) == 3:
-                        return datetime(int(parts[0]), int(parts[1]), int(parts[2]))
-                except (ValueError, IndexError):
-                    pass
-                return datetime.min
-
-            filtered.sort(key=lambda x: parse_date(x.get('upload_time', '')), reverse=True)
-
-        # 显示
-        for song in filtered:
-            list_item = QListWidgetItem(self.list_widget)
-            list_item.setSizeHint(QSize(0, 70))
-            list_item.setData(Qt.ItemDataRole.UserRole, song)
-            self.list_widget.setItemWidget(list_item, SongCard(song.get('title', '未知'), song.get('artist', '未知')))
+        type_id = ["1", "2", "3", "4", "0"][type_idx - 1] if type_idx > 0 else None
+        if not SearchIndex.terms(query) and type_id is None:
+            self._last_query = None
+            return None
+
+        # 只是在上次的搜索词后继续输入时，在上次结果里查找
+        within = None
+        last = self._last_query
+        if last and last[1] == type_id:
+            old_terms, new_terms = SearchIndex.terms(last[0]), SearchIndex.terms(query)
+            if old_terms and len(new_terms) >= len(old_terms) and \
+                    all(new.find(old) >= 0 for old, new in zip(old_terms, new_terms)):
+                within = last[2]
+        docs = self.search_index.search(query, type_id, within=within)
+        self._last_query = (query, type_id, docs)
+        songs = self.all_songs
+        return {id(songs[doc]) for doc in docs}
+
+    def filter_library(self):
+        self.search_timer.stop()
+        self.proxy.set_accepted(self._search())
+
+    def sort_library(self):
+        self.model.set_songs(self._ordered_songs())
 
     def on_load_failed(self, msg):
-        self.loading.stop()
-        self.loading.hide()
-        self.btn_refresh.setEnabled(True)
+        self._finish_loading()
+        if self.all_songs:
+            InfoBar.warning(title="网络错误", content=f"{msg}\n当前显示的是本地缓存的曲库", parent=self)
+            return
         self.lbl_desc.setText(f"加载失败: {msg}")
         InfoBar.error(title="网络错误", content=msg, parent=self)
 
-    def on_item_click(self, list_item):
-        song_data = list_item.data(Qt.ItemDataRole.UserRole)
+    def on_item_click(self, index):
+        song_data = index.data(SongRole)
         self.current_song = song_data
 
         title = song_data.get('title', '无标题')
@@ -209,24 +269,67 @@ class LibraryPage(ScrollArea):
             f"{desc}"
         )
         self.lbl_desc.setText(info_text)
-        if self.data_mgr.is_collected(title):
+        self.update_add_button()
+
+    def update_add_button(self, *_):
+        song = self.current_song
+        if not song:
+            return
+        if self.data_mgr.is_collected(song.get('title', '无标题')):
             self.btn_add.setText("已收藏")
             self.btn_add.setEnabled(False)
+            return
+        job = self.data_mgr.downloads.latest_for(song['file_url'])
+        if job is not None and not job.finished:
+            self.btn_add.setText("下载中...")
+            self.btn_add.setEnabled(False)
         else:
-            self.btn_add.setText("下载并收藏")
+            self.btn_add.setText("重试" if job is not None and job.state == "failed" else "下载并收藏")
             self.btn_add.setEnabled(True)
 
     def download_song(self):
         if not self.current_song: return
-        self.btn_add.setEnabled(False)
-        self.btn_add.setText("下载中...")
+        # 可以连续加入多首，按钮状态随队列变化
         self.data_mgr.download_midi(self.current_song)
+        self.update_add_button()
+
+    def download_filtered(self):
+        songs = [self.proxy.index(row, 0).data(SongRole) for row in range(self.proxy.rowCount())]
+        self._confirm_bulk(songs, "当前列表")
+
+    def download_category(self, type_id):
+        songs = [song for song in self.all_songs if song.get('type', '0') == type_id]
+        self._confirm_bulk(songs, TYPE_MAP.get(type_id, "其他"))
+
+    def _confirm_bulk(self, songs, label):
+        if not songs:
+            InfoBar.warning(title="批量下载", content=f"{label}没有曲目", parent=self)
+            return
+        collected = sum(self.data_mgr.is_collected(song.get('title', '')) for song in songs)
+        box = MessageBox("批量下载", f"{label}共 {len(songs)} 首，其中 {collected} 首已收藏将跳过。\n"
+                                    f"下载完成的曲目会自动收藏，确定开始吗？", self.window())
+        if box.exec():
+            self.data_mgr.download_many(songs, label)
+            self.update_add_button()
+
+    def on_bulk_finished(self, summary):
+        text = (f"下载 {summary['downloaded']} 首，失败 {len(summary['failed'])} 首，"
+                f"跳过 {len(summary['skipped'])} 首")
+        if summary['cancelled']:
+            text += f"，取消 {summary['cancelled']} 首"
+        text += f"，用时 {summary['elapsed_s']:.0f} 秒"
+        if summary['failed']:
+            text += "\n失败: " + "、".join(item['title'] for item in summary['failed'][:5])
+            if len(summary['failed']) > 5:
+                text += " 等"
+            InfoBar.warning(title=f"批量下载完成: {summary['label']}", content=text, duration=8000, parent=self)
+        else:
+            InfoBar.success(title=f"批量下载完成: {summary['label']}", content=text, duration=5000, parent=self)
 
-    def on_download_finished(self, success, msg):
-        if success:
-            self.btn_add.setText("已收藏")
+    def on_download_finished(self, success, msg, song_data):
+        if success and msg.startswith("已在收藏中"):
+            InfoBar.info(title="已收藏", content=msg, parent=self)
+        elif success:
             InfoBar.success(title="完成", content=msg, parent=self)
         else:
-            self.btn_add.setText("重试")
-            self.btn_add.setEnabled(True)
-            InfoBar.error(title="下载失败", content=msg, parent=self)
\ No newline at end of file
+            InfoBar.error(title="下载失败", content=f"{song_data.get('title', '未知')}: {msg}", parent=self)
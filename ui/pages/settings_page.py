@@ -5,9 +5,11 @@ from qfluentwidgets import (
 )
 
 from ui.components import DropdownSettingCard, NumberSettingCard, ColorSettingCard
-from profiles.piano import PianoProfile
-from profiles.guitar import GuitarProfile
-from profiles.harp import HarpProfile
+from core.layout import layout_index
+from core.scheduler import MODE_NAMES
+from core.chords import POLICIES, RANGE_MODES
+from core.stream import LOAD_MODES
+from core.analysis import TRANSPOSE_MODES
 
 
 class SettingsPage(ScrollArea):
@@ -28,13 +30,29 @@ class SettingsPage(ScrollArea):
         # 游戏配置
         g_group = SettingCardGroup("配置", self.view)
         self.card_game = DropdownSettingCard(FluentIcon.GAME, "游戏", "", ["明日之后"], g_group)
+        # 只列出名称，选中演奏时才加载布局
+        self.layouts = layout_index()
         self.card_profile = DropdownSettingCard(FluentIcon.MUSIC, "乐器", "",
-                                                [p.name for p in [PianoProfile(), GuitarProfile(), HarpProfile()]],
-                                                g_group)
+                                                [name for _, name in self.layouts], g_group)
         self.card_speed = NumberSettingCard(FluentIcon.SPEED_HIGH, "速度", "", 0.1, 5.0, True, g_group)
         self.card_pitch = NumberSettingCard(FluentIcon.UP, "音调", "", -24, 24, False, g_group)
+        self.card_transpose = DropdownSettingCard(FluentIcon.SYNC, "自动移调", "按当前乐器选择丢音最少的音调",
+                                                  list(TRANSPOSE_MODES.values()), g_group)
         self.card_delay = NumberSettingCard(FluentIcon.HISTORY, "延迟", "", 0, 10, False, g_group)
-        g_group.addSettingCards([self.card_game, self.card_profile, self.card_speed, self.card_pitch, self.card_delay])
+        self.card_scheduler = DropdownSettingCard(FluentIcon.STOP_WATCH, "调度模式", "省电: CPU最低 / 精确: 抖动最小",
+                                                  list(MODE_NAMES.values()), g_group)
+        self.card_polyphony = NumberSettingCard(FluentIcon.ALIGNMENT, "复音上限", "同一时刻最多弹奏的音符数", 1, 10, False,
+                                                g_group)
+        self.card_policy = DropdownSettingCard(FluentIcon.FILTER, "和弦取舍", "和弦超出复音上限时保留哪些音",
+                                               list(POLICIES.values()), g_group)
+        self.card_range = DropdownSettingCard(FluentIcon.ZOOM, "音域外的音", "折叠: 移到乐器能弹的最近八度，和弦内重复的音只弹一次",
+                                              list(RANGE_MODES.values()), g_group)
+        self.card_load_mode = DropdownSettingCard(FluentIcon.SAVE, "加载模式", "超大MIDI用流式模式，内存占用恒定但不支持跳转",
+                                                  list(LOAD_MODES.values()), g_group)
+        g_group.addSettingCards([self.card_game, self.card_profile, self.card_speed, self.card_pitch,
+                                 self.card_transpose, self.card_delay,
+                                 self.card_scheduler, self.card_polyphony, self.card_policy, self.card_range,
+                                 self.card_load_mode])
         self.layout.addWidget(g_group)
 
         # 外观配置
@@ -55,16 +73,70 @@ class SettingsPage(ScrollArea):
         if self.conf:
             mode = self.conf.value("theme_mode", "Auto")
             self.card_theme.comboBox.setCurrentIndex(0 if mode == "Auto" else (1 if mode == "Light" else 2))
-            self.card_profile.comboBox.setCurrentIndex(int(self.conf.value("profile", 0)))
+            ids = [layout_id for layout_id, _ in self.layouts]
+            layout = self.conf.value("layout")
+            # 旧版本按下标保存乐器
+            idx = ids.index(layout) if layout in ids else int(self.conf.value("profile", 0))
+            self.card_profile.comboBox.setCurrentIndex(idx if 0 <= idx < len(ids) else 0)
             self.card_speed.spinBox.setValue(float(self.conf.value("speed", 1.0)))
             self.card_pitch.spinBox.setValue(int(self.conf.value("pitch", 0)))
             self.card_delay.spinBox.setValue(int(self.conf.value("delay", 3)))
+            modes = list(MODE_NAMES)
+            mode = self.conf.value("scheduler", "balanced")
+            self.card_scheduler.comboBox.setCurrentIndex(modes.index(mode) if mode in modes else 0)
+            self.card_polyphony.spinBox.setValue(int(self.conf.value("max_polyphony", 5)))
+            policies = list(POLICIES)
+            policy = self.conf.value("chord_policy", "melody")
+            self.card_policy.comboBox.setCurrentIndex(policies.index(policy) if policy in policies else 0)
+            range_modes = list(RANGE_MODES)
+            range_mode = self.conf.value("range_mode", "drop")
+            self.card_range.comboBox.setCurrentIndex(range_modes.index(range_mode) if range_mode in range_modes else 0)
+            load_modes = list(LOAD_MODES)
+            load_mode = self.conf.value("load_mode", "auto")
+            self.card_load_mode.comboBox.setCurrentIndex(load_modes.index(load_mode) if load_mode in load_modes else 0)
+            transpose_modes = list(TRANSPOSE_MODES)
+            transpose = self.conf.value("transpose_mode", "manual")
+            self.card_transpose.comboBox.setCurrentIndex(
+                transpose_modes.index(transpose) if transpose in transpose_modes else 0)
+        else:
+            self.card_polyphony.spinBox.setValue(5)
 
         # 信号
-        self.card_profile.comboBox.currentIndexChanged.connect(lambda i: self.conf.setValue("profile", i))
+        self.card_profile.comboBox.currentIndexChanged.connect(
+            lambda i: self.conf.setValue("layout", self.layouts[i][0]))
         self.card_speed.spinBox.valueChanged.connect(lambda v: self.conf.setValue("speed", v))
         self.card_pitch.spinBox.valueChanged.connect(lambda v: self.conf.setValue("pitch", v))
         self.card_delay.spinBox.valueChanged.connect(lambda v: self.conf.setValue("delay", v))
+        self.card_scheduler.comboBox.currentIndexChanged.connect(
+            lambda i: self.conf.setValue("scheduler", list(MODE_NAMES)[i]))
+        self.card_polyphony.spinBox.valueChanged.connect(lambda v: self.conf.setValue("max_polyphony", v))
+        self.card_policy.comboBox.currentIndexChanged.connect(
+            lambda i: self.conf.setValue("chord_policy", list(POLICIES)[i]))
+        self.card_range.comboBox.currentIndexChanged.connect(
+            lambda i: self.conf.setValue("range_mode", list(RANGE_MODES)[i]))
+        self.card_load_mode.comboBox.currentIndexChanged.connect(
+            lambda i: self.conf.setValue("load_mode", list(LOAD_MODES)[i]))
+        self.card_transpose.comboBox.currentIndexChanged.connect(
+            lambda i: self.conf.setValue("transpose_mode", list(TRANSPOSE_MODES)[i]))
+
+    def layout_id(self):
+        idx = self.card_profile.comboBox.currentIndex()
+        return self.layouts[idx][0] if 0 <= idx < len(self.layouts) else None
+
+    def scheduler_mode(self):
+        return list(MODE_NAMES)[self.card_scheduler.comboBox.currentIndex()]
+
+    def chord_policy(self):
+        return list(POLICIES)[self.card_policy.comboBox.currentIndex()]
+
+    def range_mode(self):
+        return list(RANGE_MODES)[self.card_range.comboBox.currentIndex()]
+
+    def load_mode(self):
+        return list(LOAD_MODES)[self.card_load_mode.comboBox.currentIndex()]
+
+    def transpose_mode(self):
+        return list(TRANSPOSE_MODES)[self.card_transpose.comboBox.currentIndex()]
 
     def set_theme(self, idx):
         t = [Theme.AUTO, Theme.LIGHT, Theme.DARK][idx]